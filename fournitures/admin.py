@@ -1,5 +1,64 @@
-from django.contrib import admin
-from .models import TypeFourniture, Fourniture, Mouvement, Commande
+import json
+
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .models import (
+    AlerteStock, Commande, Fourniture, LieuStockage, Mouvement, ProfilRequete, StockParLieu, Transfert,
+    TypeFourniture,
+)
+
+# En dessous de ce nombre de lignes estimées, le COUNT(*) exact reste bon marché
+SEUIL_COMPTAGE_EXACT = 50000
+
+
+class PaginateurApproximatif(Paginator):
+    """
+    Paginateur qui, sur PostgreSQL, remplace COUNT(*) par l'estimation du
+    planificateur (pg_class.reltuples sans filtre, EXPLAIN sinon) quand la
+    table est volumineuse. Le nombre de pages affiché est alors approché.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'db') and connections[queryset.db].vendor == 'postgresql':
+            estimation = self._estimation(queryset)
+            if estimation is not None and estimation > SEUIL_COMPTAGE_EXACT:
+                return estimation
+        return super().count
+
+    @staticmethod
+    def _estimation(queryset):
+        with connections[queryset.db].cursor() as cursor:
+            if not queryset.query.where:
+                # Table partitionnée (mouvements, voir partitions.py): le parent n'a pas de
+                # lignes propres, son estimation est la somme de celles des partitions
+                table = queryset.model._meta.db_table
+                cursor.execute(
+                    "SELECT sum(greatest(reltuples, 0))::bigint, max(reltuples) FROM pg_class "
+                    "WHERE (oid = %s::regclass AND relkind <> 'p') "
+                    "OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)",
+                    [table, table],
+                )
+                total, plus_grande = cursor.fetchone()
+                # -1: table (ou toutes les partitions) jamais analysée
+                return total if plus_grande is not None and plus_grande >= 0 else None
+
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+
+
+class GrandeTableAdmin(admin.ModelAdmin):
+    """Réglages communs aux tables volumineuses: pas de COUNT(*) exact sur toute la table"""
+    paginator = PaginateurApproximatif
+    show_full_result_count = False
 
 
 @admin.register(TypeFourniture)
@@ -8,31 +67,120 @@ class TypeFournitureAdmin(admin.ModelAdmin):
     search_fields = ('nom',)
 
 
+@admin.register(LieuStockage)
+class LieuStockageAdmin(admin.ModelAdmin):
+    list_display = ('nom', 'actif', 'par_defaut')
+    list_filter = ('actif',)
+    search_fields = ('nom',)
+
+
+class StockParLieuInline(admin.TabularInline):
+    """Stocks par lieu en lecture seule: ils ne changent qu'au travers des mouvements et transferts"""
+    model = StockParLieu
+    extra = 0
+    can_delete = False
+    readonly_fields = ('lieu', 'quantite')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Fourniture)
 class FournitureAdmin(admin.ModelAdmin):
-    list_display = ('reference', 'designation', 'type', 'unite', 'stock', 'seuil_alerte', 'stock_max', 'en_alerte')
+    list_display = ('reference', 'designation', 'type', 'unite', 'stock', 'seuil_alerte', 'stock_max',
+                    'cout_moyen', 'valeur_stock', 'en_alerte')
     list_filter = ('type', 'unite')
+    list_select_related = ('type',)
     search_fields = ('reference', 'designation')
+    autocomplete_fields = ('type',)
     list_editable = ('stock',)
+    inlines = [StockParLieuInline]
 
     def en_alerte(self, obj):
-        return obj.en_alerte()
+        return obj.en_alerte
 
     en_alerte.boolean = True
     en_alerte.short_description = 'Alerte'
 
 
 @admin.register(Mouvement)
-class MouvementAdmin(admin.ModelAdmin):
-    list_display = ('produit', 'type_mouvement', 'quantite', 'date', 'utilisateur')
+class MouvementAdmin(GrandeTableAdmin):
+    list_display = ('produit', 'type_mouvement', 'quantite', 'cout_unitaire', 'lieu', 'date', 'utilisateur')
+    # Filtres par plages de dates (index date / type_mouvement, date) plutôt que
+    # date_hierarchy, qui parcourt toute la table pour lister les années et mois
     list_filter = ('type_mouvement', 'date')
+    list_select_related = ('produit', 'utilisateur', 'lieu')
     search_fields = ('produit__reference', 'produit__designation')
-    date_hierarchy = 'date'
+    autocomplete_fields = ('produit', 'utilisateur', 'commande', 'lieu')
+
+
+@admin.register(Transfert)
+class TransfertAdmin(GrandeTableAdmin):
+    list_display = ('produit', 'source', 'destination', 'quantite', 'date', 'utilisateur')
+    list_filter = ('source', 'destination', 'date')
+    list_select_related = ('produit', 'source', 'destination', 'utilisateur')
+    search_fields = ('produit__reference', 'produit__designation')
+    # Créés par Fourniture.transferer_stock, qui met à jour les stocks des deux lieux
+    readonly_fields = ('produit', 'source', 'destination', 'quantite', 'date', 'utilisateur')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(AlerteStock)
+class AlerteStockAdmin(GrandeTableAdmin):
+    list_display = ('produit', 'type_alerte', 'stock_avant', 'stock_apres', 'seuil_alerte', 'date', 'date_envoi')
+    list_filter = ('type_alerte', 'date')
+    list_select_related = ('produit',)
+    search_fields = ('produit__reference', 'produit__designation')
+    # Écrites par les chemins d'écriture du stock, envoyées par envoyer_alertes
+    readonly_fields = ('produit', 'type_alerte', 'stock_avant', 'stock_apres', 'seuil_alerte', 'date', 'date_envoi')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ProfilRequete)
+class ProfilRequeteAdmin(admin.ModelAdmin):
+    list_display = ('date', 'vue', 'methode', 'statut', 'duree', 'requetes_sql', 'memoire_pic', 'utilisateur')
+    list_filter = ('vue',)
+    list_select_related = ('utilisateur',)
+    exclude = ('profil', 'fonctions', 'allocations')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+def _action_lot(action, description):
+    """Construit une action d'admin qui passe par Commande.traiter_lot"""
+    def traiter(modeladmin, request, queryset):
+        resultats = Commande.traiter_lot(queryset.values_list('id', flat=True), action, request.user)
+        succes = sum(1 for ok, _ in resultats.values() if ok)
+        if succes:
+            modeladmin.message_user(request, f"{succes} commande(s) traitée(s)", messages.SUCCESS)
+        for ok, message in resultats.values():
+            if not ok:
+                modeladmin.message_user(request, message, messages.WARNING)
+
+    traiter.__name__ = f'{action}_lot'
+    traiter.short_description = description
+    return traiter
 
 
 @admin.register(Commande)
-class CommandeAdmin(admin.ModelAdmin):
+class CommandeAdmin(GrandeTableAdmin):
     list_display = ('produit', 'quantite', 'status', 'date_creation')
     list_filter = ('status', 'date_creation')
-    search_fields = ('produit__reference', 'produit__designation')
-    list_editable = ('status',)
\ No newline at end of file
+    list_select_related = ('produit',)
+    search_fields = ('numero', 'produit__reference', 'produit__designation')
+    autocomplete_fields = ('produit', 'utilisateur', 'utilisateur_validation')
+    # Le statut ne se modifie qu'au travers du cycle de vie (stock et mouvements)
+    actions = [
+        _action_lot('valider', "Valider les commandes sélectionnées"),
+        _action_lot('mettre_en_cours', "Mettre en cours de livraison"),
+        _action_lot('recevoir', "Recevoir les commandes sélectionnées"),
+        _action_lot('annuler', "Annuler les commandes sélectionnées"),
+    ]
\ No newline at end of file
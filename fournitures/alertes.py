@@ -0,0 +1,161 @@
+"""
+Alertes de franchissement du seuil d'alerte.
+
+Les chemins d'écriture du stock comparent l'état avant et après chaque
+modification (stock <= seuil) et écrivent les franchissements dans la boîte
+d'envoi AlerteStock, dans la même transaction. La commande envoyer_alertes
+lit uniquement les alertes en attente et les regroupe en récapitulatifs
+envoyés par e-mail (backend console ou fichier en local).
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import get_connection, EmailMessage
+from django.db import transaction
+from django.utils import timezone
+
+REGROUPEMENTS = ('utilisateur', 'type')
+
+
+def franchissement(stock_avant, seuil_avant, stock_apres, seuil_apres=None):
+    """'ALERTE' ou 'RETOUR' si l'état « en alerte » change, sinon None"""
+    if seuil_apres is None:
+        seuil_apres = seuil_avant
+    avant, apres = stock_avant <= seuil_avant, stock_apres <= seuil_apres
+    if avant == apres:
+        return None
+    return 'ALERTE' if apres else 'RETOUR'
+
+
+def enregistrer_franchissements(changements):
+    """
+    Écrit dans la boîte d'envoi les franchissements parmi `changements`,
+    itérable de (produit_id, stock_avant, stock_apres, seuil_avant, seuil_apres).
+    """
+    from .models import AlerteStock
+
+    alertes = []
+    for produit_id, stock_avant, stock_apres, seuil_avant, seuil_apres in changements:
+        type_alerte = franchissement(stock_avant, seuil_avant, stock_apres, seuil_apres)
+        if type_alerte:
+            alertes.append(AlerteStock(
+                produit_id=produit_id, type_alerte=type_alerte, stock_avant=stock_avant,
+                stock_apres=stock_apres, seuil_alerte=seuil_apres,
+            ))
+    if alertes:
+        AlerteStock.objects.bulk_create(alertes)
+    return len(alertes)
+
+
+# ==================== RÉCAPITULATIFS ====================
+
+def destinataires():
+    """Adresses des récapitulatifs: settings.ALERTES_DESTINATAIRES, sinon le personnel actif"""
+    adresses = getattr(settings, 'ALERTES_DESTINATAIRES', None)
+    if adresses:
+        return list(adresses)
+    return list(
+        User.objects.filter(is_active=True, is_staff=True).exclude(email='').order_by('id').values_list(
+            'email', flat=True
+        )
+    )
+
+
+def _resumer(alertes):
+    """
+    Une ligne par produit: premier état et dernier état de la période.
+    Un produit revenu à son état de départ (alerte puis retour) est omis.
+    """
+    par_produit = defaultdict(list)
+    for alerte in alertes:
+        par_produit[alerte.produit_id].append(alerte)
+
+    lignes = []
+    for suite in par_produit.values():
+        premiere, derniere = suite[0], suite[-1]
+        if premiere.type_alerte != derniere.type_alerte:
+            continue
+        lignes.append((derniere.type_alerte, derniere.produit, premiere.stock_avant, derniere.stock_apres,
+                       derniere.seuil_alerte, len(suite)))
+    return lignes
+
+
+def _corps(lignes):
+    sections = []
+    for type_alerte, titre in (('ALERTE', "Passés sous le seuil d'alerte"), ('RETOUR', "Revenus au-dessus du seuil")):
+        produits = [l for l in lignes if l[0] == type_alerte]
+        if not produits:
+            continue
+        sections.append(f"{titre} ({len(produits)}):")
+        for _, produit, avant, apres, seuil, nombre in sorted(produits, key=lambda l: l[1].reference or ''):
+            ligne = (f"  - {produit.reference} {produit.designation}: {avant} → {apres} {produit.unite} "
+                     f"(seuil {seuil})")
+            if nombre > 1:
+                ligne += f", {nombre} franchissements"
+            sections.append(ligne)
+        sections.append('')
+    return '\n'.join(sections)
+
+
+def _messages(lignes, regroupement, adresses, connexion):
+    expediteur = getattr(settings, 'DEFAULT_FROM_EMAIL', None)
+    if regroupement == 'type':
+        messages = []
+        for type_alerte, sujet in (('ALERTE', "Fournitures passées sous le seuil d'alerte"),
+                                   ('RETOUR', "Fournitures revenues au-dessus du seuil")):
+            du_type = [l for l in lignes if l[0] == type_alerte]
+            if du_type:
+                messages.append(EmailMessage(f"[Stock] {sujet} ({len(du_type)})", _corps(du_type), expediteur,
+                                             adresses, connection=connexion))
+        return messages
+
+    alertes = sum(1 for l in lignes if l[0] == 'ALERTE')
+    sujet = f"[Stock] Récapitulatif des alertes: {alertes} en alerte, {len(lignes) - alertes} rétablie(s)"
+    corps = _corps(lignes)
+    return [EmailMessage(sujet, corps, expediteur, [adresse], connection=connexion) for adresse in adresses]
+
+
+def envoyer_recapitulatif(regroupement='utilisateur', taille_lot=1000):
+    """
+    Envoie un récapitulatif des alertes en attente (au plus `taille_lot`) et
+    les marque envoyées. Plusieurs workers peuvent tourner: les alertes
+    verrouillées par l'un sont ignorées par les autres.
+
+    Retourne (alertes traitées, e-mails envoyés).
+    """
+    from .models import AlerteStock
+
+    if regroupement not in REGROUPEMENTS:
+        raise ValueError(f"Regroupement inconnu: {regroupement}")
+
+    with transaction.atomic():
+        alertes = list(
+            AlerteStock.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+                date_envoi__isnull=True
+            ).select_related('produit').order_by('id')[:taille_lot]
+        )
+        if not alertes:
+            return 0, 0
+
+        lignes = _resumer(alertes)
+        adresses = destinataires()
+        envoyes = 0
+        if lignes and adresses:
+            connexion = get_connection()
+            envoyes = connexion.send_messages(_messages(lignes, regroupement, adresses, connexion)) or 0
+
+        # Sans destinataire, les alertes restent en attente
+        if adresses or not lignes:
+            AlerteStock.objects.filter(id__in=[a.id for a in alertes]).update(date_envoi=timezone.now())
+            return len(alertes), envoyes
+        return 0, 0
+
+
+def purger_envoyees(jours):
+    """Supprime les alertes envoyées depuis plus de `jours` jours"""
+    from .models import AlerteStock
+
+    limite = timezone.now() - timedelta(days=jours)
+    return AlerteStock.objects.filter(date_envoi__lt=limite).delete()[0]
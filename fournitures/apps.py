@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class FournituresConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'fournitures'
+
+    def ready(self):
+        from django.core import checks
+
+        from .statique import verifier_statique
+        checks.register(verifier_statique, checks.Tags.staticfiles)
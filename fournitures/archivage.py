@@ -0,0 +1,279 @@
+"""
+Archivage des mouvements anciens et des commandes clôturées.
+
+Les lignes plus anciennes que la date limite sont déplacées par lots hors
+des tables principales, soit dans des tables d'archive (format 'table'),
+soit dans des fichiers NDJSON compressés (format 'ndjson', un membre gzip
+par produit et par lot, indexé par SegmentArchive).
+
+Avant suppression, chaque lot est cumulé dans des résumés (totaux
+journaliers par produit pour les mouvements, mensuels par statut pour les
+commandes) afin que rapprochement, stock à date et compteurs restent
+justes.
+"""
+import gzip
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, Sum
+from django.utils import timezone
+
+from .models import (
+    Commande, CommandeArchive, Mouvement, MouvementArchive, ResumeCommandeMois,
+    ResumeMouvementJour, SegmentArchive,
+)
+
+FORMATS = ('table', 'ndjson')
+CHAMPS_MOUVEMENT = ['id', 'produit_id', 'type_mouvement', 'quantite', 'date', 'utilisateur_id',
+                    'commande_id', 'lieu_id', 'date_saisie', 'notes', 'cout_unitaire']
+CHAMPS_COMMANDE = ['id', 'numero', 'produit_id', 'quantite', 'status', 'date_creation', 'date_validation',
+                   'date_en_cours', 'date_reception', 'notes', 'utilisateur_id', 'utilisateur_validation_id']
+STATUTS_CLOTURES = ('RECUE', 'ANNULEE')
+
+
+def repertoire_archives():
+    return getattr(settings, 'ARCHIVES_DIR', os.path.join(settings.BASE_DIR, 'archives'))
+
+
+def date_limite(annees):
+    """Début de la journée d'il y a `annees` ans (les résumés portent sur des journées entières)"""
+    from .historique_stock import debut_de_journee
+
+    aujourd_hui = timezone.localdate()
+    try:
+        jour = aujourd_hui.replace(year=aujourd_hui.year - annees)
+    except ValueError:  # 29 février
+        jour = aujourd_hui.replace(year=aujourd_hui.year - annees, day=28)
+    return debut_de_journee(jour)
+
+
+# ==================== ÉCRITURE ====================
+
+def _serialiser(ligne):
+    return json.dumps({
+        cle: (valeur.isoformat() if isinstance(valeur, datetime) else
+              str(valeur) if isinstance(valeur, Decimal) else valeur)
+        for cle, valeur in ligne.items()
+    }, ensure_ascii=False)
+
+
+def _ecrire_segments(modele, lignes, champ_date):
+    """Ajoute un membre gzip par (produit, mois) aux fichiers NDJSON, retourne les SegmentArchive à indexer"""
+    groupes = defaultdict(list)
+    for ligne in lignes:
+        groupes[(ligne['produit_id'], f"{timezone.localtime(ligne[champ_date]):%Y-%m}")].append(ligne)
+
+    repertoire = repertoire_archives()
+    os.makedirs(repertoire, exist_ok=True)
+    segments = []
+    for (produit_id, mois), groupe in sorted(groupes.items(), key=lambda g: (g[0][1], g[0][0])):
+        fichier = f'{modele}s-{mois}.ndjson.gz'
+        donnees = gzip.compress(
+            ('\n'.join(_serialiser(ligne) for ligne in groupe) + '\n').encode('utf-8'), mtime=0
+        )
+        with open(os.path.join(repertoire, fichier), 'ab') as f:
+            offset = f.tell()
+            f.write(donnees)
+            f.flush()
+            os.fsync(f.fileno())
+        dates = [ligne[champ_date] for ligne in groupe]
+        segments.append(SegmentArchive(
+            modele=modele, fichier=fichier, offset=offset, longueur=len(donnees), produit_id=produit_id,
+            date_min=min(dates), date_max=max(dates), nombre=len(groupe),
+        ))
+    return segments
+
+
+def _cumuler_mouvements(lignes):
+    """Ajoute les mouvements du lot aux totaux journaliers par produit"""
+    totaux = defaultdict(lambda: [Decimal('0'), Decimal('0'), 0, Decimal('0')])
+    for ligne in lignes:
+        total = totaux[(ligne['produit_id'], timezone.localdate(ligne['date']))]
+        entree = ligne['type_mouvement'] == 'ENTREE'
+        total[0 if entree else 1] += ligne['quantite']
+        total[2] += 1
+        valeur = ligne['quantite'] * (ligne['cout_unitaire'] or 0)
+        total[3] += valeur if entree else -valeur
+
+    existants = {
+        (r.produit_id, r.jour): r
+        for r in ResumeMouvementJour.objects.select_for_update().filter(
+            produit_id__in={p for p, _ in totaux}, jour__in={j for _, j in totaux}
+        )
+    }
+    nouveaux, modifies = [], []
+    for (produit_id, jour), (entrees, sorties, nombre, valeur) in totaux.items():
+        resume = existants.get((produit_id, jour))
+        if resume is None:
+            nouveaux.append(ResumeMouvementJour(
+                produit_id=produit_id, jour=jour, entrees=entrees, sorties=sorties, nombre=nombre, valeur=valeur
+            ))
+        else:
+            resume.entrees += entrees
+            resume.sorties += sorties
+            resume.nombre += nombre
+            resume.valeur += valeur
+            modifies.append(resume)
+    ResumeMouvementJour.objects.bulk_create(nouveaux, batch_size=1000)
+    ResumeMouvementJour.objects.bulk_update(modifies, ['entrees', 'sorties', 'nombre', 'valeur'], batch_size=1000)
+
+
+def _cumuler_commandes(lignes):
+    """Ajoute les commandes du lot aux totaux mensuels par statut"""
+    totaux = defaultdict(lambda: [0, 0])
+    for ligne in lignes:
+        mois = timezone.localdate(ligne['date_creation']).replace(day=1)
+        totaux[(mois, ligne['status'])][0] += 1
+        totaux[(mois, ligne['status'])][1] += ligne['quantite'] or 0
+
+    for (mois, status), (nombre, quantite) in totaux.items():
+        resume, _ = ResumeCommandeMois.objects.select_for_update().get_or_create(mois=mois, status=status)
+        resume.nombre += nombre
+        resume.quantite += quantite
+        resume.save(update_fields=['nombre', 'quantite'])
+
+
+def archiver_mouvements(avant, format='table', taille_lot=5000):
+    """Archive par lots les mouvements antérieurs à `avant`, retourne le nombre archivé"""
+    total = 0
+    while True:
+        with transaction.atomic():
+            lignes = list(
+                Mouvement.objects.filter(date__lt=avant).order_by('id').values(*CHAMPS_MOUVEMENT)[:taille_lot]
+            )
+            if not lignes:
+                return total
+            _cumuler_mouvements(lignes)
+            if format == 'ndjson':
+                SegmentArchive.objects.bulk_create(_ecrire_segments('mouvement', lignes, 'date'))
+            else:
+                MouvementArchive.objects.bulk_create([MouvementArchive(**ligne) for ligne in lignes])
+            # date__lt: n'examiner que les partitions concernées
+            Mouvement.objects.filter(date__lt=avant, id__in=[ligne['id'] for ligne in lignes]).delete()
+        total += len(lignes)
+
+
+def commandes_archivables(avant):
+    """Commandes clôturées avant `avant` dont aucun mouvement n'est encore dans la table principale"""
+    return Commande.objects.filter(
+        status__in=STATUTS_CLOTURES,
+        date_creation__lt=avant,
+    ).filter(
+        Q(date_reception__isnull=True) | Q(date_reception__lt=avant)
+    ).exclude(
+        Exists(Mouvement.objects.filter(commande=OuterRef('pk')))
+    )
+
+
+def archiver_commandes(avant, format='table', taille_lot=5000):
+    """Archive par lots les commandes clôturées antérieures à `avant`, retourne le nombre archivé"""
+    total = 0
+    while True:
+        with transaction.atomic():
+            lignes = list(commandes_archivables(avant).order_by('id').values(*CHAMPS_COMMANDE)[:taille_lot])
+            if not lignes:
+                return total
+            _cumuler_commandes(lignes)
+            if format == 'ndjson':
+                SegmentArchive.objects.bulk_create(_ecrire_segments('commande', lignes, 'date_creation'))
+            else:
+                CommandeArchive.objects.bulk_create([
+                    CommandeArchive(
+                        id=ligne['id'], numero=ligne['numero'], produit_id=ligne['produit_id'],
+                        status=ligne['status'], date_creation=ligne['date_creation'],
+                        donnees=json.loads(_serialiser(ligne)),
+                    )
+                    for ligne in lignes
+                ])
+            Commande.objects.filter(id__in=[ligne['id'] for ligne in lignes]).delete()
+        total += len(lignes)
+
+
+# ==================== LECTURE ====================
+
+def lire_segment(segment):
+    """Lignes d'un segment NDJSON (dates et quantités reconverties)"""
+    with open(os.path.join(repertoire_archives(), segment.fichier), 'rb') as f:
+        f.seek(segment.offset)
+        donnees = gzip.decompress(f.read(segment.longueur))
+    lignes = []
+    for texte in donnees.decode('utf-8').splitlines():
+        ligne = json.loads(texte)
+        for cle in ('date', 'date_saisie', 'date_creation', 'date_validation', 'date_en_cours', 'date_reception'):
+            if ligne.get(cle):
+                ligne[cle] = datetime.fromisoformat(ligne[cle])
+        for cle in ('quantite', 'cout_unitaire'):
+            if isinstance(ligne.get(cle), str):
+                ligne[cle] = Decimal(ligne[cle])
+        lignes.append(ligne)
+    return lignes
+
+
+def historique_archive(produit_id, avant=None, limite=50):
+    """
+    Mouvements archivés d'un produit, du plus récent au plus ancien, antérieurs
+    au curseur `avant` (couple (date aware, id)).
+
+    Retourne (lignes, curseur): `curseur` est le couple (date, id) de la
+    dernière ligne, à passer en `avant` pour la page suivante, None s'il n'y
+    a plus rien. L'id départage les mouvements de même date.
+    """
+    table = MouvementArchive.objects.filter(produit_id=produit_id)
+    segments = SegmentArchive.objects.filter(modele='mouvement', produit_id=produit_id)
+    if avant is not None:
+        date, id_ = avant
+        table = table.filter(Q(date__lt=date) | Q(date=date, id__lt=id_))
+        segments = segments.filter(date_min__lte=date)
+
+    lignes = list(table.order_by('-date', '-id').values(*CHAMPS_MOUVEMENT)[:limite + 1])
+    # Segments du plus récent au plus ancien: arrêter dès qu'ils ne peuvent plus entrer dans la page
+    for segment in segments.order_by('-date_max'):
+        if len(lignes) > limite and segment.date_max < lignes[limite]['date']:
+            break
+        lignes.extend(l for l in lire_segment(segment) if avant is None or (l['date'], l['id']) < avant)
+        lignes.sort(key=lambda l: (l['date'], l['id']), reverse=True)
+
+    suite = len(lignes) > limite
+    lignes = lignes[:limite]
+    utilisateurs = User.objects.in_bulk({l['utilisateur_id'] for l in lignes if l['utilisateur_id']})
+    for ligne in lignes:
+        utilisateur = utilisateurs.get(ligne['utilisateur_id'])
+        ligne['utilisateur'] = utilisateur.username if utilisateur else None
+    return lignes, ((lignes[-1]['date'], lignes[-1]['id']) if suite and lignes else None)
+
+
+def a_des_archives(produit_id):
+    return ResumeMouvementJour.objects.filter(produit_id=produit_id).exists()
+
+
+def solde_resumes(jour_debut=None, jour_fin=None, produit_ids=None, valeur=False):
+    """Solde (entrées - sorties) archivé par produit pour les jours dans [jour_debut, jour_fin[, en valeur si `valeur`"""
+    resumes = ResumeMouvementJour.objects.all()
+    if jour_debut is not None:
+        resumes = resumes.filter(jour__gte=jour_debut)
+    if jour_fin is not None:
+        resumes = resumes.filter(jour__lt=jour_fin)
+    if produit_ids is not None:
+        resumes = resumes.filter(produit_id__in=produit_ids)
+    return dict(
+        resumes.values('produit_id').annotate(
+            solde=Sum('valeur') if valeur else Sum(F('entrees') - F('sorties'))
+        ).order_by().values_list(
+            'produit_id', 'solde'
+        )
+    )
+
+
+def commandes_archivees_par_statut():
+    """{statut: nombre} des commandes archivées"""
+    return dict(
+        ResumeCommandeMois.objects.values('status').annotate(total=Sum('nombre')).order_by().values_list(
+            'status', 'total'
+        )
+    )
@@ -0,0 +1,67 @@
+"""
+Bibliothèques tierces servies depuis les fichiers statiques (static/vendor/).
+
+Chaque bibliothèque est épinglée à une version: `vendoriser_assets`
+télécharge les fichiers listés ici, versionnés avec le code, et les gabarits
+les chargent par {% static %}: aucune page ne dépend d'un CDN. collectstatic
+refuse de s'exécuter si l'un d'eux manque (voir fournitures/statique.py).
+"""
+import re
+
+from django.contrib.staticfiles import finders
+
+JQUERY = '3.7.1'
+FONTAWESOME = '6.6.0'
+APEXCHARTS = '3.26.0'
+POPPINS = '5.0.8'
+POPPINS_GRAISSES = (300, 400, 500, 600, 700)
+
+_FA = f'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/{FONTAWESOME}'
+_FA_POLICES = ('fa-brands-400', 'fa-regular-400', 'fa-solid-900', 'fa-v4compatibility')
+_POPPINS = f'https://cdn.jsdelivr.net/npm/@fontsource/poppins@{POPPINS}/files'
+
+# {bibliothèque: [(chemin statique, URL de téléchargement)]}, le premier fichier est le point d'entrée
+BIBLIOTHEQUES = {
+    'jquery': [
+        ('vendor/jquery/jquery.min.js', f'https://code.jquery.com/jquery-{JQUERY}.min.js'),
+    ],
+    'fontawesome': [
+        ('vendor/fontawesome/css/all.min.css', f'{_FA}/css/all.min.css'),
+    ] + [
+        (f'vendor/fontawesome/webfonts/{police}.woff2', f'{_FA}/webfonts/{police}.woff2')
+        for police in _FA_POLICES
+    ],
+    'apexcharts': [
+        ('vendor/apexcharts/apexcharts.min.js',
+         f'https://cdn.jsdelivr.net/npm/apexcharts@{APEXCHARTS}/dist/apexcharts.min.js'),
+    ],
+    'poppins': [
+        (f'vendor/poppins/poppins-latin-{graisse}-normal.woff2',
+         f'{_POPPINS}/poppins-latin-{graisse}-normal.woff2')
+        for graisse in POPPINS_GRAISSES
+    ],
+}
+
+# Feuille générée par vendoriser_assets pour Poppins (pas de CSS publié par fontsource)
+POPPINS_CSS = 'vendor/poppins/poppins.css'
+
+
+def css_fontawesome(contenu):
+    """Ne garde que les polices woff2 (supportées par tous les navigateurs du parc)"""
+    return re.sub(r',url\([^)]*\.ttf\) format\("truetype"\)', '', contenu)
+
+
+def css_poppins():
+    """@font-face pointant vers les fichiers woff2 vendorisés"""
+    return ''.join(
+        "@font-face{font-family:'Poppins';font-style:normal;font-display:swap;"
+        f"font-weight:{graisse};src:url(poppins-latin-{graisse}-normal.woff2) format('woff2')}}\n"
+        for graisse in POPPINS_GRAISSES
+    )
+
+
+def non_vendorises():
+    """Chemins statiques attendus dans static/vendor/ et introuvables"""
+    chemins = [chemin for fichiers in BIBLIOTHEQUES.values() for chemin, _ in fichiers] + [POPPINS_CSS]
+    return [chemin for chemin in chemins if not finders.find(chemin)]
+
@@ -0,0 +1,93 @@
+"""
+Cache par processus de l'utilisateur authentifié.
+
+À chaque requête, AuthenticationMiddleware recharge l'utilisateur de la
+session (une requête sur auth_user). BackendUtilisateurCache garde une copie
+de référence de chaque utilisateur pendant CACHE_UTILISATEUR_SECONDES et en
+remet une copie neuve à chaque requête (les caches de permissions ne passent
+donc pas d'une requête à l'autre).
+
+Chaque copie est associée à la version de l'utilisateur lue dans le cache
+partagé (settings.CACHES['default']). Toute modification ou suppression
+d'un utilisateur change cette version une fois la transaction validée: tous
+les workers le relisent alors à la requête suivante, et une désactivation
+ou un changement de mot de passe s'applique partout immédiatement. Sans
+cache partagé entre workers, settings.CACHE_UTILISATEUR_SECONDES vaut 0 et
+l'utilisateur est relu à chaque requête.
+
+Les modifications par QuerySet.update() n'émettent pas de signal: appeler
+invalider() après coup.
+"""
+import copy
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+_utilisateurs = {}
+_verrou = threading.Lock()
+
+
+def duree_cache():
+    return getattr(settings, 'CACHE_UTILISATEUR_SECONDES', 60)
+
+
+def _cle_version(user_id):
+    return f'utilisateur:version:{user_id}'
+
+
+def oublier(user_id):
+    """Retire un utilisateur du cache du processus"""
+    with _verrou:
+        _utilisateurs.pop(user_id, None)
+
+
+def invalider(user_id):
+    """Nouvelle version de l'utilisateur: les copies de tous les workers sont périmées"""
+    oublier(user_id)
+    cache.set(_cle_version(user_id), uuid.uuid4().hex, None)
+
+
+def vider():
+    with _verrou:
+        _utilisateurs.clear()
+
+
+class BackendUtilisateurCache(ModelBackend):
+    """ModelBackend dont get_user lit d'abord le cache du processus"""
+
+    def get_user(self, user_id):
+        if duree_cache() <= 0:
+            return super().get_user(user_id)
+        user_id = get_user_model()._meta.pk.to_python(user_id)
+        # Lue avant la base: une modification validée entre-temps change la version
+        version = cache.get(_cle_version(user_id))
+        maintenant = time.monotonic()
+        with _verrou:
+            entree = _utilisateurs.get(user_id)
+        if entree is not None and entree[0] > maintenant and entree[1] == version:
+            return copy.copy(entree[2])
+
+        utilisateur = super().get_user(user_id)
+        if utilisateur is not None:
+            with _verrou:
+                _utilisateurs[user_id] = (maintenant + duree_cache(), version, utilisateur)
+            return copy.copy(utilisateur)
+        oublier(user_id)
+        return None
+
+
+def _invalider(sender, instance, **kwargs):
+    oublier(instance.pk)
+    # Après validation: un autre worker ne peut plus relire l'ancienne ligne sous la nouvelle version
+    transaction.on_commit(lambda: invalider(instance.pk))
+
+
+post_save.connect(_invalider, sender=settings.AUTH_USER_MODEL, dispatch_uid='cache_utilisateur_save')
+post_delete.connect(_invalider, sender=settings.AUTH_USER_MODEL, dispatch_uid='cache_utilisateur_delete')
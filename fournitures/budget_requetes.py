@@ -0,0 +1,173 @@
+"""
+Détection des requêtes N+1 et budgets de requêtes SQL par vue.
+
+EnregistreurRequetes note chaque requête exécutée sur toutes les bases avec
+son lieu d'appel dans le code du projet. Le rapport regroupe les requêtes
+identiques aux paramètres près (listes IN comprises): un groupe exécuté au
+moins `seuil_repetition` fois est signalé comme N+1, avec les lignes du
+projet qui l'ont déclenché.
+
+Les budgets des vues sont déclarés à côté des routes, dans
+fournitures/urls.py (BUDGETS_REQUETES). Utilisation:
+
+- dans un test: `with budget_requetes(10): client.get(url)`, ou
+  `verifier_vue(client, 'dashboard')` pour le budget déclaré;
+- avec pytest: `pytest -p fournitures.budget_requetes`, puis le marqueur
+  `@pytest.mark.budget_requetes(10)` ou la fixture `budget_requetes`;
+- sans suite de tests: python manage.py verifier_budgets_requetes.
+
+Un dépassement lève BudgetRequetesDepasse (une AssertionError) dont le
+message est le rapport complet.
+"""
+import os
+import re
+import sysconfig
+import traceback
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+SEUIL_REPETITION = 3
+
+# Littéraux et listes de paramètres remplacés pour regrouper les requêtes
+_LISTE_PARAMETRES = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_CHAINE = re.compile(r"'(?:[^']|'')*'")
+_NOMBRE = re.compile(r'(?<![\w"`])-?\d+(?:\.\d+)?\b')
+_ESPACES = re.compile(r'\s+')
+
+_STDLIB = sysconfig.get_paths()['stdlib']
+
+
+class BudgetRequetesDepasse(AssertionError):
+    pass
+
+
+def normaliser(sql):
+    """Forme canonique d'une requête: paramètres, littéraux et listes IN remplacés"""
+    sql = _LISTE_PARAMETRES.sub('(%s, ...)', sql)
+    sql = _CHAINE.sub('?', sql)
+    sql = _NOMBRE.sub('?', sql)
+    return _ESPACES.sub(' ', sql).strip()
+
+
+def _lieu_appel():
+    """Dernière frame du projet ou des tests (ni bibliothèque, ni ce module) dans la pile courante"""
+    base = str(settings.BASE_DIR) + os.sep
+    for frame in reversed(traceback.extract_stack()):
+        fichier = frame.filename
+        if (fichier.startswith(('<', _STDLIB)) or 'site-packages' in fichier
+                or fichier.endswith('budget_requetes.py')):
+            continue
+        if fichier.startswith(base):
+            fichier = fichier[len(base):]
+        return f"{fichier}:{frame.lineno} in {frame.name}"
+    return '(inconnu)'
+
+
+class EnregistreurRequetes:
+    """Context manager: enregistre les requêtes de toutes les bases avec leur lieu d'appel"""
+
+    def __init__(self):
+        self.requetes = []
+        self._pile = None
+
+    def _noter(self, execute, sql, params, many, context):
+        self.requetes.append((context['connection'].alias, sql, _lieu_appel()))
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._pile = ExitStack()
+        for alias in connections:
+            self._pile.enter_context(connections[alias].execute_wrapper(self._noter))
+        return self
+
+    def __exit__(self, *exc):
+        self._pile.close()
+
+    def __len__(self):
+        return len(self.requetes)
+
+    def repetees(self, seuil=SEUIL_REPETITION):
+        """[(nombre, requête normalisée, {lieu d'appel: nombre})] des groupes exécutés au moins `seuil` fois"""
+        groupes = defaultdict(lambda: defaultdict(int))
+        for alias, sql, lieu in self.requetes:
+            groupes[(alias, normaliser(sql))][lieu] += 1
+        resultat = [
+            (sum(lieux.values()), sql, dict(lieux))
+            for (_, sql), lieux in groupes.items() if sum(lieux.values()) >= seuil
+        ]
+        return sorted(resultat, key=lambda r: r[0], reverse=True)
+
+    def rapport(self, titre='', budget=None, seuil=SEUIL_REPETITION):
+        lignes = [f"{titre}: {len(self)} requête(s)" + (f" pour un budget de {budget}" if budget is not None else '')]
+        for nombre, sql, lieux in self.repetees(seuil):
+            lignes.append(f"  {nombre} × {sql[:200]}")
+            for lieu, n in sorted(lieux.items(), key=lambda l: l[1], reverse=True):
+                lignes.append(f"      {n} × depuis {lieu}")
+        return '\n'.join(lignes)
+
+    def verifier(self, titre='', budget=None, seuil=SEUIL_REPETITION):
+        """Lève BudgetRequetesDepasse si le budget est dépassé ou si une requête est répétée"""
+        if (budget is not None and len(self) > budget) or (seuil and self.repetees(seuil)):
+            raise BudgetRequetesDepasse(self.rapport(titre, budget, seuil))
+
+
+@contextmanager
+def budget_requetes(budget=None, seuil=SEUIL_REPETITION, titre='bloc'):
+    """`with budget_requetes(10): ...` échoue si le bloc dépasse le budget ou répète une requête"""
+    with EnregistreurRequetes() as enregistreur:
+        yield enregistreur
+    enregistreur.verifier(titre, budget, seuil)
+
+
+def budgets_declares():
+    """Budgets de requêtes déclarés à côté des routes (fournitures/urls.py)"""
+    from .urls import BUDGETS_REQUETES
+
+    return BUDGETS_REQUETES
+
+
+def verifier_vue(client, nom, budget=None, seuil=SEUIL_REPETITION, **kwargs):
+    """GET sur la vue `nom` avec le client de test, vérifiée contre son budget déclaré"""
+    from django.urls import reverse
+
+    budget = budget if budget is not None else budgets_declares().get(nom)
+    url = reverse(nom, kwargs=kwargs or None)
+    with EnregistreurRequetes() as enregistreur:
+        reponse = client.get(url)
+        if reponse.streaming:
+            b''.join(reponse.streaming_content)
+    enregistreur.verifier(f"{nom} ({url})", budget, seuil)
+    return reponse
+
+
+# ==================== PLUGIN PYTEST ====================
+
+if pytest is not None:
+    def pytest_configure(config):
+        config.addinivalue_line(
+            'markers', "budget_requetes(budget=None, seuil=3): échoue si le test dépasse le budget "
+                       "de requêtes SQL ou répète une requête"
+        )
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_call(item):
+        marqueur = item.get_closest_marker('budget_requetes')
+        if marqueur is None:
+            return (yield)
+        with EnregistreurRequetes() as enregistreur:
+            resultat = yield
+        enregistreur.verifier(item.nodeid, *marqueur.args, **marqueur.kwargs)
+        return resultat
+
+    @pytest.fixture(name='budget_requetes')
+    def _fixture_budget_requetes():
+        """Fixture: le context manager budget_requetes"""
+        return budget_requetes
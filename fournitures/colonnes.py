@@ -0,0 +1,212 @@
+"""
+Export colonnaire des mouvements pour l'analyse hors ligne.
+
+Le grand livre des mouvements (tables principale et d'archive) est écrit
+dans un répertoire sous forme d'un fichier .npy par colonne, plus un
+fichier meta.json:
+
+- id (int64), produit_id (int32), utilisateur_id (int32, -1 si aucun);
+- type (int8): +1 pour une entrée, -1 pour une sortie, si bien que
+  type × quantite est le mouvement signé;
+- quantite (float64);
+- date (datetime64[us], UTC): horodatage epoch en microsecondes.
+
+Les lignes sont triées par id. exporter() n'ajoute que les ids supérieurs
+au dernier exporté: les données sont écrites à la fin de chaque fichier,
+puis l'en-tête .npy (de taille fixe) est réécrit avec la nouvelle forme,
+puis meta.json, qui fait foi. Un export interrompu laisse au plus des
+octets en trop, ignorés au chargement et tronqués à l'export suivant. Seuls
+les mouvements de plus de `marge` secondes sont exportés, pour ne pas
+sauter l'id d'une transaction encore en cours.
+
+charger() ouvre les colonnes en memmap, sans copie: une analyse sur des
+millions de lignes ne lit que les pages qu'elle touche (voir
+sorties_par_produit). Les segments d'archive NDJSON ne sont pas exportés.
+
+NumPy est optionnel: le module s'importe sans lui, mais exporter() et
+charger() lèvent alors ImportError.
+"""
+import json
+import os
+import struct
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+try:
+    import numpy as np
+except ImportError:  # export colonnaire indisponible
+    np = None
+
+# Nom et dtype NumPy (chaîne) de chaque colonne
+COLONNES = (
+    ('id', '<i8'),
+    ('produit_id', '<i4'),
+    ('type', '|i1'),
+    ('quantite', '<f8'),
+    ('date', '<M8[us]'),
+    ('utilisateur_id', '<i4'),
+)
+TYPES = {'ENTREE': 1, 'SORTIE': -1}
+META = 'meta.json'
+VERSION = 1
+
+# En-tête .npy de taille fixe (multiple de 64): réécrit en place à chaque ajout
+TAILLE_ENTETE = 128
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECONDE = timedelta(microseconds=1)
+
+
+def repertoire_colonnes():
+    return getattr(settings, 'COLONNES_DIR', os.path.join(settings.BASE_DIR, 'colonnes'))
+
+
+def lire_meta(repertoire=None):
+    """Métadonnées de l'export, None s'il n'y en a pas encore"""
+    chemin = os.path.join(repertoire or repertoire_colonnes(), META)
+    if not os.path.exists(chemin):
+        return None
+    with open(chemin, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _ecrire_meta(repertoire, meta):
+    chemin = os.path.join(repertoire, META)
+    with open(chemin + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(chemin + '.tmp', chemin)
+
+
+def _verifier_numpy():
+    if np is None:
+        raise ImportError("NumPy est requis pour l'export colonnaire (pip install numpy)")
+
+
+def _entete(dtype, lignes):
+    """En-tête .npy version 1.0 complété par des espaces jusqu'à TAILLE_ENTETE octets"""
+    descr = np.lib.format.dtype_to_descr(np.dtype(dtype))
+    texte = repr({'descr': descr, 'fortran_order': False, 'shape': (lignes,)})
+    texte = texte.ljust(TAILLE_ENTETE - 11) + '\n'
+    return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(texte)) + texte.encode('latin1')
+
+
+def _ajouter(chemin, tableau, lignes_avant):
+    """Ajoute `tableau` après les `lignes_avant` lignes validées du fichier, puis met à jour l'en-tête"""
+    with open(chemin, 'r+b' if os.path.exists(chemin) else 'w+b') as f:
+        if lignes_avant == 0:
+            f.write(_entete(tableau.dtype, 0))
+        # Octets écrits par un export interrompu: au-delà des lignes validées
+        f.truncate(TAILLE_ENTETE + lignes_avant * tableau.dtype.itemsize)
+        f.seek(0, os.SEEK_END)
+        f.write(tableau.tobytes())
+        f.seek(0)
+        f.write(_entete(tableau.dtype, lignes_avant + len(tableau)))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _lot(sources, dernier_id, limite, taille):
+    """Les `taille` lignes d'id > dernier_id suivantes, toutes sources confondues, triées par id"""
+    champs = ('id', 'produit_id', 'type_mouvement', 'quantite', 'date', 'utilisateur_id')
+    lignes = []
+    for source in sources:
+        lignes += source.objects.filter(id__gt=dernier_id, date__lt=limite).order_by('id').values_list(
+            *champs)[:taille]
+    lignes.sort()
+    return lignes[:taille]
+
+
+def _en_colonnes(lignes):
+    ids, produits, types, quantites, dates, utilisateurs = zip(*lignes)
+    return {
+        'id': np.array(ids, dtype=COLONNES[0][1]),
+        'produit_id': np.array(produits, dtype=COLONNES[1][1]),
+        'type': np.array([TYPES[t] for t in types], dtype=COLONNES[2][1]),
+        'quantite': np.array([float(q) for q in quantites], dtype=COLONNES[3][1]),
+        'date': np.array([(d - _EPOCH) // _MICROSECONDE for d in dates], dtype='<i8').view(COLONNES[4][1]),
+        'utilisateur_id': np.array([-1 if u is None else u for u in utilisateurs], dtype=COLONNES[5][1]),
+    }
+
+
+def exporter(repertoire=None, complet=False, marge=60, taille_lot=100000):
+    """
+    Ajoute à l'export les mouvements d'id supérieur au dernier exporté
+    (tout l'historique si `complet` ou au premier appel).
+
+    Retourne le nombre de lignes ajoutées.
+    """
+    from .models import Mouvement, MouvementArchive
+
+    _verifier_numpy()
+    repertoire = repertoire or repertoire_colonnes()
+    os.makedirs(repertoire, exist_ok=True)
+    meta = None if complet else lire_meta(repertoire)
+    if meta is not None and (meta.get('version') != VERSION
+                             or meta.get('colonnes') != dict(COLONNES)):
+        raise ValueError("Export existant dans un autre format: relancer avec complet=True")
+    if meta is None:
+        meta = {
+            'version': VERSION,
+            'lignes': 0,
+            'dernier_id': 0,
+            'colonnes': dict(COLONNES),
+            'types': {str(code): nom for nom, code in TYPES.items()},
+            'fuseau': 'UTC',
+        }
+
+    limite = timezone.now() - timedelta(seconds=marge)
+    ajoutees = 0
+    while True:
+        lignes = _lot((MouvementArchive, Mouvement), meta['dernier_id'], limite, taille_lot)
+        if not lignes:
+            break
+        for nom, tableau in _en_colonnes(lignes).items():
+            _ajouter(os.path.join(repertoire, f'{nom}.npy'), tableau, meta['lignes'])
+        meta['lignes'] += len(lignes)
+        meta['dernier_id'] = lignes[-1][0]
+        meta['mis_a_jour'] = timezone.now().isoformat()
+        _ecrire_meta(repertoire, meta)
+        ajoutees += len(lignes)
+
+    if complet and ajoutees == 0:
+        # Export complet d'un historique vide: colonnes vides mais valides
+        for nom, dtype in COLONNES:
+            with open(os.path.join(repertoire, f'{nom}.npy'), 'wb') as f:
+                f.write(_entete(dtype, 0))
+        meta['mis_a_jour'] = timezone.now().isoformat()
+        _ecrire_meta(repertoire, meta)
+    return ajoutees
+
+
+def charger(repertoire=None):
+    """
+    {colonne: tableau} des lignes validées, en memmap lecture seule (aucune
+    copie: seules les pages lues sont chargées).
+    """
+    _verifier_numpy()
+    repertoire = repertoire or repertoire_colonnes()
+    meta = lire_meta(repertoire)
+    if meta is None:
+        raise FileNotFoundError(f"Aucun export de mouvements dans {repertoire}")
+    return {
+        nom: np.load(os.path.join(repertoire, f'{nom}.npy'), mmap_mode='r')[:meta['lignes']]
+        for nom in meta['colonnes']
+    }
+
+
+def sorties_par_produit(colonnes, debut=None, fin=None):
+    """
+    Total des sorties par produit sur [debut, fin[ (datetimes aware, ou None),
+    en un passage vectorisé. Retourne (produit_ids, totaux).
+    """
+    masque = colonnes['type'] == TYPES['SORTIE']
+    if debut is not None:
+        masque &= colonnes['date'] >= np.datetime64((debut - _EPOCH) // _MICROSECONDE, 'us')
+    if fin is not None:
+        masque &= colonnes['date'] < np.datetime64((fin - _EPOCH) // _MICROSECONDE, 'us')
+    totaux = np.bincount(colonnes['produit_id'][masque], weights=colonnes['quantite'][masque])
+    produits = np.nonzero(totaux)[0]
+    return produits, totaux[produits]
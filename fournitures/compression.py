@@ -0,0 +1,156 @@
+"""
+Compression des réponses dynamiques (HTML, JSON, CSV).
+
+L'encodage est négocié par requête d'après Accept-Encoding: brotli si le
+module `brotli` est installé et accepté par le client, sinon gzip. Les
+réponses en flux (StreamingHttpResponse) sont compressées morceau par
+morceau sans être mises en mémoire.
+
+Le temps CPU de compression et les octets économisés sont cumulés par vue,
+dans le processus courant (statistiques_compression()).
+"""
+import threading
+import time
+import zlib
+
+try:
+    import brotli
+except ImportError:  # gzip uniquement
+    brotli = None
+
+NIVEAU_GZIP = 6
+# Qualité 11 (maximale) trop coûteuse pour du contenu généré à chaque requête
+QUALITE_BROTLI = 5
+
+
+def negocier(accept_encoding):
+    """Encodage à utiliser ('br', 'gzip') d'après l'en-tête Accept-Encoding, ou None"""
+    acceptes = {}
+    for element in accept_encoding.split(','):
+        nom, _, parametres = element.strip().partition(';')
+        q = 1.0
+        parametres = parametres.strip()
+        if parametres.startswith('q='):
+            try:
+                q = float(parametres[2:])
+            except ValueError:
+                q = 0.0
+        if nom:
+            acceptes[nom.strip().lower()] = q
+
+    joker = acceptes.get('*', 0.0)
+    candidats = (['br'] if brotli is not None else []) + ['gzip']
+    for encodage in candidats:
+        if acceptes.get(encodage, joker) > 0:
+            return encodage
+    return None
+
+
+class _Gzip:
+    def __init__(self):
+        self._zlib = zlib.compressobj(NIVEAU_GZIP, zlib.DEFLATED, 31)
+
+    def compress(self, donnees):
+        return self._zlib.compress(donnees)
+
+    def flush(self):
+        return self._zlib.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._brotli = brotli.Compressor(quality=QUALITE_BROTLI)
+
+    def compress(self, donnees):
+        return self._brotli.process(donnees)
+
+    def flush(self):
+        return self._brotli.finish()
+
+
+def compresseur(encodage):
+    """Compresseur incrémental (compress / flush) pour l'encodage négocié"""
+    return _Brotli() if encodage == 'br' else _Gzip()
+
+
+_statistiques = {}
+_verrou = threading.Lock()
+
+
+def enregistrer(vue, octets_bruts, octets_compresses, cpu):
+    """Cumule une réponse compressée dans les statistiques de la vue"""
+    with _verrou:
+        stats = _statistiques.setdefault(vue, [0, 0, 0, 0.0])
+        stats[0] += 1
+        stats[1] += octets_bruts
+        stats[2] += octets_compresses
+        stats[3] += cpu
+
+
+def statistiques_compression():
+    """Statistiques par vue depuis le démarrage du processus, les plus gros gains d'abord"""
+    with _verrou:
+        lignes = [
+            {
+                'vue': vue,
+                'reponses': reponses,
+                'octets_bruts': bruts,
+                'octets_compresses': compresses,
+                'octets_economises': bruts - compresses,
+                'ratio': round(compresses / bruts, 3) if bruts else None,
+                'cpu_ms': round(cpu * 1000, 2),
+                'cpu_ms_par_reponse': round(cpu * 1000 / reponses, 3) if reponses else None,
+            }
+            for vue, (reponses, bruts, compresses, cpu) in _statistiques.items()
+        ]
+    return sorted(lignes, key=lambda l: l['octets_economises'], reverse=True)
+
+
+def compresser_contenu(encodage, contenu):
+    """Compresse un contenu complet, retourne (contenu compressé, temps CPU)"""
+    debut = time.thread_time()
+    c = compresseur(encodage)
+    resultat = c.compress(contenu) + c.flush()
+    return resultat, time.thread_time() - debut
+
+
+def compresser_flux(encodage, morceaux, vue):
+    """Compresse un itérateur de morceaux; les statistiques sont enregistrées en fin de flux"""
+    c = compresseur(encodage)
+    bruts = compresses = 0
+    cpu = 0.0
+    for morceau in morceaux:
+        bruts += len(morceau)
+        debut = time.thread_time()
+        sortie = c.compress(morceau)
+        cpu += time.thread_time() - debut
+        if sortie:
+            compresses += len(sortie)
+            yield sortie
+    debut = time.thread_time()
+    sortie = c.flush()
+    cpu += time.thread_time() - debut
+    compresses += len(sortie)
+    enregistrer(vue, bruts, compresses, cpu)
+    yield sortie
+
+
+async def compresser_flux_async(encodage, morceaux, vue):
+    """Variante de compresser_flux pour les réponses en flux asynchrones"""
+    c = compresseur(encodage)
+    bruts = compresses = 0
+    cpu = 0.0
+    async for morceau in morceaux:
+        bruts += len(morceau)
+        debut = time.thread_time()
+        sortie = c.compress(morceau)
+        cpu += time.thread_time() - debut
+        if sortie:
+            compresses += len(sortie)
+            yield sortie
+    debut = time.thread_time()
+    sortie = c.flush()
+    cpu += time.thread_time() - debut
+    compresses += len(sortie)
+    enregistrer(vue, bruts, compresses, cpu)
+    yield sortie
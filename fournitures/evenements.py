@@ -0,0 +1,190 @@
+"""
+Diffusion d'événements temps réel vers le tableau de bord (Server-Sent Events).
+
+Les chemins d'écriture publient de petits deltas (mouvement, changement de
+statut de commande, nouvelle alerte) après validation de la transaction.
+Deux brokers sont disponibles via settings.EVENEMENTS_BROKER:
+
+- 'base' (défaut): table EvenementTableauBord interrogée par les flux,
+  partagée entre tous les workers;
+- 'memoire': tampon circulaire dans le processus. Un flux ne voit que les
+  événements publiés par son propre processus: réservé au développement et
+  aux déploiements à un seul worker (refusé si WEB_CONCURRENCY > 1).
+"""
+import os
+import threading
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+
+
+class BrokerMemoire:
+    """Tampon circulaire en mémoire, numéroté par une séquence croissante"""
+
+    def __init__(self, taille=1000):
+        self._evenements = deque(maxlen=taille)
+        self._sequence = 0
+        self._verrou = threading.Lock()
+
+    def publier(self, type_evenement, donnees):
+        with self._verrou:
+            self._sequence += 1
+            self._evenements.append((self._sequence, type_evenement, donnees))
+
+    def publier_plusieurs(self, evenements):
+        with self._verrou:
+            for type_evenement, donnees in evenements:
+                self._sequence += 1
+                self._evenements.append((self._sequence, type_evenement, donnees))
+
+    def depuis(self, sequence, limite=200):
+        with self._verrou:
+            return [e for e in self._evenements if e[0] > sequence][:limite]
+
+    def dernier(self):
+        return self._sequence
+
+
+class BrokerBase:
+    """Événements stockés en base: chaque flux interroge les lignes d'id supérieur"""
+    RETENTION = timedelta(hours=24)
+
+    def publier(self, type_evenement, donnees):
+        from .models import EvenementTableauBord
+
+        evenement = EvenementTableauBord.objects.create(type_evenement=type_evenement, donnees=donnees)
+        # Purge occasionnelle plutôt qu'une tâche planifiée dédiée
+        if evenement.id % 1000 == 0:
+            EvenementTableauBord.objects.filter(date__lt=timezone.now() - self.RETENTION).delete()
+
+    def publier_plusieurs(self, evenements):
+        """Insertion groupée (saisies en lot)"""
+        from .models import EvenementTableauBord
+
+        if evenements:
+            EvenementTableauBord.objects.bulk_create(
+                [EvenementTableauBord(type_evenement=t, donnees=d) for t, d in evenements], batch_size=1000
+            )
+            EvenementTableauBord.objects.filter(date__lt=timezone.now() - self.RETENTION).delete()
+
+    def depuis(self, sequence, limite=200):
+        from .models import EvenementTableauBord
+
+        return list(
+            EvenementTableauBord.objects.filter(id__gt=sequence).order_by('id').values_list(
+                'id', 'type_evenement', 'donnees'
+            )[:limite]
+        )
+
+    def dernier(self):
+        from .models import EvenementTableauBord
+
+        dernier = EvenementTableauBord.objects.order_by('-id').values_list('id', flat=True).first()
+        return dernier or 0
+
+
+_broker = None
+_verrou_broker = threading.Lock()
+
+
+def get_broker():
+    """Broker configuré (instance unique par processus)"""
+    global _broker
+    if _broker is None:
+        with _verrou_broker:
+            if _broker is None:
+                if getattr(settings, 'EVENEMENTS_BROKER', 'base') == 'memoire':
+                    if int(os.environ.get('WEB_CONCURRENCY') or 1) > 1:
+                        raise ImproperlyConfigured(
+                            "EVENEMENTS_BROKER='memoire' ne fonctionne qu'avec un seul worker "
+                            "(WEB_CONCURRENCY > 1): utiliser 'base'"
+                        )
+                    _broker = BrokerMemoire()
+                else:
+                    _broker = BrokerBase()
+    return _broker
+
+
+def publier(type_evenement, donnees):
+    """Publie un événement une fois la transaction courante validée"""
+    transaction.on_commit(lambda: get_broker().publier(type_evenement, donnees))
+
+
+def publier_mouvements(mouvement_ids):
+    """
+    Publie les mouvements créés (et les alertes qu'ils déclenchent) après validation.
+
+    Les données sont lues en une requête au moment du commit, pour refléter le
+    stock effectivement enregistré.
+    """
+    mouvement_ids = list(mouvement_ids)
+    if mouvement_ids:
+        transaction.on_commit(lambda: _diffuser_mouvements(mouvement_ids))
+
+
+def _diffuser_mouvements(mouvement_ids):
+    from .models import Mouvement
+
+    mouvements = list(Mouvement.objects.filter(id__in=mouvement_ids).select_related(
+        'produit', 'utilisateur'
+    ).order_by('id'))
+
+    # Stock après chaque mouvement, en remontant depuis le stock enregistré
+    # (un lot peut contenir plusieurs mouvements du même produit)
+    stocks_apres = {}
+    courant = {}
+    for m in reversed(mouvements):
+        stock = courant.get(m.produit_id, float(m.produit.stock))
+        stocks_apres[m.id] = stock
+        quantite = float(m.quantite)
+        courant[m.produit_id] = stock - quantite if m.type_mouvement == 'ENTREE' else stock + quantite
+
+    evenements = []
+    for m in mouvements:
+        produit = m.produit
+        quantite = float(m.quantite)
+        stock = stocks_apres[m.id]
+        stock_avant = stock - quantite if m.type_mouvement == 'ENTREE' else stock + quantite
+        etait_en_alerte = stock_avant <= produit.seuil_alerte
+        en_alerte = stock <= produit.seuil_alerte
+
+        evenements.append(('mouvement', {
+            'id': m.id,
+            'date': timezone.localtime(m.date).strftime('%d/%m %H:%M'),
+            'produit_id': produit.id,
+            'reference': produit.reference,
+            'designation': produit.designation,
+            'unite': produit.unite,
+            'type_mouvement': m.type_mouvement,
+            'quantite': quantite,
+            'stock': stock,
+            'utilisateur': m.utilisateur.username if m.utilisateur else None,
+            # Variation du nombre de produits en alerte
+            'alerte_delta': int(en_alerte) - int(etait_en_alerte),
+        }))
+        if en_alerte and not etait_en_alerte:
+            evenements.append(('alerte', {
+                'produit_id': produit.id,
+                'reference': produit.reference,
+                'designation': produit.designation,
+                'stock': stock,
+                'seuil_alerte': produit.seuil_alerte,
+            }))
+    get_broker().publier_plusieurs(evenements)
+
+
+def publier_statut_commande(commande, ancien_statut):
+    """Publie un changement de statut de commande (delta pour les compteurs)"""
+    if commande.status == ancien_statut:
+        return
+    publier('commande', {
+        'id': commande.id,
+        'numero': commande.numero,
+        'ancien_statut': ancien_statut,
+        'statut': commande.status,
+        'statut_libelle': commande.get_status_display(),
+    })
@@ -1,7 +1,8 @@
 from django import forms
 from django.core.exceptions import ValidationError
 from django.db.models import Q
-from .models import Fourniture, Mouvement, Commande, TypeFourniture
+from .catalogue import brancher, catalogue
+from .models import Fourniture, Mouvement, Commande, TypeFourniture, LieuStockage
 import re
 import time
 
@@ -9,22 +10,31 @@ import time
 class MouvementForm(forms.ModelForm):
     class Meta:
         model = Mouvement
-        fields = ['produit', 'type_mouvement', 'quantite', 'notes']
+        fields = ['produit', 'lieu', 'type_mouvement', 'quantite', 'cout_unitaire', 'notes']
         widgets = {
             'produit': forms.Select(attrs={
                 'class': 'form-control',
                 'onchange': 'updateProductInfo()'
             }),
+            'lieu': forms.Select(attrs={
+                'class': 'form-control'
+            }),
             'type_mouvement': forms.Select(attrs={
                 'class': 'form-control',
                 'onchange': 'updateValidation()'
             }),
             'quantite': forms.NumberInput(attrs={
                 'class': 'form-control',
-                'min': '0.01',
-                'step': '0.01',
+                'min': '1',
+                'step': '1',
                 'placeholder': 'Quantité'
             }),
+            'cout_unitaire': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': '0',
+                'step': '0.0001',
+                'placeholder': 'Coût moyen si vide'
+            }),
             'notes': forms.Textarea(attrs={
                 'class': 'form-control',
                 'rows': 3,
@@ -33,8 +43,10 @@ class MouvementForm(forms.ModelForm):
         }
         labels = {
             'produit': 'Fourniture',
+            'lieu': 'Lieu',
             'type_mouvement': 'Type de mouvement',
             'quantite': 'Quantité',
+            'cout_unitaire': "Coût unitaire d'achat (entrées)",
             'notes': 'Notes (optionnel)',
         }
 
@@ -42,10 +54,12 @@ class MouvementForm(forms.ModelForm):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
 
-        # Filtrer seulement les produits actifs
-        self.fields['produit'].queryset = Fourniture.objects.filter(
-            actif=True
-        ).select_related('type').order_by('designation')
+        # Produits actifs, lus dans le catalogue du processus
+        brancher(self.fields['produit'], catalogue.produits_actifs, Fourniture.objects.filter(actif=True))
+
+        # Lieux actifs, le lieu par défaut étant utilisé si aucun n'est choisi
+        self.fields['lieu'].queryset = LieuStockage.objects.filter(actif=True)
+        self.fields['lieu'].empty_label = "Lieu par défaut"
 
         # Initialiser les données pour le JS
         if self.instance and self.instance.pk and self.instance.produit:
@@ -60,6 +74,9 @@ class MouvementForm(forms.ModelForm):
         quantite = self.cleaned_data.get('quantite')
         if quantite is None or quantite <= 0:
             raise forms.ValidationError("La quantité doit être supérieure à 0.")
+        # Le stock est un nombre entier d'unités
+        if quantite != quantite.to_integral_value():
+            raise forms.ValidationError("La quantité doit être un nombre entier.")
         return quantite
 
     def clean(self):
@@ -175,8 +192,8 @@ class FournitureForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        # Trier les types par nom
-        self.fields['type'].queryset = TypeFourniture.objects.all().order_by('nom')
+        # Types triés par nom, lus dans le catalogue du processus
+        brancher(self.fields['type'], catalogue.types, TypeFourniture.objects.all())
 
         # Pour les nouvelles fournitures, actif est True par défaut
         if not self.instance.pk:
@@ -368,7 +385,7 @@ class CommandeForm(forms.ModelForm):
 
     class Meta:
         model = Commande
-        fields = ['produit', 'quantite', 'notes']
+        fields = ['produit', 'quantite', 'prix_unitaire', 'notes']
         widgets = {
             'produit': forms.Select(attrs={
                 'class': 'form-control',
@@ -382,6 +399,12 @@ class CommandeForm(forms.ModelForm):
                 'placeholder': 'Quantité à commander',
                 'id': 'id_quantite_input'
             }),
+            'prix_unitaire': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': '0',
+                'step': '0.0001',
+                'placeholder': 'Prix unitaire HT',
+            }),
             'notes': forms.Textarea(attrs={
                 'class': 'form-control',
                 'rows': 3,
@@ -392,11 +415,13 @@ class CommandeForm(forms.ModelForm):
         labels = {
             'produit': 'Produit *',
             'quantite': 'Quantité à commander *',
+            'prix_unitaire': 'Prix unitaire (optionnel)',
             'notes': 'Notes (optionnel)',
         }
         help_texts = {
             'produit': 'Sélectionnez le produit à commander',
             'quantite': 'Quantité souhaitée',
+            'prix_unitaire': "Valorise l'entrée en stock à la réception",
             'notes': 'Informations supplémentaires',
         }
 
@@ -407,9 +432,7 @@ class CommandeForm(forms.ModelForm):
         self.fields['quantite_suggeree'].initial = 0
 
         # Filtrer les produits actifs seulement
-        self.fields['produit'].queryset = Fourniture.objects.filter(
-            actif=True
-        ).select_related('type').order_by('designation')
+        brancher(self.fields['produit'], catalogue.produits_actifs, Fourniture.objects.filter(actif=True))
 
         # Si c'est une modification, désactiver la modification du produit
         if self.instance and self.instance.pk:
@@ -423,7 +446,7 @@ class CommandeForm(forms.ModelForm):
 
         # Préparer les données pour JavaScript
         produits_data = {}
-        for produit in self.fields['produit'].queryset:
+        for produit in Fourniture.annoter_quantite_validee(self.fields['produit'].queryset):
             quantite_a_commander = self._calculer_quantite_suggeree(produit)
             produits_data[produit.id] = {
                 'quantite_a_commander': quantite_a_commander,
@@ -612,9 +635,7 @@ class AjustementStockForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['produit'].queryset = Fourniture.objects.filter(
-            actif=True
-        ).order_by('designation')
+        brancher(self.fields['produit'], catalogue.produits_actifs, Fourniture.objects.filter(actif=True))
 
         # Initialiser les valeurs pour ancien_stock
         if self.instance and self.instance.pk and self.instance.produit:
@@ -756,6 +777,10 @@ class RechercheFournitureForm(forms.Form):
         })
     )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        brancher(self.fields['type'], catalogue.types, TypeFourniture.objects.all())
+
 
 class CommandeDepuisDashboardForm(forms.ModelForm):
     """Formulaire spécial pour créer des commandes depuis le dashboard"""
@@ -0,0 +1,179 @@
+"""
+Stock et valeur à une date donnée à partir des photos de stock (StockSnapshot).
+
+Le stock en fin de journée J est obtenu à partir de la photo la plus proche
+de J, corrigée du solde des mouvements entre la photo et J. Sans photo
+exploitable, on repart du stock actuel et on remonte les mouvements
+postérieurs à J. Le coût est donc borné par le nombre de mouvements entre
+J et la photo la plus proche, pas par la taille de l'historique.
+
+La valeur suit le même chemin: chaque mouvement porte le coût unitaire qui
+l'a valorisé, si bien que la valeur du stock (Fourniture.valeur_stock, tenue
+au coût moyen pondéré) se reconstitue à date comme la quantité. La valeur
+actuelle, totale ou par type, est une simple somme sur les fournitures.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Max, Min, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .archivage import solde_resumes
+from .models import Fourniture, Mouvement, StockSnapshot, TypeFourniture
+
+
+def debut_de_journee(jour):
+    """Instant (aware) qui commence la journée `jour`, dans le fuseau courant"""
+    return timezone.make_aware(datetime.combine(jour, time.min))
+
+
+def fin_de_journee(jour):
+    """Instant (aware) qui termine la journée `jour`, dans le fuseau courant"""
+    return debut_de_journee(jour + timedelta(days=1))
+
+
+def solde_mouvements(debut, fin, produit_ids=None, valeur=False):
+    """
+    Solde (entrées - sorties) par produit des mouvements dans [debut, fin[,
+    archives comprises; en valeur (quantité × coût unitaire) si `valeur`.
+    """
+    mouvements = Mouvement.objects.all()
+    if debut is not None:
+        mouvements = mouvements.filter(date__gte=debut)
+    if fin is not None:
+        mouvements = mouvements.filter(date__lt=fin)
+    if produit_ids is not None:
+        mouvements = mouvements.filter(produit_id__in=produit_ids)
+
+    montant = F('quantite') * Coalesce('cout_unitaire', Value(Decimal('0'))) if valeur else F('quantite')
+    lignes = mouvements.values('produit_id').annotate(
+        solde=Sum(Case(
+            When(type_mouvement='ENTREE', then=montant),
+            default=-montant,
+            output_field=DecimalField(max_digits=16, decimal_places=4),
+        ))
+    ).order_by()
+    soldes = {ligne['produit_id']: ligne['solde'] or Decimal('0') for ligne in lignes}
+
+    # Mouvements archivés: totaux journaliers (les bornes sont des débuts de journée)
+    archives = solde_resumes(
+        timezone.localdate(debut) if debut is not None else None,
+        timezone.localdate(fin) if fin is not None else None,
+        produit_ids,
+        valeur=valeur,
+    )
+    for pid, solde in archives.items():
+        soldes[pid] = soldes.get(pid, Decimal('0')) + (solde or Decimal('0'))
+    return soldes
+
+
+def prendre_snapshots(jour=None):
+    """
+    Enregistre le stock et la valeur de fin de journée de tous les produits pour `jour` (hier par défaut).
+
+    Ils sont déduits des valeurs actuelles moins les mouvements postérieurs à `jour`,
+    ce qui permet aussi de reconstituer une photo passée.
+    """
+    jour = jour or timezone.localdate() - timedelta(days=1)
+    fin = fin_de_journee(jour)
+    posterieurs = solde_mouvements(fin, None)
+    valeurs_posterieures = solde_mouvements(fin, None, valeur=True)
+
+    snapshots = [
+        StockSnapshot(
+            produit_id=pid, date=jour,
+            stock=Decimal(stock) - posterieurs.get(pid, Decimal('0')),
+            valeur=valeur - valeurs_posterieures.get(pid, Decimal('0')),
+        )
+        for pid, stock, valeur in Fourniture.objects.filter(date_creation__lt=fin).values_list(
+            'id', 'stock', 'valeur_stock')
+    ]
+    StockSnapshot.objects.bulk_create(
+        snapshots,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['produit', 'date'],
+        update_fields=['stock', 'valeur'],
+    )
+    return len(snapshots)
+
+
+def stock_a_date(jour, produit_ids=None):
+    """
+    Retourne {produit_id: stock} en fin de journée `jour`.
+
+    Les produits créés après `jour` sont exclus.
+    """
+    return _a_date(jour, produit_ids, valeur=False)
+
+
+def valeur_a_date(jour, produit_ids=None):
+    """Retourne {produit_id: valeur du stock} en fin de journée `jour` (mêmes règles que stock_a_date)"""
+    return _a_date(jour, produit_ids, valeur=True)
+
+
+def valeur_par_type(jour=None):
+    """
+    Valeur du stock par type, [(type_id, nom, valeur)] triés par nom: somme
+    des valeurs tenues à jour, ou des valeurs à `jour` s'il est passé.
+    """
+    if jour is None or jour >= timezone.localdate():
+        return [
+            (ligne['type_id'], ligne['type__nom'], ligne['valeur'])
+            for ligne in Fourniture.objects.values('type_id', 'type__nom').annotate(
+                valeur=Sum('valeur_stock')).order_by('type__nom')
+        ]
+    valeurs = valeur_a_date(jour)
+    totaux = {}
+    for pid, type_id in Fourniture.objects.filter(id__in=list(valeurs)).values_list('id', 'type_id'):
+        totaux[type_id] = totaux.get(type_id, Decimal('0')) + valeurs[pid]
+    noms = dict(TypeFourniture.objects.filter(id__in=list(totaux)).values_list('id', 'nom'))
+    return sorted(((tid, noms.get(tid, ''), v) for tid, v in totaux.items()), key=lambda t: t[1])
+
+
+def _a_date(jour, produit_ids, valeur):
+    """{produit_id: stock ou valeur} en fin de journée `jour`"""
+    fin = fin_de_journee(jour)
+    champ = 'valeur' if valeur else 'stock'
+    produits = Fourniture.objects.filter(date_creation__lt=fin)
+    if produit_ids is not None:
+        produits = produits.filter(id__in=produit_ids)
+    actuels = dict(produits.values_list('id', 'valeur_stock' if valeur else 'stock'))
+    ids = list(actuels)
+
+    photos = StockSnapshot.objects.all()
+    if produit_ids is not None:
+        photos = photos.filter(produit_id__in=ids)
+    avant = photos.filter(date__lte=jour).aggregate(d=Max('date'))['d']
+    apres = photos.filter(date__gt=jour).aggregate(d=Min('date'))['d']
+
+    # Choisir la photo la plus proche: moins de mouvements à rejouer
+    reference = None
+    if avant and (not apres or (jour - avant) <= (apres - jour)):
+        reference = avant
+    elif apres:
+        reference = apres
+
+    resultat = {}
+    if reference is not None:
+        filtre = ids if produit_ids is not None else None
+        fin_reference = fin_de_journee(reference)
+        if reference <= jour:
+            ecarts = solde_mouvements(fin_reference, fin, filtre, valeur)
+            signe = 1
+        else:
+            ecarts = solde_mouvements(fin, fin_reference, filtre, valeur)
+            signe = -1
+        for pid, stock in photos.filter(date=reference).values_list('produit_id', champ):
+            if pid in actuels:
+                resultat[pid] = stock + signe * ecarts.get(pid, Decimal('0'))
+
+    # Produits sans photo de référence: remonter depuis le stock actuel
+    manquants = [pid for pid in ids if pid not in resultat]
+    if manquants:
+        posterieurs = solde_mouvements(fin, None, manquants, valeur)
+        for pid in manquants:
+            resultat[pid] = Decimal(actuels[pid]) - posterieurs.get(pid, Decimal('0'))
+
+    return resultat
@@ -0,0 +1,50 @@
+"""
+Commande: python manage.py archiver_historique [--annees N] [--format table|ndjson] [--taille-lot N]
+
+Déplace hors des tables principales les mouvements de plus de N ans et les
+commandes reçues ou annulées de plus de N ans, après en avoir cumulé les
+totaux dans les résumés (voir fournitures/archivage.py). Purge aussi les
+clés d'idempotence expirées de la saisie en lot.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from fournitures import archivage
+from fournitures.models import CleIdempotence, Mouvement
+
+
+class Command(BaseCommand):
+    help = "Archive les mouvements anciens et les commandes clôturées"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--annees', type=int, default=3,
+                            help="Ancienneté minimale en années (défaut: 3)")
+        parser.add_argument('--format', choices=archivage.FORMATS, default='table',
+                            help="Tables d'archive ou fichiers NDJSON compressés (défaut: table)")
+        parser.add_argument('--taille-lot', type=int, default=5000,
+                            help="Lignes par transaction (défaut: 5000)")
+        parser.add_argument('--mouvements-seulement', action='store_true', help="Ne pas archiver les commandes")
+        parser.add_argument('--simulation', action='store_true',
+                            help="Afficher ce qui serait archivé sans rien modifier")
+
+    def handle(self, *args, **options):
+        if options['annees'] < 1:
+            raise CommandError("--annees doit être au moins 1")
+        if options['taille_lot'] < 1:
+            raise CommandError("--taille-lot doit être positive")
+
+        avant = archivage.date_limite(options['annees'])
+        self.stdout.write(f"Archivage des données antérieures au {avant:%d/%m/%Y} ({options['format']})")
+
+        if options['simulation']:
+            mouvements = Mouvement.objects.filter(date__lt=avant).count()
+            commandes = 0 if options['mouvements_seulement'] else archivage.commandes_archivables(avant).count()
+            self.stdout.write(f"{mouvements} mouvement(s) et {commandes} commande(s) à archiver")
+            return
+
+        # Mouvements d'abord: les commandes liées à des mouvements non archivés sont conservées
+        mouvements = archivage.archiver_mouvements(avant, options['format'], options['taille_lot'])
+        self.stdout.write(self.style.SUCCESS(f"{mouvements} mouvement(s) archivé(s)"))
+        if not options['mouvements_seulement']:
+            commandes = archivage.archiver_commandes(avant, options['format'], options['taille_lot'])
+            self.stdout.write(self.style.SUCCESS(f"{commandes} commande(s) archivée(s)"))
+        self.stdout.write(f"{CleIdempotence.purger()} clé(s) d'idempotence expirée(s) supprimée(s)")
@@ -0,0 +1,106 @@
+"""
+Commande: python manage.py bench_api [--requetes N] [--concurrence C] [--utilisateur NOM]
+                                     [--autoriser-base]
+
+Compare les endpoints JSON servis par le gestionnaire WSGI (threads) et par
+le gestionnaire ASGI (coroutines) avec les clients de test de Django,
+dans le processus courant et sur la base configurée (sessions de test
+écrites en base, charge sur le serveur): hors DEBUG, la commande refuse de
+s'exécuter sans --autoriser-base.
+"""
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+
+from fournitures.models import Fourniture
+
+
+def _resume(nom, durees, total):
+    durees = sorted(durees)
+    p95 = durees[int(len(durees) * 0.95) - 1] if len(durees) >= 20 else durees[-1]
+    return (f"{nom:<6} {len(durees) / total:8.1f} req/s  "
+            f"p50={statistics.median(durees) * 1000:6.1f} ms  p95={p95 * 1000:6.1f} ms")
+
+
+class Command(BaseCommand):
+    help = "Compare le débit des endpoints JSON en WSGI (threads) et en ASGI (asyncio)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requetes', type=int, default=500, help="Nombre total de requêtes")
+        parser.add_argument('--concurrence', type=int, default=20, help="Requêtes simultanées")
+        parser.add_argument('--utilisateur', help="Utilisateur connecté (défaut: premier superutilisateur)")
+        parser.add_argument('--autoriser-base', action='store_true',
+                            help="Autoriser l'exécution sur la base configurée quand DEBUG est désactivé")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['autoriser_base']:
+            raise CommandError(
+                f"DEBUG est désactivé: la base {connection.settings_dict['NAME']!r} est peut-être celle de "
+                "production. Relancer sur une base de test, ou avec --autoriser-base"
+            )
+        setup_test_environment()
+
+        utilisateurs = User.objects.filter(is_active=True)
+        if options['utilisateur']:
+            utilisateurs = utilisateurs.filter(username=options['utilisateur'])
+        utilisateur = utilisateurs.order_by('-is_superuser', 'id').first()
+        produit = Fourniture.objects.filter(actif=True).first()
+        if utilisateur is None or produit is None:
+            raise CommandError("Il faut au moins un utilisateur actif et une fourniture active")
+
+        urls = [
+            reverse('api_produit_info', args=[produit.id]),
+            reverse('api_recherche_fournitures') + '?q=' + (produit.designation[:3] or 'F0'),
+            reverse('api_donnees_graphiques'),
+        ]
+        n, concurrence = options['requetes'], options['concurrence']
+
+        client = Client()
+        client.force_login(utilisateur)
+        cookies = client.cookies
+
+        # WSGI: un thread occupé par requête en cours
+        def appel_wsgi(i):
+            c = Client()
+            c.cookies = cookies
+            debut = time.perf_counter()
+            reponse = c.get(urls[i % len(urls)])
+            assert reponse.status_code == 200, reponse.status_code
+            return time.perf_counter() - debut
+
+        debut = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrence) as pool:
+            durees_wsgi = list(pool.map(appel_wsgi, range(n)))
+        total_wsgi = time.perf_counter() - debut
+
+        # ASGI: coroutines, le nombre de requêtes en vol est borné par un sémaphore
+        async def campagne_asgi():
+            semaphore = asyncio.Semaphore(concurrence)
+            c = AsyncClient()
+            c.cookies = cookies
+
+            async def appel(i):
+                async with semaphore:
+                    debut_appel = time.perf_counter()
+                    reponse = await c.get(urls[i % len(urls)])
+                    assert reponse.status_code == 200, reponse.status_code
+                    return time.perf_counter() - debut_appel
+
+            return await asyncio.gather(*(appel(i) for i in range(n)))
+
+        debut = time.perf_counter()
+        durees_asgi = asyncio.run(campagne_asgi())
+        total_asgi = time.perf_counter() - debut
+
+        self.stdout.write(f"{n} requêtes, concurrence {concurrence}, {len(urls)} endpoints")
+        self.stdout.write(_resume('WSGI', durees_wsgi, total_wsgi))
+        self.stdout.write(_resume('ASGI', durees_asgi, total_asgi))
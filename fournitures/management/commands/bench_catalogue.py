@@ -0,0 +1,94 @@
+"""
+Commande: python manage.py bench_catalogue [--produits N] [--types N]
+
+Mesure la mémoire occupée par le catalogue en mémoire (fournitures/catalogue.py)
+pour N fournitures synthétiques (index, listes triées et comptes par type
+compris), puis le coût de ses rafraîchissements sur la base courante:
+chargement complet, vérification du tampon sans changement et
+rechargement incrémental après modification d'une fourniture.
+"""
+import gc
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from fournitures.catalogue import Catalogue, ProduitCatalogue, TypeCatalogue
+from fournitures.models import Fourniture
+
+UNITES = [code for code, _ in Fourniture.UNITE_CHOICES]
+
+
+class Command(BaseCommand):
+    help = "Mémoire et coût de rafraîchissement du catalogue en mémoire"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produits', type=int, default=100000, help="Fournitures synthétiques (défaut: 100000)")
+        parser.add_argument('--types', type=int, default=50, help="Types synthétiques (défaut: 50)")
+
+    def handle(self, *args, **options):
+        if options['produits'] < 1 or options['types'] < 1:
+            raise CommandError("--produits et --types doivent être positifs")
+        self._memoire(options['produits'], options['types'])
+        self._rafraichissements()
+
+    def _memoire(self, n, nombre_types):
+        gc.collect()
+        tracemalloc.start()
+        avant = tracemalloc.take_snapshot()
+
+        cat = Catalogue()
+        cat._types = {i: TypeCatalogue(i, f"Type de fourniture {i}") for i in range(1, nombre_types + 1)}
+        # Chaînes construites comme les renverrait la base (objets distincts par ligne)
+        cat._produits = {
+            i: ProduitCatalogue(i, f"F{i:06d}", f"Fourniture de bureau numéro {i} modèle standard",
+                                i % nombre_types + 1, UNITES[i % len(UNITES)], 100, 10, i % 10 != 0)
+            for i in range(1, n + 1)
+        }
+        cat._compter_par_type()
+        cat._charge_a = cat._verifie_a = time.monotonic() + 3600
+        cat._a_verifier = False
+        cat.types()
+        cat.produits_actifs()
+
+        gc.collect()
+        apres = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        total = sum(stat.size_diff for stat in apres.compare_to(avant, 'filename'))
+        self.stdout.write(
+            f"Mémoire pour {n} fournitures et {nombre_types} types: {total / 1024 / 1024:.1f} Mo "
+            f"({total / n:.0f} octets par fourniture)"
+        )
+        del cat
+
+    def _rafraichissements(self):
+        cat = Catalogue()
+        produit = Fourniture.objects.order_by('id').first()
+        if produit is None:
+            self.stdout.write("Base vide: rafraîchissements non mesurés")
+            return
+
+        self._mesurer("chargement complet", cat.rafraichir)
+        cat.invalider()
+        self._mesurer("tampon inchangé", cat.rafraichir)
+
+        # Ligne touchée comme par un mouvement de stock: le tampon ne change pas
+        Fourniture.objects.filter(pk=produit.pk).update(date_modification=timezone.now())
+        cat.invalider()
+        self._mesurer("après un mouvement", cat.rafraichir)
+
+        # Modification d'un champ du catalogue
+        Fourniture.objects.filter(pk=produit.pk).update(date_catalogue=timezone.now())
+        cat.invalider()
+        self._mesurer("rechargement incrémental", cat.rafraichir)
+        self.stdout.write(f"({len(cat._produits)} fournitures en base)")
+
+    def _mesurer(self, libelle, fonction):
+        with CaptureQueriesContext(connection) as requetes:
+            debut = time.perf_counter()
+            fonction()
+            duree = time.perf_counter() - debut
+        self.stdout.write(f"{libelle:<26} {len(requetes):>3} requête(s) {duree * 1000:8.1f} ms")
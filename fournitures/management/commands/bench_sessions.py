@@ -0,0 +1,101 @@
+"""
+Commande: python manage.py bench_sessions [--requetes N] [--utilisateur NOM]
+
+Compte les requêtes SQL par requête HTTP sur le tableau de bord et la liste
+du stock, avec sessions en base et utilisateur relu à chaque requête
+(configuration Django par défaut), puis avec la configuration courante
+(sessions cached_db, utilisateur en cache dans le worker). Les requêtes
+sont ventilées entre sessions, utilisateurs et le reste.
+"""
+import re
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment
+from django.urls import reverse
+
+from fournitures import authentification
+
+CONFIGURATIONS = [
+    ('avant', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+    }),
+    ('apres', {}),
+]
+VUES = ['dashboard', 'liste_stock']
+
+
+def _categorie(sql):
+    # Table principale de la requête (les jointures vers auth_user restent dans « autres »)
+    if 'django_session' in sql:
+        return 'sessions'
+    if re.search(r'FROM [`"]?auth_user[`"]?(\s|$)', sql) or re.match(r'(UPDATE|INSERT INTO) [`"]?auth_user', sql):
+        return 'utilisateurs'
+    return 'autres'
+
+
+class Command(BaseCommand):
+    help = "Requêtes SQL par requête HTTP avant/après le cache des sessions et de l'utilisateur"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requetes', type=int, default=20, help="Requêtes mesurées par vue")
+        parser.add_argument('--utilisateur', help="Utilisateur connecté (défaut: premier superutilisateur)")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        if options['requetes'] < 1:
+            raise CommandError("--requetes doit être positif")
+
+        utilisateurs = User.objects.filter(is_active=True)
+        if options['utilisateur']:
+            utilisateurs = utilisateurs.filter(username=options['utilisateur'])
+        utilisateur = utilisateurs.order_by('-is_superuser', 'id').first()
+        if utilisateur is None:
+            raise CommandError("Aucun utilisateur actif")
+
+        self.stdout.write(f"{'config':<6} {'vue':<12} {'total':>6} {'sessions':>9} {'utilis.':>8} "
+                          f"{'autres':>7} {'ms':>7}")
+        for nom, reglages in CONFIGURATIONS:
+            with override_settings(**reglages):
+                caches[settings.SESSION_CACHE_ALIAS].clear()
+                authentification.vider()
+                client = Client()
+                client.force_login(utilisateur)
+                for vue in VUES:
+                    self._mesurer(nom, vue, client, options['requetes'])
+
+    def _mesurer(self, nom, vue, client, n):
+        url = reverse(vue)
+        # Première requête hors mesure: caches et imports
+        client.get(url)
+
+        totaux = {'sessions': 0, 'utilisateurs': 0, 'autres': 0}
+        duree = 0.0
+        for _ in range(n):
+            captures = [CaptureQueriesContext(connections[alias]) for alias in connections]
+            for capture in captures:
+                capture.__enter__()
+            debut = time.perf_counter()
+            try:
+                reponse = client.get(url)
+            finally:
+                duree += time.perf_counter() - debut
+                for capture in captures:
+                    capture.__exit__(None, None, None)
+            if reponse.status_code != 200:
+                raise CommandError(f"{url}: statut {reponse.status_code}")
+            for capture in captures:
+                for requete in capture.captured_queries:
+                    totaux[_categorie(requete['sql'])] += 1
+
+        total = sum(totaux.values())
+        self.stdout.write(
+            f"{nom:<6} {vue:<12} {total / n:6.1f} {totaux['sessions'] / n:9.1f} "
+            f"{totaux['utilisateurs'] / n:8.1f} {totaux['autres'] / n:7.1f} {duree / n * 1000:7.1f}"
+        )
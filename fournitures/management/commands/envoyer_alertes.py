@@ -0,0 +1,52 @@
+"""
+Commande: python manage.py envoyer_alertes [--boucle] [--intervalle S] [--regroupement utilisateur|type]
+
+Vide la boîte d'envoi des franchissements de seuil (AlerteStock) en
+récapitulatifs par e-mail. Sans --boucle, traite les alertes en attente
+puis s'arrête (à planifier par cron); avec --boucle, tourne comme worker.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from fournitures.alertes import REGROUPEMENTS, envoyer_recapitulatif, purger_envoyees
+
+
+class Command(BaseCommand):
+    help = "Envoie les récapitulatifs des franchissements de seuil d'alerte"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--regroupement', choices=REGROUPEMENTS, default='utilisateur',
+                            help="Un e-mail par destinataire (défaut) ou un e-mail par type d'alerte")
+        parser.add_argument('--taille-lot', type=int, default=1000,
+                            help="Alertes par récapitulatif (défaut: 1000)")
+        parser.add_argument('--boucle', action='store_true', help="Tourner en continu")
+        parser.add_argument('--intervalle', type=int, default=300,
+                            help="Secondes entre deux récapitulatifs en mode boucle (défaut: 300)")
+        parser.add_argument('--retention', type=int, default=90,
+                            help="Jours de conservation des alertes envoyées (défaut: 90)")
+
+    def handle(self, *args, **options):
+        if options['taille_lot'] < 1 or options['intervalle'] < 1:
+            raise CommandError("--taille-lot et --intervalle doivent être positifs")
+
+        while True:
+            self._vider(options)
+            purgees = purger_envoyees(options['retention'])
+            if purgees:
+                self.stdout.write(f"{purgees} alerte(s) envoyée(s) purgée(s)")
+            if not options['boucle']:
+                return
+            close_old_connections()
+            time.sleep(options['intervalle'])
+
+    def _vider(self, options):
+        """Récapitulatifs successifs jusqu'à épuisement des alertes en attente"""
+        while True:
+            alertes, emails = envoyer_recapitulatif(options['regroupement'], options['taille_lot'])
+            if not alertes:
+                return
+            self.stdout.write(self.style.SUCCESS(f"{alertes} alerte(s) traitée(s), {emails} e-mail(s) envoyé(s)"))
+            if alertes < options['taille_lot']:
+                return
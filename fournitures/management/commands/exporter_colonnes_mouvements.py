@@ -0,0 +1,60 @@
+"""
+Commande: python manage.py exporter_colonnes_mouvements [--repertoire DIR] [--complet] [--marge S]
+
+Met à jour l'export colonnaire NumPy des mouvements (un fichier .npy par
+colonne et meta.json, voir fournitures/colonnes.py) en n'ajoutant que les
+nouveaux mouvements. À planifier (cron) avant les analyses; --complet
+reconstruit l'export depuis le début.
+
+Chargement côté analyse:
+    from fournitures.colonnes import charger, sorties_par_produit
+    colonnes = charger('/chemin/vers/colonnes')
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fournitures import colonnes
+
+
+class Command(BaseCommand):
+    help = "Export colonnaire incrémental (.npy) des mouvements pour l'analyse hors ligne"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repertoire', help="Répertoire de l'export (défaut: settings.COLONNES_DIR)")
+        parser.add_argument('--complet', action='store_true', help="Reconstruire l'export depuis le début")
+        parser.add_argument('--marge', type=int, default=60,
+                            help="Ignorer les mouvements de moins de S secondes (défaut: 60)")
+        parser.add_argument('--taille-lot', type=int, default=100000,
+                            help="Mouvements lus et écrits par lot (défaut: 100000)")
+
+    def handle(self, *args, **options):
+        if colonnes.np is None:
+            raise CommandError("NumPy est requis pour cette commande (pip install numpy)")
+        if options['taille_lot'] < 1 or options['marge'] < 0:
+            raise CommandError("--taille-lot doit être positif et --marge positive ou nulle")
+        repertoire = options['repertoire'] or colonnes.repertoire_colonnes()
+
+        debut = time.perf_counter()
+        try:
+            ajoutees = colonnes.exporter(repertoire, complet=options['complet'], marge=options['marge'],
+                                         taille_lot=options['taille_lot'])
+        except ValueError as e:
+            raise CommandError(f"{e} (--complet)")
+        duree = time.perf_counter() - debut
+        meta = colonnes.lire_meta(repertoire)
+        if meta is None:
+            self.stdout.write("Aucun mouvement à exporter")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{ajoutees} mouvement(s) ajouté(s) en {duree:.1f} s: {meta['lignes']} au total "
+            f"(dernier id {meta['dernier_id']}) dans {repertoire}"
+        ))
+
+        # Analyse témoin: sorties par produit sur tout l'export, depuis les memmaps
+        debut = time.perf_counter()
+        produits, _ = colonnes.sorties_par_produit(colonnes.charger(repertoire))
+        self.stdout.write(
+            f"Sorties par produit sur {meta['lignes']} ligne(s): {len(produits)} produit(s) "
+            f"en {(time.perf_counter() - debut) * 1000:.1f} ms"
+        )
@@ -0,0 +1,74 @@
+"""
+Commande: python manage.py partitions_mouvement [--mois-a-venir N] [--lister] [--verifier]
+
+Crée à l'avance les partitions mensuelles de la table des mouvements
+(PostgreSQL), à planifier chaque mois (cron). --verifier contrôle sur les
+plans d'exécution que les requêtes par période des vues statistiques,
+dashboard et detail_fourniture ne lisent que les partitions utiles.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections, router, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from fournitures import partitions
+from fournitures.models import Fourniture, Mouvement
+
+
+class Command(BaseCommand):
+    help = "Crée les partitions mensuelles à venir de la table des mouvements (PostgreSQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mois-a-venir', type=int, default=3,
+                            help="Nombre de mois à créer après le mois courant (défaut: 3)")
+        parser.add_argument('--lister', action='store_true', help="Lister les partitions existantes")
+        parser.add_argument('--verifier', action='store_true',
+                            help="Vérifier l'élagage des partitions sur les requêtes des vues")
+
+    def handle(self, *args, **options):
+        alias = router.db_for_write(Mouvement)
+        connexion = connections[alias]
+        if not partitions.est_partitionnee(connexion):
+            self.stdout.write(f"Table des mouvements non partitionnée ({connexion.vendor}): rien à faire.")
+            return
+
+        mois_courant = timezone.now().date().replace(day=1)
+        dernier = mois_courant
+        for _ in range(options['mois_a_venir']):
+            dernier = partitions.mois_suivant(dernier)
+        with transaction.atomic(using=alias):
+            creees = partitions.creer_partitions(connexion, mois_courant, dernier)
+        for mois in creees:
+            self.stdout.write(self.style.SUCCESS(f"Partition créée: {partitions.nom_partition(mois)}"))
+        if not creees:
+            self.stdout.write(f"Partitions déjà présentes jusqu'à {dernier:%m/%Y}.")
+
+        existantes = partitions.partitions(connexion)
+        if options['lister']:
+            for mois in existantes:
+                self.stdout.write(f"  {partitions.nom_partition(mois)}")
+        if options['verifier']:
+            self._verifier(alias, len(existantes))
+
+    def _verifier(self, alias, total):
+        maintenant = timezone.now()
+        produit = Fourniture.objects.using(alias).order_by('id').first()
+        mouvements = Mouvement.objects.using(alias)
+        requetes = {
+            'dashboard (7 jours)': mouvements.filter(date__gte=maintenant - timedelta(days=7)),
+            'statistiques (30 jours)': mouvements.filter(
+                date__gte=maintenant - timedelta(days=30), type_mouvement='SORTIE'
+            ).values('produit__designation').annotate(total=Sum('quantite')),
+        }
+        if produit is not None:
+            requetes['detail_fourniture (30 jours)'] = mouvements.filter(
+                produit=produit, date__gte=maintenant - timedelta(days=30)
+            )
+
+        self.stdout.write(f"Élagage ({total} partitions mensuelles + défaut):")
+        for nom, queryset in requetes.items():
+            lues = partitions.partitions_lues(queryset)
+            style = self.style.SUCCESS if len(lues) <= 3 else self.style.WARNING
+            self.stdout.write(style(f"  {nom}: {len(lues)} partition(s) lue(s) - {', '.join(lues)}"))
@@ -0,0 +1,136 @@
+"""
+Commande: python manage.py poids_pages [--page NOM_URL ...] [--utilisateur NOM]
+
+Mesure le poids des pages principales: HTML (dont CSS/JS en ligne) et
+ressources référencées, brut et compressé gzip. Les ressources locales sont
+lues dans STATIC_ROOT (après collectstatic) ou dans les sources; les
+ressources externes (CDN) sont seulement comptées, sans être téléchargées.
+"""
+import gzip
+import os
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+
+from fournitures.statique import NOM_HACHE
+
+PAGES = ['login', 'dashboard', 'liste_stock', 'mouvement', 'commande', 'statistiques']
+
+
+class _Ressources(HTMLParser):
+    """Relève les ressources chargées par une page et le volume de CSS/JS en ligne"""
+
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+        self.en_ligne = 0
+        self._balise = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'link' and 'stylesheet' in (attrs.get('rel') or '') and attrs.get('href'):
+            self.urls.append(attrs['href'])
+        elif tag in ('script', 'img') and attrs.get('src'):
+            self.urls.append(attrs['src'])
+        elif tag in ('script', 'style'):
+            self._balise = tag
+
+    def handle_endtag(self, tag):
+        if tag == self._balise:
+            self._balise = None
+
+    def handle_data(self, data):
+        if self._balise:
+            self.en_ligne += len(data.encode('utf-8'))
+
+
+def _taille_gzip(contenu):
+    return len(gzip.compress(contenu, compresslevel=6, mtime=0))
+
+
+def _fichier_statique(url):
+    """(octets, octets gzip) d'une URL statique locale, None si introuvable"""
+    chemin = urlsplit(url).path
+    prefixe = '/' + settings.STATIC_URL.lstrip('/')
+    if not chemin.startswith(prefixe):
+        return None
+    nom = chemin[len(prefixe):]
+
+    fichier = None
+    if settings.STATIC_ROOT and os.path.isfile(os.path.join(settings.STATIC_ROOT, nom)):
+        fichier = os.path.join(settings.STATIC_ROOT, nom)
+    else:
+        fichier = finders.find(nom)
+    if not fichier:
+        return None
+
+    with open(fichier, 'rb') as f:
+        contenu = f.read()
+    if os.path.isfile(fichier + '.gz'):
+        return len(contenu), os.path.getsize(fichier + '.gz')
+    return len(contenu), _taille_gzip(contenu)
+
+
+class Command(BaseCommand):
+    help = "Mesure le poids des pages (HTML, CSS/JS en ligne, ressources statiques et externes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', action='append', help="Nom d'URL à mesurer (répétable)")
+        parser.add_argument('--utilisateur', help="Utilisateur connecté (défaut: premier superutilisateur)")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+
+        utilisateurs = User.objects.filter(is_active=True)
+        if options['utilisateur']:
+            utilisateurs = utilisateurs.filter(username=options['utilisateur'])
+        utilisateur = utilisateurs.order_by('-is_superuser', 'id').first()
+        if utilisateur is None:
+            raise CommandError("Aucun utilisateur actif")
+
+        anonyme = Client()
+        client = Client()
+        client.force_login(utilisateur)
+
+        self.stdout.write(
+            f"{'page':<14}{'HTML':>9}{'gz':>8}{'en ligne':>10}{'ressources':>12}{'gz':>9}"
+            f"{'requêtes':>10}{'externes':>10}{'suivante gz':>13}"
+        )
+        for nom in options['page'] or PAGES:
+            reponse = (anonyme if nom == 'login' else client).get(reverse(nom))
+            if reponse.status_code != 200:
+                self.stdout.write(self.style.WARNING(f"{nom}: statut {reponse.status_code}"))
+                continue
+
+            html = reponse.content
+            analyse = _Ressources()
+            analyse.feed(html.decode('utf-8'))
+
+            brut = compresse = externes = 0
+            # Visite suivante: le HTML et tout ce qui n'est pas servi avec un cache long
+            suivante = _taille_gzip(html)
+            for url in dict.fromkeys(analyse.urls):
+                tailles = _fichier_statique(url)
+                if tailles is None:
+                    externes += 1
+                    continue
+                brut += tailles[0]
+                compresse += tailles[1]
+                if not NOM_HACHE.search(urlsplit(url).path):
+                    suivante += tailles[1]
+
+            self.stdout.write(
+                f"{nom:<14}{len(html) / 1024:>8.1f}K{_taille_gzip(html) / 1024:>7.1f}K"
+                f"{analyse.en_ligne / 1024:>9.1f}K{brut / 1024:>11.1f}K{compresse / 1024:>8.1f}K"
+                f"{len(set(analyse.urls)) + 1:>10}{externes:>10}{suivante / 1024:>12.1f}K"
+            )
+        self.stdout.write(
+            "Ressources externes non mesurées; « suivante » suppose en cache les fichiers hachés."
+        )
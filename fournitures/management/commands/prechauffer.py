@@ -0,0 +1,30 @@
+"""
+Commande: python manage.py prechauffer [--etapes imports,gabarits,...] [--avant-fork]
+
+Préchauffe le processus courant (imports, gabarits, connexions, catalogue,
+vues chaudes) et affiche le temps passé dans chaque étape. Voir
+fournitures/prechauffage.py; gestion_fournitures/wsgi.py fait le même
+travail au démarrage des workers quand PRECHAUFFAGE est défini.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from fournitures.prechauffage import ETAPES, prechauffer, rapport
+
+
+class Command(BaseCommand):
+    help = "Préchauffe un worker et mesure chaque étape"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--etapes', default=','.join(ETAPES),
+                            help=f"Étapes séparées par des virgules (défaut: {','.join(ETAPES)})")
+        parser.add_argument('--avant-fork', action='store_true',
+                            help="Ne pas ouvrir de connexion et refermer celles ouvertes (préchargement avant fork)")
+
+    def handle(self, *args, **options):
+        etapes = [e.strip() for e in options['etapes'].split(',') if e.strip()]
+        inconnues = set(etapes) - set(ETAPES)
+        if inconnues:
+            raise CommandError(f"Étape(s) inconnue(s): {', '.join(sorted(inconnues))}")
+
+        for ligne in rapport(prechauffer(etapes, avant_fork=options['avant_fork'])):
+            self.stdout.write(ligne)
@@ -0,0 +1,40 @@
+"""
+Commande: python manage.py prendre_snapshot_stock [--date AAAA-MM-JJ | --mensuel]
+
+À planifier (cron) chaque jour ou chaque mois pour alimenter StockSnapshot.
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from fournitures.historique_stock import prendre_snapshots
+
+
+class Command(BaseCommand):
+    help = "Enregistre le stock de fin de journée de toutes les fournitures"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Journée à photographier (défaut: hier)")
+        parser.add_argument('--mensuel', action='store_true',
+                            help="Photographier le dernier jour du mois précédent")
+
+    def handle(self, *args, **options):
+        if options['date'] and options['mensuel']:
+            raise CommandError("--date et --mensuel sont incompatibles")
+
+        if options['date']:
+            try:
+                jour = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError("Date invalide, format attendu: AAAA-MM-JJ")
+        elif options['mensuel']:
+            jour = timezone.localdate().replace(day=1) - timedelta(days=1)
+        else:
+            jour = timezone.localdate() - timedelta(days=1)
+
+        if jour >= timezone.localdate():
+            raise CommandError("Seules les journées terminées peuvent être photographiées")
+
+        total = prendre_snapshots(jour)
+        self.stdout.write(self.style.SUCCESS(f"{total} photo(s) de stock enregistrée(s) pour le {jour:%d/%m/%Y}"))
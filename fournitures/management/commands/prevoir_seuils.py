@@ -0,0 +1,149 @@
+"""
+Commande: python manage.py prevoir_seuils [--methode ...] [--historique-min N] [--appliquer]
+
+Ajuste un modèle de consommation sur l'historique des sorties et
+enregistre un seuil d'alerte et un stock maximum recommandés par produit.
+Les produits ayant moins de --historique-min jours avec sorties sont
+ignorés (ni recommandés, ni modifiés par --appliquer).
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from fournitures.alertes import enregistrer_franchissements
+from fournitures.models import Fourniture
+
+try:
+    from fournitures import prevision
+except ImportError:  # NumPy absent
+    prevision = None
+
+
+class Command(BaseCommand):
+    help = "Calcule seuil_alerte et stock_max recommandés à partir de l'historique des sorties"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--methode', choices=['moyenne_mobile', 'lissage_exponentiel'],
+                            default='lissage_exponentiel', help="Modèle de consommation")
+        parser.add_argument('--jours', type=int, default=180,
+                            help="Profondeur d'historique en jours (défaut: 180)")
+        parser.add_argument('--fenetre', type=int, default=30,
+                            help="Fenêtre de la moyenne mobile en jours (défaut: 30)")
+        parser.add_argument('--alpha', type=float, default=0.2,
+                            help="Coefficient du lissage exponentiel (défaut: 0.2)")
+        parser.add_argument('--niveau-service', type=float, default=0.95,
+                            help="Niveau de service visé pour le stock de sécurité (défaut: 0.95)")
+        parser.add_argument('--delai', type=int, default=7,
+                            help="Délai de réapprovisionnement en jours (défaut: 7)")
+        parser.add_argument('--periode', type=int, default=30,
+                            help="Période de révision en jours (défaut: 30)")
+        parser.add_argument('--processus', type=int, default=os.cpu_count() or 1,
+                            help="Nombre de processus de calcul (1 = pas de pool)")
+        parser.add_argument('--taille-bloc', type=int, default=2000,
+                            help="Nombre de produits par bloc de calcul (défaut: 2000)")
+        parser.add_argument('--historique-min', type=int, default=3,
+                            help="Jours avec sorties requis pour recommander (défaut: 3)")
+        parser.add_argument('--appliquer', action='store_true',
+                            help="Remplacer seuil_alerte et stock_max par les valeurs recommandées")
+
+    def handle(self, *args, **options):
+        if prevision is None:
+            raise CommandError("NumPy est requis pour cette commande (pip install numpy)")
+        if not 0 < options['niveau_service'] < 1:
+            raise CommandError("--niveau-service doit être compris entre 0 et 1")
+        if not 0 < options['alpha'] <= 1:
+            raise CommandError("--alpha doit être compris entre 0 et 1")
+        if options['jours'] < 1 or options['taille_bloc'] < 1 or options['historique_min'] < 1:
+            raise CommandError("--jours, --taille-bloc et --historique-min doivent être positifs")
+
+        ids = list(Fourniture.objects.filter(actif=True).order_by('id').values_list('id', flat=True))
+        if not ids:
+            self.stdout.write("Aucune fourniture active.")
+            return
+
+        parametres = {
+            'methode': options['methode'],
+            'fenetre': options['fenetre'],
+            'alpha': options['alpha'],
+            'niveau_service': options['niveau_service'],
+            'delai': options['delai'],
+            'periode': options['periode'],
+        }
+        taille = options['taille_bloc']
+        blocs = [ids[i:i + taille] for i in range(0, len(ids), taille)]
+
+        # Sans historique suffisant, le modèle recommanderait un seuil nul et un
+        # maximum égal au stock (entrées bloquées): ces produits sont ignorés
+        resultats = {}
+        sans_historique = 0
+
+        def retenir(bloc, jours_avec_sorties, seuils, maximums):
+            nonlocal sans_historique
+            suffisant = jours_avec_sorties >= options['historique_min']
+            sans_historique += int((~suffisant).sum())
+            resultats.update(
+                (pid, (seuil, maximum))
+                for pid, seuil, maximum, ok in zip(bloc, seuils.tolist(), maximums.tolist(), suffisant) if ok
+            )
+
+        # Même dernier jour pour tous les blocs, même si le calcul passe minuit
+        fin = timezone.localdate()
+        if options['processus'] > 1 and len(blocs) > 1:
+            # Chaque processus charge ses blocs avec sa propre connexion: fermer
+            # celles du parent pour qu'aucun enfant n'hérite de leurs sockets
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['processus'], initializer=django.setup) as pool:
+                futures = [
+                    (bloc, pool.submit(prevision.recommander_bloc, bloc, options['jours'], fin, **parametres))
+                    for bloc in blocs
+                ]
+                for bloc, future in futures:
+                    retenir(bloc, *future.result())
+        else:
+            for bloc in blocs:
+                retenir(bloc, *prevision.recommander_bloc(bloc, options['jours'], fin, **parametres))
+
+        maintenant = timezone.now()
+        appliquer = options['appliquer']
+        champs = ['seuil_alerte_recommande', 'stock_max_recommande', 'date_recommandation']
+        if appliquer:
+            champs += ['seuil_alerte', 'stock_max', 'date_modification', 'date_catalogue']
+
+        modifiees = franchissements = 0
+        with transaction.atomic():
+            for bloc in blocs:
+                bloc = [pid for pid in bloc if pid in resultats]
+                fournitures = list(Fourniture.objects.filter(id__in=bloc).only('id', 'stock', *champs))
+                changements = []
+                for f in fournitures:
+                    seuil, maximum = resultats[f.id]
+                    f.seuil_alerte_recommande = seuil
+                    f.stock_max_recommande = maximum
+                    f.date_recommandation = maintenant
+                    if appliquer:
+                        # Comme Fourniture.save: le changement de seuil peut franchir le stock
+                        changements.append((f.id, f.stock, f.stock, f.seuil_alerte, seuil))
+                        # Ne jamais descendre le maximum sous le stock déjà présent
+                        f.seuil_alerte = seuil
+                        f.stock_max = max(maximum, f.stock, seuil + 1)
+                        f.date_modification = f.date_catalogue = maintenant
+                Fourniture.objects.bulk_update(fournitures, champs, batch_size=500)
+                franchissements += enregistrer_franchissements(changements)
+                modifiees += len(fournitures)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{modifiees} recommandation(s) calculée(s) ({options['methode']}, "
+            f"niveau de service {options['niveau_service']:.0%})"
+            + (" et appliquée(s)" if appliquer else "")
+        ))
+        if franchissements:
+            self.stdout.write(f"{franchissements} franchissement(s) du seuil d'alerte enregistré(s)")
+        if sans_historique:
+            self.stdout.write(
+                f"{sans_historique} produit(s) ignoré(s): moins de {options['historique_min']} "
+                f"jour(s) avec sorties sur {options['jours']} jours"
+            )
@@ -0,0 +1,109 @@
+"""
+Commande: python manage.py rapprocher_stock [--processus N] [--depuis AAAA-MM-JJ] [--corriger]
+
+Compare Fourniture.stock à la somme des stocks par lieu, lue dans la même
+requête, et cette somme au solde de l'historique des mouvements, et
+signale les écarts; --corriger réaligne le total sur les lieux (valeur du
+stock et alertes comprises) et écrit des mouvements de régularisation,
+tranche par tranche, lignes produit verrouillées (voir rapprochement.py).
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Max, Min
+
+from fournitures.models import Fourniture, StockSnapshot
+from fournitures.rapprochement import corriger_tranche, initialiser_worker, rapprocher_tranche, tranches
+
+
+class Command(BaseCommand):
+    help = "Rapproche le stock des fournitures de l'historique des mouvements"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processus', type=int, default=os.cpu_count() or 1,
+                            help="Nombre de processus (1 = exécution dans le processus courant)")
+        parser.add_argument('--taille-tranche', type=int, default=1000,
+                            help="Nombre d'identifiants produit par tranche (défaut: 1000)")
+        parser.add_argument('--depuis',
+                            help="Utiliser la photo de stock de cette journée comme solde d'ouverture")
+        parser.add_argument('--corriger', action='store_true',
+                            help="Écrire un mouvement de régularisation pour chaque écart")
+        parser.add_argument('--afficher', type=int, default=50,
+                            help="Nombre maximum d'écarts affichés (défaut: 50)")
+
+    def handle(self, *args, **options):
+        depuis = options['depuis']
+        if depuis:
+            try:
+                jour = date.fromisoformat(depuis)
+            except ValueError:
+                raise CommandError("Date invalide, format attendu: AAAA-MM-JJ")
+            if not StockSnapshot.objects.filter(date=jour).exists():
+                raise CommandError(f"Aucune photo de stock pour le {jour:%d/%m/%Y}")
+        if options['taille_tranche'] < 1:
+            raise CommandError("--taille-tranche doit être positive")
+
+        bornes = Fourniture.objects.aggregate(debut=Min('id'), fin=Max('id'))
+        if bornes['debut'] is None:
+            self.stdout.write("Aucune fourniture.")
+            return
+
+        intervalles = tranches(bornes['debut'], bornes['fin'], options['taille_tranche'])
+        # Avec --corriger, chaque tranche est comparée et corrigée sous verrou dans sa transaction
+        traiter = corriger_tranche if options['corriger'] else rapprocher_tranche
+        # SQLite n'accepte qu'un écrivain à la fois: corrections dans le processus courant
+        parallele = options['processus'] > 1 and not (options['corriger'] and connection.vendor == 'sqlite')
+        if parallele and len(intervalles) > 1:
+            # Les workers ouvrent leurs propres connexions: ne rien hériter du parent
+            connections.close_all()
+            contexte = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=options['processus'], mp_context=contexte,
+                                     initializer=initialiser_worker) as pool:
+                futures = [pool.submit(traiter, a, b, depuis) for a, b in intervalles]
+                resultats = [future.result() for future in futures]
+        else:
+            resultats = [traiter(a, b, depuis) for a, b in intervalles]
+        if not options['corriger']:
+            resultats = [(ecarts, 0, 0, []) for ecarts in resultats]
+
+        ecarts = [e for resultat in resultats for e in resultat[0]]
+
+        if not ecarts:
+            self.stdout.write(self.style.SUCCESS(
+                "Aucun écart: le stock correspond aux stocks par lieu et à l'historique des mouvements"
+            ))
+            return
+
+        # Les stocks par lieu font foi: le total et l'historique leur sont comparés
+        lieux = [(e[1] or e[0], e[2], e[3]) for e in ecarts if e[2] != e[3]]
+        historique = [(e[1] or e[0], e[3], e[4]) for e in ecarts if e[3] != e[4]]
+        self._afficher(lieux, options['afficher'], "entre stock total et somme des lieux")
+        self._afficher(historique, options['afficher'], "entre somme des lieux et historique des mouvements")
+
+        if options['corriger']:
+            totaux = sum(resultat[1] for resultat in resultats)
+            regularisations = sum(resultat[2] for resultat in resultats)
+            erreurs = [erreur for resultat in resultats for erreur in resultat[3]]
+            for reference, erreur in erreurs:
+                self.stdout.write(self.style.ERROR(f"{reference}: non corrigé ({erreur})"))
+            self.stdout.write(self.style.SUCCESS(
+                f"{totaux} total(aux) réaligné(s) sur les lieux, "
+                f"{regularisations} mouvement(s) de régularisation créé(s)"
+            ))
+
+    def _afficher(self, ecarts, limite, libelle):
+        """Écarts (reference, valeur, référence de comparaison), les plus grands d'abord"""
+        if not ecarts:
+            self.stdout.write(self.style.SUCCESS(f"Aucun écart {libelle}"))
+            return
+        ecarts.sort(key=lambda e: abs(e[1] - e[2]), reverse=True)
+        for reference, valeur, attendu in ecarts[:limite]:
+            self.stdout.write(f"{reference}: {valeur} au lieu de {attendu} (écart {valeur - attendu:+})")
+        if len(ecarts) > limite:
+            self.stdout.write(f"... et {len(ecarts) - limite} autre(s)")
+        total = sum(abs(valeur - attendu) for _, valeur, attendu in ecarts)
+        self.stdout.write(self.style.WARNING(f"{len(ecarts)} écart(s) {libelle}, total absolu: {total}"))
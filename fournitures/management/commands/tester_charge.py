@@ -0,0 +1,487 @@
+"""
+Commande: python manage.py tester_charge [--concurrence N] [--duree S | --operations N]
+                                         [--melange mouvement=60,commande=15,dashboard=20,export=5]
+                                         [--url http://127.0.0.1:8000 --utilisateur NOM --mot-de-passe MDP]
+                                         [--autoriser-base]
+
+Test de charge des flux de stock et de commande. N threads rejouent un
+mélange pondéré de saisies de mouvements (POST /mouvement/), de cycles de
+vie complets de commandes (création, validation, mise en cours,
+réception), de lectures du tableau de bord et d'exports CSV, soit dans le
+processus avec le client de test Django, soit contre un serveur lancé
+(--url).
+
+Les opérations portent sur des fournitures créées pour l'occasion (type
+« Test de charge », supprimé à la fin sauf --conserver). Le rapport donne
+le débit, les percentiles de latence par opération, le temps passé dans
+les requêtes SELECT ... FOR UPDATE (mode local) et les attentes de verrous
+vues par PostgreSQL, puis vérifie les invariants: aucun stock négatif,
+aucun numéro de commande en double, total égal à la somme des lieux et au
+solde des mouvements. Une violation fait échouer la commande, de même
+qu'une opération en erreur inattendue: exception, statut 5xx, ou mouvement
+ni enregistré en base ni refusé par une règle métier (stock insuffisant ou
+maximum dépassé).
+
+Les données de test sont écrites dans la base configurée: hors DEBUG, la
+commande refuse de s'exécuter sans --autoriser-base.
+"""
+import html
+import http.cookiejar
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Min, Max
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+
+from fournitures.models import Commande, Fourniture, Mouvement, StockParLieu, TypeFourniture
+from fournitures.rapprochement import rapprocher_tranche
+
+TYPE_CHARGE = "Test de charge"
+MELANGE_DEFAUT = 'mouvement=60,commande=15,dashboard=20,export=5'
+STOCK_INITIAL = 500
+STOCK_MAX = 1000000
+
+
+def _percentile(valeurs, p):
+    if not valeurs:
+        return 0.0
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(round(p / 100 * (len(valeurs) - 1))))]
+
+
+# ==================== CLIENTS ====================
+
+class _ClientLocal:
+    """Client de test Django dans le processus: mesure aussi les SELECT ... FOR UPDATE"""
+
+    def __init__(self, utilisateur, mesures_verrous):
+        self.client = Client(raise_request_exception=False)
+        self.client.force_login(utilisateur)
+        self.mesures_verrous = mesures_verrous
+        self._contexte = connection.execute_wrapper(self._chronometrer)
+        self._contexte.__enter__()
+
+    def _chronometrer(self, execute, sql, params, many, context):
+        if 'FOR UPDATE' not in sql:
+            return execute(sql, params, many, context)
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.mesures_verrous.append(time.perf_counter() - debut)
+
+    def get(self, chemin):
+        reponse = self.client.get(chemin)
+        if reponse.streaming:
+            b''.join(reponse.streaming_content)
+        return reponse.status_code
+
+    def post(self, chemin, donnees):
+        return self.soumettre(chemin, donnees)[0]
+
+    def soumettre(self, chemin, donnees):
+        """POST, retourne (statut, page)"""
+        reponse = self.client.post(chemin, donnees)
+        return reponse.status_code, reponse.content.decode('utf-8', 'replace')
+
+    def fermer(self):
+        self._contexte.__exit__(None, None, None)
+        connection.close()
+
+
+class _SansRedirection(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class _ClientHttp:
+    """Client HTTP vers un serveur lancé, connecté par le formulaire de connexion"""
+
+    def __init__(self, url, utilisateur, mot_de_passe):
+        self.url = url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.ouvreur = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _SansRedirection
+        )
+        page = self._ouvrir(reverse('login'))[1].decode('utf-8', 'replace')
+        jeton = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page)
+        statut, _ = self._ouvrir(reverse('login'), {
+            'username': utilisateur, 'password': mot_de_passe,
+            'csrfmiddlewaretoken': jeton.group(1) if jeton else '',
+        })
+        if statut != 302:
+            raise CommandError(f"Connexion refusée par {self.url} (statut {statut})")
+
+    def _ouvrir(self, chemin, donnees=None):
+        corps = None
+        entetes = {'Referer': self.url + '/'}
+        if donnees is not None:
+            corps = urllib.parse.urlencode(donnees).encode()
+            csrf = next((c.value for c in self.cookies if c.name == 'csrftoken'), '')
+            entetes['X-CSRFToken'] = csrf
+        requete = urllib.request.Request(self.url + chemin, data=corps, headers=entetes)
+        try:
+            with self.ouvreur.open(requete, timeout=60) as reponse:
+                return reponse.status, reponse.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def get(self, chemin):
+        return self._ouvrir(chemin)[0]
+
+    def post(self, chemin, donnees):
+        return self._ouvrir(chemin, donnees)[0]
+
+    def soumettre(self, chemin, donnees):
+        statut, corps = self._ouvrir(chemin, donnees)
+        return statut, corps.decode('utf-8', 'replace')
+
+    def fermer(self):
+        pass
+
+
+# ==================== SCÉNARIOS ====================
+
+# Résultat d'une opération: effectuée, refusée par une règle métier, ou en erreur
+OK, REFUS, ERREUR = 'ok', 'refus', 'erreur'
+
+# Messages de la page de mouvement (mouvement.html), et refus attendus (forms.py, models.py)
+MESSAGE = re.compile(r'<div class="alert alert-([^"]*?) alert-dismissible[^"]*">(.*?)<button', re.S)
+REFUS_MOUVEMENT = re.compile(r'Stock insuffisant|Stock maximum dépassé')
+
+
+def _messages_erreur(page):
+    """Textes des messages d'erreur affichés par la page (balises et échappements retirés)"""
+    return [
+        re.sub(r'\s+', ' ', re.sub(r'<[^>]+>', ' ', html.unescape(html.unescape(texte)))).strip()
+        for niveaux, texte in MESSAGE.findall(page) if {'danger', 'error'} & set(niveaux.split())
+    ]
+
+
+def _mouvement(client, produits, noter):
+    """Jugé sur le mouvement trouvé en base, puis sur les messages de la page renvoyée"""
+    marque = f"charge-{uuid.uuid4().hex[:12]}"
+    donnees = {'produit': random.choice(produits), 'type_mouvement': random.choice(('ENTREE', 'SORTIE')),
+               'quantite': random.randint(1, 5), 'notes': marque}
+    statut, page = client.soumettre(reverse('mouvement'), donnees)
+    if Mouvement.objects.filter(notes=marque).exists():
+        noter('mouvement', statut, OK if statut == 302 else ERREUR, f"enregistré, statut {statut}")
+        return
+    messages = _messages_erreur(page) if statut == 200 else []
+    if messages and all(REFUS_MOUVEMENT.search(m) for m in messages):
+        noter('mouvement', statut, REFUS)
+    else:
+        noter('mouvement', statut, ERREUR, messages[0][:80] if messages else f"statut {statut}, aucun message")
+
+
+def _commande(client, produits, noter):
+    """Cycle de vie complet; chaque étape est jugée sur le statut atteint en base"""
+    marque = f"charge-{uuid.uuid4().hex[:12]}"
+    statut = client.post(reverse('commande'), {
+        'produit': random.choice(produits), 'quantite': random.randint(1, 20), 'notes': marque,
+    })
+    commande_id = Commande.objects.filter(notes=marque).values_list('id', flat=True).first()
+    noter('commande_creer', statut, OK if commande_id is not None else REFUS)
+    if commande_id is None:
+        # Refusée (une commande est déjà active pour ce produit)
+        return
+    for etape, vue, attendu in (('commande_valider', 'valider_commande', 'VALIDEE'),
+                                ('commande_mettre_en_cours', 'mettre_en_cours_commande', 'EN_COURS'),
+                                ('commande_recevoir', 'recevoir_commande', 'RECUE')):
+        statut = client.post(reverse(vue, args=[commande_id]), {})
+        atteint = Commande.objects.filter(id=commande_id).values_list('status', flat=True).first()
+        noter(etape, statut, OK if atteint == attendu else REFUS)
+        if atteint != attendu:
+            return
+
+
+def _dashboard(client, produits, noter):
+    statut = client.get(reverse('dashboard'))
+    noter('dashboard', statut, OK if statut == 200 else ERREUR, f"statut {statut}")
+
+
+def _export(client, produits, noter):
+    statut = client.get(reverse('exporter_csv'))
+    noter('export', statut, OK if statut == 200 else ERREUR, f"statut {statut}")
+
+
+SCENARIOS = {
+    'mouvement': _mouvement,
+    'commande': _commande,
+    'dashboard': _dashboard,
+    'export': _export,
+}
+
+
+class _EchantillonneurVerrous(threading.Thread):
+    """PostgreSQL: échantillonne les sessions en attente de verrou (pg_stat_activity)"""
+
+    def __init__(self, intervalle=0.05):
+        super().__init__(daemon=True)
+        self.intervalle = intervalle
+        self.attente = 0.0
+        self.max_simultanees = 0
+        self._arret = threading.Event()
+
+    def run(self):
+        try:
+            with connection.cursor() as curseur:
+                while not self._arret.wait(self.intervalle):
+                    curseur.execute(
+                        "SELECT count(*) FROM pg_stat_activity "
+                        "WHERE wait_event_type = 'Lock' AND datname = current_database()"
+                    )
+                    n = curseur.fetchone()[0]
+                    self.attente += n * self.intervalle
+                    self.max_simultanees = max(self.max_simultanees, n)
+        finally:
+            connection.close()
+
+    def arreter(self):
+        self._arret.set()
+        self.join()
+
+
+class Command(BaseCommand):
+    help = "Test de charge des mouvements, commandes, tableau de bord et exports"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrence', type=int, default=8, help="Threads simultanés (défaut: 8)")
+        parser.add_argument('--duree', type=float, default=30, help="Durée en secondes (défaut: 30)")
+        parser.add_argument('--operations', type=int, help="Nombre total de scénarios (remplace --duree)")
+        parser.add_argument('--melange', default=MELANGE_DEFAUT,
+                            help=f"Poids des scénarios (défaut: {MELANGE_DEFAUT})")
+        parser.add_argument('--produits', type=int, default=20, help="Fournitures de test créées (défaut: 20)")
+        parser.add_argument('--url', help="Serveur à tester (défaut: client de test dans le processus)")
+        parser.add_argument('--utilisateur', help="Utilisateur (défaut en local: premier superutilisateur)")
+        parser.add_argument('--mot-de-passe', help="Mot de passe (mode --url)")
+        parser.add_argument('--graine', type=int, help="Graine aléatoire, pour rejouer un mélange")
+        parser.add_argument('--conserver', action='store_true', help="Ne pas supprimer les données de test")
+        parser.add_argument('--autoriser-base', action='store_true',
+                            help="Autoriser l'exécution sur la base configurée quand DEBUG est désactivé")
+
+    def handle(self, *args, **options):
+        if options['concurrence'] < 1 or options['produits'] < 1:
+            raise CommandError("--concurrence et --produits doivent être positifs")
+        if not settings.DEBUG and not options['autoriser_base']:
+            raise CommandError(
+                f"DEBUG est désactivé: la base {connection.settings_dict['NAME']!r} est peut-être celle de "
+                "production. Relancer sur une base de test, ou avec --autoriser-base"
+            )
+        melange = self._lire_melange(options['melange'])
+        if options['graine'] is not None:
+            random.seed(options['graine'])
+
+        utilisateur = self._utilisateur(options)
+        if options['url'] and not options['mot_de_passe']:
+            raise CommandError("--mot-de-passe est requis avec --url")
+        if not options['url']:
+            setup_test_environment()
+
+        type_charge, produits = self._preparer(options['produits'], utilisateur)
+        try:
+            mesures, verrous, echantillonneur, duree = self._executer(options, melange, utilisateur, produits)
+            self._rapporter(mesures, verrous, echantillonneur, duree, options)
+            violations = self._verifier_invariants(produits)
+            erreurs = sum(1 for valeurs in mesures.values() for v in valeurs if v[2] == ERREUR)
+        finally:
+            if not options['conserver']:
+                type_charge.delete()
+
+        if violations:
+            raise CommandError("Invariants violés:\n" + '\n'.join(f"  - {v}" for v in violations))
+        self.stdout.write(self.style.SUCCESS("Invariants respectés"))
+        if erreurs:
+            raise CommandError(f"{erreurs} opération(s) en erreur inattendue (voir le rapport)")
+
+    # ---------- préparation ----------
+
+    def _lire_melange(self, texte):
+        melange = {}
+        for partie in texte.split(','):
+            nom, _, poids = partie.partition('=')
+            nom = nom.strip()
+            if nom not in SCENARIOS:
+                raise CommandError(f"Scénario inconnu: {nom} (choix: {', '.join(SCENARIOS)})")
+            try:
+                melange[nom] = float(poids)
+            except ValueError:
+                raise CommandError(f"Poids invalide pour {nom}: {poids!r}")
+        if sum(melange.values()) <= 0:
+            raise CommandError("La somme des poids doit être positive")
+        return melange
+
+    def _utilisateur(self, options):
+        utilisateurs = User.objects.filter(is_active=True)
+        if options['utilisateur']:
+            utilisateurs = utilisateurs.filter(username=options['utilisateur'])
+        utilisateur = utilisateurs.order_by('-is_superuser', 'id').first()
+        if utilisateur is None:
+            raise CommandError("Aucun utilisateur actif")
+        return utilisateur
+
+    def _preparer(self, nombre, utilisateur):
+        """Fournitures de test, approvisionnées par un mouvement d'entrée (soldes cohérents)"""
+        type_charge, _ = TypeFourniture.objects.get_or_create(nom=TYPE_CHARGE)
+        produits = []
+        for i in range(nombre):
+            # Référence laissée vide: attribuée par generer_reference()
+            produit = Fourniture.objects.create(
+                type=type_charge, designation=f"Test de charge {i + 1}",
+                stock=0, stock_max=STOCK_MAX, seuil_alerte=10,
+            )
+            produit.entree_stock(STOCK_INITIAL, utilisateur, notes="Stock initial du test de charge")
+            produits.append(produit.id)
+        self.stdout.write(f"{nombre} fourniture(s) de test créée(s) dans le type « {TYPE_CHARGE} »")
+        return type_charge, produits
+
+    # ---------- exécution ----------
+
+    def _executer(self, options, melange, utilisateur, produits):
+        mesures = defaultdict(list)
+        verrous = []
+        verrou_mesures = threading.Lock()
+        noms, poids = list(melange), list(melange.values())
+        restantes = [options['operations']] if options['operations'] else None
+        fin = time.monotonic() + options['duree']
+        erreurs_fatales = []
+
+        def prochaine():
+            if restantes is None:
+                return time.monotonic() < fin
+            with verrou_mesures:
+                if restantes[0] <= 0:
+                    return False
+                restantes[0] -= 1
+                return True
+
+        def travailleur():
+            locales = defaultdict(list)
+            verrous_locaux = []
+
+            def noter(operation, statut, resultat, detail=None):
+                if statut >= 500:
+                    resultat, detail = ERREUR, f"statut {statut}"
+                locales[operation].append((time.perf_counter() - noter.debut, statut, resultat, detail))
+                noter.debut = time.perf_counter()
+
+            try:
+                if options['url']:
+                    client = _ClientHttp(options['url'], utilisateur.username, options['mot_de_passe'])
+                else:
+                    client = _ClientLocal(utilisateur, verrous_locaux)
+            except Exception as e:
+                erreurs_fatales.append(str(e))
+                return
+            try:
+                while prochaine():
+                    scenario = SCENARIOS[random.choices(noms, poids)[0]]
+                    noter.debut = time.perf_counter()
+                    try:
+                        scenario(client, produits, noter)
+                    except Exception as e:
+                        locales['exception'].append((time.perf_counter() - noter.debut, None, ERREUR, repr(e)[:80]))
+            finally:
+                client.fermer()
+                with verrou_mesures:
+                    for operation, valeurs in locales.items():
+                        mesures[operation].extend(valeurs)
+                    verrous.extend(verrous_locaux)
+
+        echantillonneur = None
+        if connection.vendor == 'postgresql':
+            echantillonneur = _EchantillonneurVerrous()
+            echantillonneur.start()
+
+        self.stdout.write(f"{options['concurrence']} thread(s), "
+                          + (f"{options['operations']} scénario(s)" if options['operations']
+                             else f"{options['duree']:g} s")
+                          + f", mélange {', '.join(f'{n}={p:g}' for n, p in melange.items())}")
+        debut = time.perf_counter()
+        threads = [threading.Thread(target=travailleur) for _ in range(options['concurrence'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duree = time.perf_counter() - debut
+        if echantillonneur:
+            echantillonneur.arreter()
+        if erreurs_fatales:
+            raise CommandError(f"Client impossible à initialiser: {erreurs_fatales[0]}")
+        return mesures, verrous, echantillonneur, duree
+
+    # ---------- rapport ----------
+
+    def _rapporter(self, mesures, verrous, echantillonneur, duree, options):
+        total = sum(len(v) for v in mesures.values())
+        self.stdout.write(f"\n{total} requête(s) en {duree:.1f} s: {total / duree:.1f} req/s\n")
+        self.stdout.write(f"{'opération':<26} {'n':>6} {'ok':>6} {'refus':>6} {'erreurs':>7} {'req/s':>7} "
+                          f"{'p50':>7} {'p95':>7} {'p99':>7} {'max':>7}  (ms)")
+        for operation in sorted(mesures):
+            valeurs = mesures[operation]
+            durees = [v[0] * 1000 for v in valeurs]
+            ok = sum(1 for v in valeurs if v[2] == OK)
+            refus = sum(1 for v in valeurs if v[2] == REFUS)
+            self.stdout.write(
+                f"{operation:<26} {len(valeurs):>6} {ok:>6} {refus:>6} {len(valeurs) - ok - refus:>7} "
+                f"{len(valeurs) / duree:>7.1f} {_percentile(durees, 50):>7.1f} {_percentile(durees, 95):>7.1f} "
+                f"{_percentile(durees, 99):>7.1f} {max(durees):>7.1f}"
+            )
+            # Erreurs inattendues: les messages distincts les plus fréquents
+            messages = Counter(v[3] for v in valeurs if v[2] == ERREUR)
+            for message, n in messages.most_common(5):
+                self.stdout.write(f"    {n} × {message}")
+
+        if not options['url'] and not connection.features.has_select_for_update:
+            self.stdout.write(f"\nSELECT ... FOR UPDATE: non mesuré ({connection.vendor} ne verrouille pas les lignes)")
+        elif not options['url']:
+            ms = [v * 1000 for v in verrous]
+            self.stdout.write(
+                f"\nSELECT ... FOR UPDATE: {len(ms)} requête(s), {sum(ms) / 1000:.2f} s au total, "
+                f"p50 {_percentile(ms, 50):.1f} ms, p95 {_percentile(ms, 95):.1f} ms, "
+                f"max {max(ms) if ms else 0:.1f} ms"
+            )
+        if echantillonneur:
+            self.stdout.write(
+                f"Attente de verrous PostgreSQL: ~{echantillonneur.attente:.2f} s cumulées, "
+                f"jusqu'à {echantillonneur.max_simultanees} session(s) bloquée(s) simultanément"
+            )
+
+    # ---------- invariants ----------
+
+    def _verifier_invariants(self, produits):
+        violations = []
+        negatifs = list(Fourniture.objects.filter(stock__lt=0).values_list('reference', 'stock'))
+        violations += [f"stock négatif: {ref} = {stock}" for ref, stock in negatifs]
+        lieux = StockParLieu.objects.filter(quantite__lt=0).values_list('produit__reference', 'lieu__nom', 'quantite')
+        violations += [f"stock négatif par lieu: {ref} @ {lieu} = {q}" for ref, lieu, q in lieux]
+
+        doublons = Commande.objects.exclude(numero__isnull=True).values('numero').annotate(
+            n=Count('id')).filter(n__gt=1).values_list('numero', 'n')
+        violations += [f"numéro de commande en double: {numero} ({n} commandes)" for numero, n in doublons]
+
+        bornes = Fourniture.objects.filter(id__in=produits).aggregate(debut=Min('id'), fin=Max('id'))
+        debut, fin = bornes['debut'], bornes['fin'] + 1
+        ecarts = [e for e in rapprocher_tranche(debut, fin) if e[0] in produits]
+        violations += [
+            f"total ≠ somme des lieux: {ref} stock {stock}, lieux {somme}"
+            for pid, ref, stock, somme, attendu in ecarts if stock != somme
+        ]
+        violations += [
+            f"total ≠ solde des mouvements: {ref} stock {stock}, mouvements {attendu}"
+            for pid, ref, stock, somme, attendu in ecarts if stock != attendu
+        ]
+        return violations
@@ -0,0 +1,58 @@
+"""
+Commande: python manage.py vendoriser_assets [--bibliotheque NOM ...] [--forcer]
+
+Télécharge les versions épinglées des bibliothèques tierces (fournitures/assets.py)
+dans fournitures/static/vendor/, à exécuter sur un poste ayant accès à internet;
+les fichiers obtenus sont versionnés avec le code.
+"""
+import os
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fournitures import assets
+
+RACINE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'static')
+
+
+class Command(BaseCommand):
+    help = "Télécharge les bibliothèques tierces épinglées dans fournitures/static/vendor/"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bibliotheque', action='append', choices=sorted(assets.BIBLIOTHEQUES),
+                            help="Bibliothèque à télécharger (répétable, défaut: toutes)")
+        parser.add_argument('--forcer', action='store_true', help="Remplacer les fichiers déjà présents")
+        parser.add_argument('--delai', type=int, default=30, help="Délai réseau en secondes (défaut: 30)")
+
+    def handle(self, *args, **options):
+        noms = options['bibliotheque'] or sorted(assets.BIBLIOTHEQUES)
+        for nom in noms:
+            for chemin, url in assets.BIBLIOTHEQUES[nom]:
+                destination = os.path.join(RACINE, chemin)
+                if os.path.exists(destination) and not options['forcer']:
+                    self.stdout.write(f"{chemin}: déjà présent")
+                    continue
+
+                try:
+                    requete = Request(url, headers={'User-Agent': 'gestion-fournitures'})
+                    with urlopen(requete, timeout=options['delai']) as reponse:
+                        contenu = reponse.read()
+                except URLError as e:
+                    raise CommandError(f"Téléchargement impossible de {url}: {e}")
+
+                if chemin == 'vendor/fontawesome/css/all.min.css':
+                    contenu = assets.css_fontawesome(contenu.decode('utf-8')).encode('utf-8')
+                self._ecrire(chemin, contenu)
+
+            if nom == 'poppins':
+                self._ecrire(assets.POPPINS_CSS, assets.css_poppins().encode('utf-8'))
+
+        self.stdout.write(self.style.SUCCESS("Bibliothèques vendorisées: " + ', '.join(noms)))
+
+    def _ecrire(self, chemin, contenu):
+        destination = os.path.join(RACINE, chemin)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        with open(destination, 'wb') as f:
+            f.write(contenu)
+        self.stdout.write(f"{chemin}: {len(contenu) / 1024:.1f} Ko")
@@ -0,0 +1,60 @@
+"""
+Commande: python manage.py verifier_budgets_requetes [--vue NOM] [--seuil N] [--utilisateur NOM]
+
+Appelle en GET chaque vue ayant un budget de requêtes SQL déclaré dans
+fournitures/urls.py (BUDGETS_REQUETES) et vérifie qu'elle le respecte sans
+répéter de requête (N+1, voir fournitures/budget_requetes.py). Sort en
+erreur avec le rapport des vues fautives, pour un usage en intégration
+continue.
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+
+from fournitures.budget_requetes import SEUIL_REPETITION, BudgetRequetesDepasse, budgets_declares, verifier_vue
+
+
+class Command(BaseCommand):
+    help = "Vérifie les budgets de requêtes SQL des vues et détecte les requêtes N+1"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vue', action='append', help="Vue à vérifier (répétable, défaut: toutes)")
+        parser.add_argument('--seuil', type=int, default=SEUIL_REPETITION,
+                            help=f"Exécutions à partir desquelles une requête est répétée (défaut: {SEUIL_REPETITION}, "
+                                 f"0 pour ne vérifier que le budget)")
+        parser.add_argument('--utilisateur', help="Utilisateur connecté (défaut: premier superutilisateur)")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        budgets = budgets_declares()
+        vues = options['vue'] or list(budgets)
+        inconnues = [v for v in vues if v not in budgets]
+        if inconnues:
+            raise CommandError(f"Vue(s) sans budget déclaré: {', '.join(inconnues)}")
+
+        utilisateurs = User.objects.filter(is_active=True)
+        if options['utilisateur']:
+            utilisateurs = utilisateurs.filter(username=options['utilisateur'])
+        utilisateur = utilisateurs.order_by('-is_superuser', 'id').first()
+        if utilisateur is None:
+            raise CommandError("Aucun utilisateur actif")
+        client = Client()
+        client.force_login(utilisateur)
+
+        echecs = []
+        for vue in vues:
+            # Premier appel hors mesure: caches du processus (catalogue, utilisateur)
+            client.get(reverse(vue))
+            try:
+                verifier_vue(client, vue, seuil=options['seuil'])
+            except BudgetRequetesDepasse as e:
+                echecs.append(str(e))
+                self.stdout.write(self.style.ERROR(f"✗ {vue}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"✓ {vue} (budget {budgets[vue]})"))
+
+        if echecs:
+            raise CommandError("Budgets de requêtes non respectés:\n\n" + '\n\n'.join(echecs))
+
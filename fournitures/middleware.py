@@ -0,0 +1,125 @@
+"""Middlewares de l'application fournitures"""
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from . import profilage
+from .compression import compresser_contenu, compresser_flux, compresser_flux_async, enregistrer, negocier
+from .routers import alias_replica, epingler
+
+# Valeurs par défaut si settings ne les définit pas (mêmes valeurs que settings.py)
+COMPRESSION_TYPES = ('text/html', 'application/json', 'text/csv', 'text/plain', 'text/css',
+                     'text/javascript', 'application/javascript', 'image/svg+xml')
+COMPRESSION_TAILLE_MIN = 1024
+
+
+class EpinglagePrimaireMiddleware:
+    """
+    Après une écriture (toute requête POST authentifiée), épingle le
+    navigateur sur la base principale (cookie signé, voir routers.py) pour
+    garantir la relecture de ses propres écritures.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if alias_replica() and request.method == 'POST' and request.user.is_authenticated:
+            epingler(response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if alias_replica() and request.method == 'POST' and (await request.auser()).is_authenticated:
+            epingler(response)
+        return response
+
+
+class ProfilageMiddleware:
+    """
+    Profile les requêtes du personnel qui le demandent (voir profilage.py).
+
+    Sous ASGI, le profil est pris dans le thread des vues synchrones, où la
+    suite de la chaîne est exécutée.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if profilage.demande(request):
+            return profilage.profiler_requete(request, self.get_response)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if profilage.sollicite(request) and hasattr(request, 'auser'):
+            if profilage.autorise(await request.auser()):
+                return await sync_to_async(profilage.profiler_requete)(request, async_to_sync(self.get_response))
+        return await self.get_response(request)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresse les réponses textuelles (brotli ou gzip selon Accept-Encoding).
+
+    Seuls les types de settings.COMPRESSION_TYPES sont compressés, et les
+    réponses complètes d'au moins settings.COMPRESSION_TAILLE_MIN octets;
+    les réponses en flux sont toujours compressées (taille inconnue).
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        type_contenu = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if type_contenu not in getattr(settings, 'COMPRESSION_TYPES', COMPRESSION_TYPES):
+            return response
+        if not response.streaming and len(response.content) < getattr(
+                settings, 'COMPRESSION_TAILLE_MIN', COMPRESSION_TAILLE_MIN):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encodage = negocier(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encodage is None:
+            return response
+
+        match = getattr(request, 'resolver_match', None)
+        vue = match.view_name if match else '-'
+
+        if response.streaming:
+            contenu = response.streaming_content
+            if response.is_async:
+                response.streaming_content = compresser_flux_async(encodage, contenu, vue)
+            else:
+                response.streaming_content = compresser_flux(encodage, contenu, vue)
+            # Taille compressée inconnue avant la fin du flux
+            del response.headers['Content-Length']
+        else:
+            compresse, cpu = compresser_contenu(encodage, response.content)
+            if len(compresse) >= len(response.content):
+                return response
+            enregistrer(vue, len(response.content), len(compresse), cpu)
+            response.content = compresse
+            response.headers['Content-Length'] = str(len(compresse))
+
+        # ETag fort invalide une fois le contenu transformé (RFC 9110, 8.8.1)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encodage
+        return response
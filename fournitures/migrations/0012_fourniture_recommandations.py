@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fournitures', '0011_alter_fourniture_unite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fourniture',
+            name='date_recommandation',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Date de la recommandation'),
+        ),
+        migrations.AddField(
+            model_name='fourniture',
+            name='seuil_alerte_recommande',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name="Seuil d'alerte recommandé"),
+        ),
+        migrations.AddField(
+            model_name='fourniture',
+            name='stock_max_recommande',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Stock maximum recommandé'),
+        ),
+    ]
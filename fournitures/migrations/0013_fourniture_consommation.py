@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fournitures', '0012_fourniture_recommandations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fourniture',
+            name='consommation_journaliere',
+            field=models.FloatField(default=0, editable=False, verbose_name='Consommation journalière estimée'),
+        ),
+        migrations.AddField(
+            model_name='fourniture',
+            name='date_derniere_sortie',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Date de la dernière sortie'),
+        ),
+        migrations.AddField(
+            model_name='fourniture',
+            name='date_rupture_estimee',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='Date de rupture estimée'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fournitures', '0013_fourniture_consommation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('stock', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Stock en fin de journée')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='fournitures.fourniture', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Photo de stock',
+                'verbose_name_plural': 'Photos de stock',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date'], name='fournitures_date_2e2d54_idx')],
+                'unique_together': {('produit', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fournitures', '0014_stocksnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EvenementTableauBord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_evenement', models.CharField(max_length=20, verbose_name="Type d'événement")),
+                ('donnees', models.JSONField(default=dict, verbose_name='Données')),
+                ('date', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Date')),
+            ],
+            options={
+                'verbose_name': 'Événement du tableau de bord',
+                'verbose_name_plural': 'Événements du tableau de bord',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fournitures', '0015_evenementtableaubord'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['date_creation'], name='fournitures_date_cr_860864_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['status', 'date_creation'], name='fournitures_status_102ab0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mouvement',
+            index=models.Index(fields=['date'], name='fournitures_date_a5e9d9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mouvement',
+            index=models.Index(fields=['type_mouvement', 'date'], name='fournitures_type_mo_bdf8d4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mouvement',
+            index=models.Index(fields=['produit', 'date'], name='fournitures_produit_d037f3_idx'),
+        ),
+    ]
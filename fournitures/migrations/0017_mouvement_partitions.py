@@ -0,0 +1,17 @@
+# Table des mouvements partitionnée par mois sur PostgreSQL (voir fournitures/partitions.py).
+# Sans effet sur les autres bases.
+
+from django.db import migrations
+
+from fournitures.partitions import departitionner, partitionner
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fournitures', '0016_index_admin'),
+    ]
+
+    operations = [
+        migrations.RunPython(partitionner, departitionner),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fournitures', '0017_mouvement_partitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumeCommandeMois',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(verbose_name='Mois')),
+                ('status', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('VALIDEE', 'Validée'), ('EN_COURS', 'En cours de livraison'), ('RECUE', 'Reçue'), ('ANNULEE', 'Annulée')], max_length=20, verbose_name='Statut')),
+                ('nombre', models.PositiveIntegerField(default=0, verbose_name='Nombre de commandes')),
+                ('quantite', models.BigIntegerField(default=0, verbose_name='Quantité totale')),
+            ],
+            options={
+                'verbose_name': 'Résumé mensuel de commandes archivées',
+                'verbose_name_plural': 'Résumés mensuels de commandes archivées',
+                'ordering': ['-mois'],
+                'unique_together': {('mois', 'status')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CommandeArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('numero', models.CharField(blank=True, max_length=20, null=True, verbose_name='Numéro')),
+                ('status', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('VALIDEE', 'Validée'), ('EN_COURS', 'En cours de livraison'), ('RECUE', 'Reçue'), ('ANNULEE', 'Annulée')], max_length=20, verbose_name='Statut')),
+                ('date_creation', models.DateTimeField(verbose_name='Date de création')),
+                ('donnees', models.JSONField(default=dict, verbose_name="Ligne d'origine")),
+                ('produit', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='fournitures.fourniture', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Commande archivée',
+                'verbose_name_plural': 'Commandes archivées',
+                'ordering': ['-date_creation'],
+                'indexes': [models.Index(fields=['produit', 'date_creation'], name='fournitures_produit_724cad_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MouvementArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('type_mouvement', models.CharField(choices=[('ENTREE', 'Entrée'), ('SORTIE', 'Sortie')], max_length=10, verbose_name='Type de mouvement')),
+                ('quantite', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Quantité')),
+                ('date', models.DateTimeField(verbose_name='Date')),
+                ('utilisateur_id', models.IntegerField(blank=True, null=True)),
+                ('commande_id', models.BigIntegerField(blank=True, null=True)),
+                ('notes', models.TextField(blank=True, null=True, verbose_name='Notes')),
+                ('produit', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='fournitures.fourniture', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Mouvement archivé',
+                'verbose_name_plural': 'Mouvements archivés',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['produit', 'date'], name='fournitures_produit_75b9d6_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumeMouvementJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField(verbose_name='Jour')),
+                ('entrees', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Entrées')),
+                ('sorties', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Sorties')),
+                ('nombre', models.PositiveIntegerField(default=0, verbose_name='Nombre de mouvements')),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumes_mouvements', to='fournitures.fourniture', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Résumé journalier de mouvements archivés',
+                'verbose_name_plural': 'Résumés journaliers de mouvements archivés',
+                'ordering': ['-jour'],
+                'indexes': [models.Index(fields=['jour'], name='fournitures_jour_353212_idx')],
+                'unique_together': {('produit', 'jour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SegmentArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modele', models.CharField(choices=[('mouvement', 'Mouvement'), ('commande', 'Commande')], max_length=20, verbose_name='Modèle')),
+                ('fichier', models.CharField(max_length=255, verbose_name='Fichier')),
+                ('offset', models.BigIntegerField(verbose_name='Position')),
+                ('longueur', models.PositiveIntegerField(verbose_name='Longueur compressée')),
+                ('date_min', models.DateTimeField(verbose_name='Date minimale')),
+                ('date_max', models.DateTimeField(verbose_name='Date maximale')),
+                ('nombre', models.PositiveIntegerField(verbose_name='Nombre de lignes')),
+                ('produit', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='fournitures.fourniture', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': "Segment d'archive",
+                'verbose_name_plural': "Segments d'archive",
+                'ordering': ['-date_max'],
+                'indexes': [models.Index(fields=['modele', 'produit', 'date_max'], name='fournitures_modele_36bbe0_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:45
+
+import itertools
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def initialiser_lieux(apps, schema_editor):
+    """Lieu par défaut portant tout le stock existant"""
+    LieuStockage = apps.get_model('fournitures', 'LieuStockage')
+    StockParLieu = apps.get_model('fournitures', 'StockParLieu')
+    Fourniture = apps.get_model('fournitures', 'Fourniture')
+
+    lieu, _ = LieuStockage.objects.get_or_create(nom="Magasin principal", defaults={'par_defaut': True})
+    lignes = (
+        StockParLieu(produit_id=produit_id, lieu_id=lieu.id, quantite=stock)
+        for produit_id, stock in Fourniture.objects.values_list('id', 'stock').iterator()
+    )
+    while True:
+        lot = list(itertools.islice(lignes, 1000))
+        if not lot:
+            break
+        StockParLieu.objects.bulk_create(lot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fournitures', '0018_archivage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mouvementarchive',
+            name='lieu_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='LieuStockage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=100, unique=True, verbose_name='Nom')),
+                ('actif', models.BooleanField(default=True, verbose_name='Actif')),
+                ('par_defaut', models.BooleanField(default=False, help_text='Lieu des mouvements, réceptions et ajustements sans lieu précisé', verbose_name='Lieu par défaut')),
+            ],
+            options={
+                'verbose_name': 'Lieu de stockage',
+                'verbose_name_plural': 'Lieux de stockage',
+                'ordering': ['-par_defaut', 'nom'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('par_defaut', True)), fields=('par_defaut',), name='lieu_stockage_un_seul_defaut')],
+            },
+        ),
+        migrations.AddField(
+            model_name='mouvement',
+            name='lieu',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='mouvements', to='fournitures.lieustockage', verbose_name='Lieu'),
+        ),
+        migrations.CreateModel(
+            name='StockParLieu',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantite', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Quantité')),
+                ('lieu', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stocks', to='fournitures.lieustockage', verbose_name='Lieu')),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stocks_lieux', to='fournitures.fourniture', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Stock par lieu',
+                'verbose_name_plural': 'Stocks par lieu',
+                'unique_together': {('produit', 'lieu')},
+            },
+        ),
+        migrations.CreateModel(
+            name='Transfert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantite', models.IntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='Quantité')),
+                ('date', models.DateTimeField(auto_now_add=True, verbose_name='Date')),
+                ('notes', models.TextField(blank=True, default='', verbose_name='Notes')),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transferts_entrants', to='fournitures.lieustockage', verbose_name="Lieu d'arrivée")),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transferts', to='fournitures.fourniture', verbose_name='Produit')),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transferts_sortants', to='fournitures.lieustockage', verbose_name='Lieu de départ')),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Transfert',
+                'verbose_name_plural': 'Transferts',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['produit', 'date'], name='fournitures_produit_3a6c97_idx')],
+            },
+        ),
+        migrations.RunPython(initialiser_lieux, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fournitures', '0019_stock_par_lieu'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CleIdempotence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=64, unique=True, verbose_name='Clé')),
+                ('mouvement_id', models.BigIntegerField(verbose_name='Mouvement')),
+                ('date', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Date')),
+            ],
+            options={
+                'verbose_name': "Clé d'idempotence",
+                'verbose_name_plural': "Clés d'idempotence",
+            },
+        ),
+        migrations.AddField(
+            model_name='mouvement',
+            name='date_saisie',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Date de saisie'),
+        ),
+        migrations.AddField(
+            model_name='mouvementarchive',
+            name='date_saisie',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Date de saisie'),
+        ),
+    ]
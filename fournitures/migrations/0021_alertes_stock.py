@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fournitures', '0020_saisie_lot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlerteStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_alerte', models.CharField(choices=[('ALERTE', 'Passage sous le seuil'), ('RETOUR', 'Retour au-dessus du seuil')], max_length=10, verbose_name='Type')),
+                ('stock_avant', models.IntegerField(verbose_name='Stock avant')),
+                ('stock_apres', models.IntegerField(verbose_name='Stock après')),
+                ('seuil_alerte', models.IntegerField(verbose_name="Seuil d'alerte")),
+                ('date', models.DateTimeField(auto_now_add=True, verbose_name='Date')),
+                ('date_envoi', models.DateTimeField(blank=True, null=True, verbose_name="Date d'envoi")),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertes', to='fournitures.fourniture', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Alerte de stock',
+                'verbose_name_plural': 'Alertes de stock',
+                'ordering': ['-date'],
+                'indexes': [models.Index(condition=models.Q(('date_envoi__isnull', True)), fields=['id'], name='alerte_stock_a_envoyer'), models.Index(fields=['date_envoi'], name='fournitures_date_en_60aa03_idx')],
+            },
+        ),
+    ]
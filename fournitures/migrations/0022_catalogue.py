@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fournitures', '0021_alertes_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='typefourniture',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='fourniture',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
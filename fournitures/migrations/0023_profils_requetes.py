@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fournitures', '0022_catalogue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfilRequete',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vue', models.CharField(max_length=100, verbose_name='Vue')),
+                ('chemin', models.CharField(max_length=500, verbose_name='Chemin')),
+                ('methode', models.CharField(max_length=10, verbose_name='Méthode')),
+                ('statut', models.PositiveSmallIntegerField(verbose_name='Statut HTTP')),
+                ('date', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Date')),
+                ('duree', models.FloatField(verbose_name='Durée (s)')),
+                ('requetes_sql', models.PositiveIntegerField(verbose_name='Requêtes SQL')),
+                ('memoire_pic', models.BigIntegerField(verbose_name='Pic mémoire (octets)')),
+                ('memoire_nette', models.BigIntegerField(verbose_name='Mémoire conservée (octets)')),
+                ('fonctions', models.JSONField(default=list, verbose_name='Fonctions principales')),
+                ('allocations', models.JSONField(default=list, verbose_name='Allocations principales')),
+                ('profil', models.BinaryField(verbose_name='Profil cProfile')),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Profil de requête',
+                'verbose_name_plural': 'Profils de requêtes',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['-duree'], name='fournitures_duree_d0cbf4_idx')],
+            },
+        ),
+    ]
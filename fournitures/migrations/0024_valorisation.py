@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:08
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fournitures', '0023_profils_requetes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commande',
+            name='prix_unitaire',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Prix unitaire'),
+        ),
+        migrations.AddField(
+            model_name='fourniture',
+            name='cout_moyen',
+            field=models.DecimalField(decimal_places=4, default=0, editable=False, max_digits=12, verbose_name='Coût moyen pondéré'),
+        ),
+        migrations.AddField(
+            model_name='fourniture',
+            name='valeur_stock',
+            field=models.DecimalField(decimal_places=4, default=0, editable=False, max_digits=16, verbose_name='Valeur du stock'),
+        ),
+        migrations.AddField(
+            model_name='mouvement',
+            name='cout_unitaire',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Coût unitaire'),
+        ),
+        migrations.AddField(
+            model_name='mouvementarchive',
+            name='cout_unitaire',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True, verbose_name='Coût unitaire'),
+        ),
+        migrations.AddField(
+            model_name='resumemouvementjour',
+            name='valeur',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=16, verbose_name='Solde en valeur'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshot',
+            name='valeur',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=16, verbose_name='Valeur en fin de journée'),
+        ),
+    ]
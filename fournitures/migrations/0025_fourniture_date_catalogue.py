@@ -0,0 +1,32 @@
+# Tampon de version du catalogue distinct de date_modification, que chaque
+# mouvement de stock avance (voir fournitures/catalogue.py).
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def initialiser(apps, schema_editor):
+    Fourniture = apps.get_model('fournitures', 'Fourniture')
+    Fourniture.objects.update(date_catalogue=F('date_modification'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fournitures', '0024_valorisation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fourniture',
+            name='date_catalogue',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, db_index=True),
+        ),
+        migrations.RunPython(initialiser, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='fourniture',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
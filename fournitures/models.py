@@ -1,16 +1,25 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models import Sum, Q, F
+from django.db.models import DecimalField, ExpressionWrapper, Sum, Q, F, Value
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
 from django.core.exceptions import ValidationError
 from django.db import transaction, connection
+import math
 import re
 import time
 
+from .alertes import enregistrer_franchissements
+from .evenements import publier_mouvements, publier_statut_commande
+
 
 class TypeFourniture(models.Model):
     nom = models.CharField(max_length=100, unique=True, verbose_name="Nom du type")
+    date_modification = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.nom
@@ -48,8 +57,40 @@ class Fourniture(models.Model):
                                        validators=[MinValueValidator(0)])
     date_creation = models.DateTimeField(auto_now_add=True)
     date_modification = models.DateTimeField(auto_now=True)
+    # Dernière modification d'un champ de CHAMPS_CATALOGUE, pas du stock: sa valeur
+    # maximale sert de tampon de version au catalogue (voir catalogue.py)
+    date_catalogue = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
     actif = models.BooleanField(default=True, verbose_name="Actif")
 
+    # Recommandations calculées par la commande prevoir_seuils
+    seuil_alerte_recommande = models.IntegerField(null=True, blank=True, editable=False,
+                                                  verbose_name="Seuil d'alerte recommandé")
+    stock_max_recommande = models.IntegerField(null=True, blank=True, editable=False,
+                                               verbose_name="Stock maximum recommandé")
+    date_recommandation = models.DateTimeField(null=True, blank=True, editable=False,
+                                               verbose_name="Date de la recommandation")
+
+    # Consommation lissée, mise à jour à chaque sortie (voir enregistrer_consommation)
+    consommation_journaliere = models.FloatField(default=0, editable=False,
+                                                 verbose_name="Consommation journalière estimée")
+    date_derniere_sortie = models.DateTimeField(null=True, blank=True, editable=False,
+                                                verbose_name="Date de la dernière sortie")
+    date_rupture_estimee = models.DateTimeField(null=True, blank=True, editable=False, db_index=True,
+                                                verbose_name="Date de rupture estimée")
+
+    # Valorisation au coût moyen pondéré, mise à jour à chaque mouvement (voir _valoriser)
+    cout_moyen = models.DecimalField(max_digits=12, decimal_places=4, default=0, editable=False,
+                                     verbose_name="Coût moyen pondéré")
+    valeur_stock = models.DecimalField(max_digits=16, decimal_places=4, default=0, editable=False,
+                                       verbose_name="Valeur du stock")
+
+    # Constante de temps (en jours) de la moyenne exponentielle de consommation
+    CONSOMMATION_TAU_JOURS = 14
+    # Précision du coût moyen
+    PRECISION_COUT = Decimal('0.0001')
+    # Champs gardés par le catalogue en mémoire: les modifier avance date_catalogue
+    CHAMPS_CATALOGUE = ('reference', 'designation', 'type', 'unite', 'stock_max', 'seuil_alerte', 'actif')
+
     @property
     def en_alerte(self):
         """Vérifie si le stock est en dessous du seuil d'alerte"""
@@ -63,6 +104,40 @@ class Fourniture(models.Model):
             return min(round(pourcentage, 1), 100)
         return 0
 
+    @property
+    def jours_couverture(self):
+        """Nombre de jours avant rupture au rythme de consommation actuel (None si inconnu)"""
+        if self.date_rupture_estimee is None:
+            return None
+        restant = (self.date_rupture_estimee - timezone.now()).total_seconds() / 86400
+        return max(0, round(restant, 1))
+
+    def enregistrer_consommation(self, quantite, quand=None):
+        """
+        Met à jour en O(1) le taux de consommation lissé après une sortie.
+
+        Estimateur à décroissance exponentielle: taux = taux * exp(-Δ/τ) + quantite/τ,
+        Δ étant le nombre de jours écoulés depuis la sortie précédente.
+        """
+        quand = quand or timezone.now()
+        tau = self.CONSOMMATION_TAU_JOURS
+        if self.date_derniere_sortie:
+            delta = max(0.0, (quand - self.date_derniere_sortie).total_seconds() / 86400)
+            taux = self.consommation_journaliere * math.exp(-delta / tau)
+        else:
+            taux = 0.0
+        self.consommation_journaliere = taux + float(quantite) / tau
+        self.date_derniere_sortie = quand
+
+    def calculer_date_rupture(self, quand=None):
+        """Recalcule la date de rupture estimée à partir du stock et du taux de consommation"""
+        quand = quand or timezone.now()
+        if self.consommation_journaliere > 0:
+            self.date_rupture_estimee = quand + timedelta(days=float(self.stock) / self.consommation_journaliere)
+        else:
+            self.date_rupture_estimee = None
+        return self.date_rupture_estimee
+
     def get_quantite_commandee(self, status_filter=None):
         """Retourne la quantité commandée selon le statut"""
         query = self.commandes.all()
@@ -78,8 +153,18 @@ class Fourniture(models.Model):
     @property
     def quantite_commandee_validee(self):
         """Quantité commandée avec statut VALIDEE (non encore reçue)"""
+        # Annotée par annoter_quantite_validee pour les listes: pas de requête par produit
+        if hasattr(self, 'quantite_validee'):
+            return self.quantite_validee
         return self.get_quantite_commandee('VALIDEE')
 
+    @staticmethod
+    def annoter_quantite_validee(queryset):
+        """Ajoute à chaque produit la quantité commandée VALIDEE, lue par quantite_commandee_validee"""
+        return queryset.annotate(quantite_validee=Coalesce(
+            Sum('commandes__quantite', filter=Q(commandes__status='VALIDEE')), 0
+        ))
+
     @property
     def quantite_commandee_attente(self):
         """Quantité commandée avec statut EN_ATTENTE"""
@@ -211,122 +296,211 @@ class Fourniture(models.Model):
         if not self.reference or not self.reference.strip():
             raise ValueError("La référence ne peut pas être vide")
 
+        creation = self._state.adding
+        update_fields = kwargs.get('update_fields')
         with transaction.atomic():
+            # Stock saisi directement (formulaire, import, admin): une hausse va au lieu par
+            # défaut, une baisse est prise sur les lieux qui détiennent du stock
+            ancien = None
+            if creation:
+                ecart = self.stock
+                self.valeur_stock = self.stock * self.cout_moyen
+            elif update_fields is None or {'stock', 'type_id', *self.CHAMPS_CATALOGUE} & set(update_fields):
+                attributs = [self._meta.get_field(champ).attname for champ in self.CHAMPS_CATALOGUE]
+                ancien = Fourniture.objects.filter(pk=self.pk).values_list(
+                    'stock', 'seuil_alerte', 'cout_moyen', 'valeur_stock', *attributs).first()
+                ecart = self.stock - ancien[0] if ancien is not None else 0
+                if ancien is not None:
+                    ajoutes = []
+                    # Valorisation tenue par les mouvements: l'écart est valorisé au coût moyen
+                    self.cout_moyen = ancien[2]
+                    self.valeur_stock = ancien[3] + ecart * ancien[2]
+                    if ecart:
+                        ajoutes.append('valeur_stock')
+                    if any(getattr(self, attribut) != valeur for attribut, valeur in zip(attributs, ancien[4:])):
+                        self.date_catalogue = timezone.now()
+                        ajoutes.append('date_catalogue')
+                    if ajoutes and update_fields is not None:
+                        kwargs['update_fields'] = list(update_fields) + ajoutes
+            else:
+                ecart = 0
             super().save(*args, **kwargs)
+            if ecart < 0:
+                StockParLieu.retirer(self.pk, -ecart, LieuStockage.defaut().pk)
+            elif creation or ecart:
+                StockParLieu.ajuster(self.pk, LieuStockage.defaut().pk, ecart)
+            if ancien is not None:
+                enregistrer_franchissements([(self.pk, ancien[0], self.stock, ancien[1], self.seuil_alerte)])
+
+    def _valoriser(self, delta, cout_unitaire=None):
+        """
+        Valorisation en mémoire d'un mouvement de `delta` sur un produit
+        verrouillé (saisies groupées), avant la mise à jour de self.stock.
 
-    def entree_stock(self, quantite, utilisateur=None, notes=""):
-        """Méthode pour entrée de stock"""
-        from .models import Mouvement
+        Le mouvement est valorisé à `cout_unitaire` pour une entrée qui en
+        porte un, au coût moyen sinon; une entrée recalcule le coût moyen.
+        Retourne le coût unitaire appliqué, à enregistrer sur le mouvement.
+        """
+        cout = self.cout_moyen if cout_unitaire is None or delta < 0 else Decimal(cout_unitaire)
+        delta = Decimal(str(delta))
+        self.valeur_stock += delta * cout
+        if delta > 0 and self.stock + delta > 0:
+            self.cout_moyen = (self.valeur_stock / (self.stock + delta)).quantize(self.PRECISION_COUT)
+        return cout
+
+    def _ajuster_total(self, delta, quantite_sortie=None, cout_unitaire=None):
+        """
+        Répercute `delta` sur le total Fourniture.stock par un UPDATE conditionnel.
+
+        Appelé en dernier dans la transaction: le verrou de la ligne produit,
+        commun à tous les lieux, n'est ainsi tenu que jusqu'au commit. Le
+        contrôle du stock maximum est fait par la clause WHERE. Consommation
+        et date de rupture sont calculées sur la dernière lecture du produit
+        (estimations, pas de verrou nécessaire).
+
+        Une sortie diminue la valeur du stock de `delta` × `cout_unitaire`
+        (coût moyen courant si non précisé) dans l'UPDATE. Une entrée
+        recalcule le coût moyen: la ligne est alors verrouillée et relue, et
+        le calcul fait en Python par _valoriser(), comme pour les saisies
+        groupées (une division SQL serait entière sous SQLite).
+        """
+        maintenant = timezone.now()
+        champs = {'stock': F('stock') + delta, 'date_modification': maintenant}
+        if delta > 0:
+            self.stock, self.cout_moyen, self.valeur_stock = Fourniture.objects.select_for_update().filter(
+                pk=self.pk).values_list('stock', 'cout_moyen', 'valeur_stock').get()
+            self._valoriser(delta, cout_unitaire)
+            champs['cout_moyen'] = self.cout_moyen
+            champs['valeur_stock'] = self.valeur_stock
+        else:
+            champs['valeur_stock'] = ExpressionWrapper(
+                F('valeur_stock') + Value(Decimal(str(delta)))
+                * (F('cout_moyen') if cout_unitaire is None else Value(Decimal(cout_unitaire))),
+                output_field=DecimalField(max_digits=16, decimal_places=4),
+            )
+        if quantite_sortie is not None:
+            self.enregistrer_consommation(quantite_sortie, maintenant)
+            champs['consommation_journaliere'] = self.consommation_journaliere
+            champs['date_derniere_sortie'] = self.date_derniere_sortie
+        self.stock += delta
+        champs['date_rupture_estimee'] = self.calculer_date_rupture(maintenant)
+
+        lignes = Fourniture.objects.filter(pk=self.pk)
+        if delta > 0:
+            lignes = lignes.filter(Q(stock_max__lte=0) | Q(stock__lte=F('stock_max') - delta))
+        if not lignes.update(**champs):
+            stock = Fourniture.objects.filter(pk=self.pk).values_list('stock', flat=True).first()
+            raise ValidationError(
+                f"Stock maximum dépassé! Maximum: {self.stock_max}, "
+                f"serait: {(stock or 0) + delta}"
+            )
 
+        # Ligne verrouillée par l'UPDATE: valeurs exactes pour détecter un franchissement du seuil
+        self.stock, seuil = Fourniture.objects.filter(pk=self.pk).values_list('stock', 'seuil_alerte').get()
+        enregistrer_franchissements([(self.pk, self.stock - delta, self.stock, seuil, seuil)])
+
+    def _mouvementer(self, type_mouvement, quantite, utilisateur=None, notes="", lieu=None,
+                     commande=None, consommation=True, cout_unitaire=None):
+        """
+        Entrée ou sortie sur un lieu de stockage (lieu par défaut si non précisé).
+
+        Seule la ligne (produit, lieu) est verrouillée pour la vérification du
+        disponible: des sorties sur des sites différents ne s'attendent pas.
+        Une entrée est valorisée à `cout_unitaire` s'il est fourni, tout autre
+        mouvement au coût moyen lu ici. Retourne le nouveau stock total.
+        """
         if quantite <= 0:
             raise ValidationError("La quantité doit être positive")
+        lieu_id = LieuStockage.identifiant(lieu)
+        delta = quantite if type_mouvement == 'ENTREE' else -quantite
 
         with transaction.atomic():
-            # Verrouiller l'enregistrement
-            produit = Fourniture.objects.select_for_update().get(pk=self.pk)
+            # Verrouiller la ligne du lieu
+            StockParLieu.ajuster(self.pk, lieu_id, delta)
 
-            # Calculer le nouveau stock
-            nouveau_stock = produit.stock + quantite
-
-            # Vérifier le stock maximum
-            if produit.stock_max and nouveau_stock > produit.stock_max:
-                raise ValidationError(
-                    f"Stock maximum dépassé! Maximum: {produit.stock_max}, "
-                    f"serait: {nouveau_stock}"
-                )
-
-            # Mettre à jour le stock
-            produit.stock = nouveau_stock
-            produit.save()
-
-            # Créer le mouvement
+            produit = Fourniture.objects.get(pk=self.pk)
+            if cout_unitaire is None or type_mouvement != 'ENTREE':
+                cout_unitaire = produit.cout_moyen
             Mouvement.objects.create(
                 produit=produit,
-                type_mouvement='ENTREE',
+                lieu_id=lieu_id,
+                type_mouvement=type_mouvement,
                 quantite=quantite,
+                cout_unitaire=cout_unitaire,
                 utilisateur=utilisateur,
-                notes=notes or f"Entrée de stock"
+                commande=commande,
+                notes=notes or ("Entrée de stock" if type_mouvement == 'ENTREE' else "Sortie de stock")
             )
+            sortie = quantite if type_mouvement == 'SORTIE' and consommation else None
+            produit._ajuster_total(delta, quantite_sortie=sortie, cout_unitaire=cout_unitaire)
 
         # Rafraîchir l'instance
         self.refresh_from_db()
         return self.stock
 
-    def sortie_stock(self, quantite, utilisateur=None, notes=""):
+    def entree_stock(self, quantite, utilisateur=None, notes="", lieu=None, cout_unitaire=None):
+        """Méthode pour entrée de stock, valorisée à `cout_unitaire` (coût moyen si non précisé)"""
+        return self._mouvementer('ENTREE', quantite, utilisateur, notes, lieu, cout_unitaire=cout_unitaire)
+
+    def sortie_stock(self, quantite, utilisateur=None, notes="", lieu=None):
         """Méthode pour sortie de stock"""
-        from .models import Mouvement
+        return self._mouvementer('SORTIE', quantite, utilisateur, notes, lieu)
+
+    def ajuster_stock(self, nouveau_stock, utilisateur=None, notes="", lieu=None):
+        """
+        Ajuste le stock total à `nouveau_stock` par un mouvement sur le lieu,
+        sans effet sur la consommation. Retourne le nouveau stock.
+        """
+        difference = nouveau_stock - self.stock
+        if difference == 0:
+            return self.stock
+        return self._mouvementer('ENTREE' if difference > 0 else 'SORTIE', abs(difference), utilisateur,
+                                 notes, lieu, consommation=False)
 
+    def transferer_stock(self, quantite, source, destination, utilisateur=None, notes=""):
+        """
+        Transfert atomique entre deux lieux: les deux lignes sont verrouillées
+        dans l'ordre des lieux (pas d'interblocage entre transferts croisés).
+        Le total du produit ne change pas et sa ligne n'est pas verrouillée.
+        """
         if quantite <= 0:
             raise ValidationError("La quantité doit être positive")
+        source_id, destination_id = LieuStockage.identifiant(source), LieuStockage.identifiant(destination)
+        if source_id == destination_id:
+            raise ValidationError("Les lieux de départ et d'arrivée doivent être différents")
 
         with transaction.atomic():
-            # Verrouiller l'enregistrement
-            produit = Fourniture.objects.select_for_update().get(pk=self.pk)
-
-            # Vérifier le stock disponible
-            if quantite > produit.stock:
+            StockParLieu.objects.get_or_create(produit_id=self.pk, lieu_id=destination_id)
+            lignes = {
+                l.lieu_id: l for l in StockParLieu.objects.select_for_update().filter(
+                    produit_id=self.pk, lieu_id__in=[source_id, destination_id]
+                ).order_by('lieu_id')
+            }
+            depart = lignes.get(source_id)
+            disponible = depart.quantite if depart else 0
+            if quantite > disponible:
                 raise ValidationError(
-                    f"Stock insuffisant! Disponible: {produit.stock}, "
+                    f"Stock insuffisant sur le lieu de départ! Disponible: {disponible}, "
                     f"demandé: {quantite}"
                 )
-
-            # Calculer le nouveau stock
-            nouveau_stock = produit.stock - quantite
-
-            # Mettre à jour le stock
-            produit.stock = nouveau_stock
-            produit.save()
-
-            # Créer le mouvement
-            Mouvement.objects.create(
-                produit=produit,
-                type_mouvement='SORTIE',
-                quantite=quantite,
-                utilisateur=utilisateur,
-                notes=notes or f"Sortie de stock"
+            StockParLieu.objects.filter(pk=depart.pk).update(quantite=F('quantite') - quantite)
+            StockParLieu.objects.filter(pk=lignes[destination_id].pk).update(quantite=F('quantite') + quantite)
+            return Transfert.objects.create(
+                produit_id=self.pk, source_id=source_id, destination_id=destination_id,
+                quantite=quantite, utilisateur=utilisateur, notes=notes,
             )
 
-        # Rafraîchir l'instance
-        self.refresh_from_db()
-        return self.stock
-
     @classmethod
-    def update_stock_safe(cls, produit_id, quantite, type_mouvement):
+    def update_stock_safe(cls, produit_id, quantite, type_mouvement, lieu=None):
         """
-        Méthode de classe STATIQUE pour mettre à jour le stock
+        Méthode de classe STATIQUE pour mettre à jour le stock (sans mouvement)
         """
+        delta = quantite if type_mouvement == 'ENTREE' else -quantite
         with transaction.atomic():
-            # Récupérer le produit avec verrouillage
-            produit = cls.objects.select_for_update().get(id=produit_id)
-
-            if type_mouvement == 'ENTREE':
-                # Vérifier le stock maximum
-                nouveau_stock = produit.stock + quantite
-                if produit.stock_max and nouveau_stock > produit.stock_max:
-                    raise ValidationError({
-                        "stock": f"Stock maximum dépassé! Maximum: {produit.stock_max}, "
-                                 f"serait: {nouveau_stock}"
-                    })
-
-                # Mise à jour
-                cls.objects.filter(id=produit_id).update(
-                    stock=F('stock') + quantite,
-                    date_modification=timezone.now()
-                )
-
-            else:  # SORTIE
-                # Vérifier le stock disponible
-                if quantite > produit.stock:
-                    raise ValidationError({
-                        "stock": f"Stock insuffisant! Disponible: {produit.stock}, "
-                                 f"demandé: {quantite}"
-                    })
-
-                # Mise à jour
-                cls.objects.filter(id=produit_id).update(
-                    stock=F('stock') - quantite,
-                    date_modification=timezone.now()
-                )
+            # Verrouiller la ligne du lieu, puis ajuster le total
+            StockParLieu.ajuster(produit_id, LieuStockage.identifiant(lieu), delta)
+            produit = cls.objects.get(id=produit_id)
+            produit._ajuster_total(delta, quantite_sortie=quantite if type_mouvement != 'ENTREE' else None)
 
             # Récupérer le nouveau stock
             produit.refresh_from_db()
@@ -368,6 +542,9 @@ class Commande(models.Model):
                                              verbose_name="Validée par")
     numero = models.CharField(max_length=20, unique=True, editable=False,
                               verbose_name="Numéro de commande", blank=True, null=True)
+    # Coût d'achat unitaire, valorise l'entrée en stock à la réception
+    prix_unitaire = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True,
+                                        validators=[MinValueValidator(0)], verbose_name="Prix unitaire")
 
     def generer_numero(self):
         """Génère automatiquement le numéro de commande"""
@@ -409,11 +586,13 @@ class Commande(models.Model):
             )
 
         with transaction.atomic():
+            ancien_statut = self.status
             self.status = 'VALIDEE'
             self.date_validation = timezone.now()
             if utilisateur:
                 self.utilisateur_validation = utilisateur
             self.save()
+            publier_statut_commande(self, ancien_statut)
 
     def mettre_en_cours(self, utilisateur=None):
         """Marquer la commande comme en cours de livraison"""
@@ -423,42 +602,46 @@ class Commande(models.Model):
             )
 
         with transaction.atomic():
+            ancien_statut = self.status
             self.status = 'EN_COURS'
             self.date_en_cours = timezone.now()
             self.save()
+            publier_statut_commande(self, ancien_statut)
 
-    def recevoir(self, utilisateur):
-        """Marquer la commande comme reçue et mettre à jour le stock"""
+    def recevoir(self, utilisateur, lieu=None, prix_unitaire=None):
+        """
+        Marquer la commande comme reçue et mettre à jour le stock du lieu (par
+        défaut si non précisé). L'entrée est valorisée au prix unitaire reçu,
+        ou à celui de la commande (coût moyen du produit si aucun).
+        """
         # Accepter les statuts VALIDEE et EN_COURS
         if self.status not in ['VALIDEE', 'EN_COURS']:
             raise ValidationError(
                 f"La commande #{self.id} ne peut pas être reçue (statut: {self.get_status_display()})"
             )
 
-        with transaction.atomic():
-            # Utiliser la méthode update_stock_safe
-            Fourniture.update_stock_safe(
-                produit_id=self.produit.id,
-                quantite=self.quantite,
-                type_mouvement='ENTREE'
-            )
+        if prix_unitaire is not None:
+            self.prix_unitaire = prix_unitaire
 
-            # Créer un mouvement pour l'historique
-            from .models import Mouvement
-            Mouvement.objects.create(
-                produit=self.produit,
-                type_mouvement='ENTREE',
-                quantite=self.quantite,
+        with transaction.atomic():
+            # Entrée sur le lieu et mouvement pour l'historique
+            self.produit._mouvementer(
+                'ENTREE',
+                self.quantite,
                 utilisateur=utilisateur,
                 notes=f"Réception commande {self.numero}" +
                       (f" - {self.notes}" if self.notes else ""),
-                commande=self
+                lieu=lieu,
+                commande=self,
+                cout_unitaire=self.prix_unitaire,
             )
 
             # Mettre à jour le statut de la commande
+            ancien_statut = self.status
             self.status = 'RECUE'
             self.date_reception = timezone.now()
             self.save()
+            publier_statut_commande(self, ancien_statut)
 
     def annuler(self, utilisateur=None):
         """Annuler la commande"""
@@ -466,8 +649,148 @@ class Commande(models.Model):
             raise ValidationError("Impossible d'annuler une commande déjà reçue")
 
         with transaction.atomic():
+            ancien_statut = self.status
             self.status = 'ANNULEE'
             self.save()
+            publier_statut_commande(self, ancien_statut)
+
+    # Action de lot -> (propriété d'éligibilité, libellé pour les messages)
+    ACTIONS_LOT = {
+        'valider': ('peut_etre_validee', 'validée'),
+        'mettre_en_cours': ('peut_etre_mise_en_cours', 'mise en cours'),
+        'recevoir': ('peut_etre_recue', 'reçue'),
+        'annuler': ('peut_etre_annulee', 'annulée'),
+    }
+
+    @classmethod
+    def traiter_lot(cls, commande_ids, action, utilisateur=None):
+        """
+        Applique une action du cycle de vie à plusieurs commandes dans une seule transaction.
+
+        Les commandes et, pour une réception, tous les produits concernés sont
+        verrouillés en une requête chacun; stocks, mouvements et statuts sont
+        ensuite écrits en lot. Une commande non éligible est ignorée sans
+        bloquer les autres.
+
+        Retourne un dict {commande_id: (succes, message)}.
+        """
+        if action not in cls.ACTIONS_LOT:
+            raise ValueError(f"Action inconnue: {action}")
+        propriete, libelle = cls.ACTIONS_LOT[action]
+
+        commande_ids = [int(cid) for cid in commande_ids]
+        resultats = {}
+        maintenant = timezone.now()
+
+        with transaction.atomic():
+            # Ordre stable des verrous pour éviter les interblocages entre lots
+            commandes = list(
+                cls.objects.select_for_update().filter(id__in=commande_ids).order_by('id')
+            )
+            trouvees = {c.id for c in commandes}
+            for cid in commande_ids:
+                if cid not in trouvees:
+                    resultats[cid] = (False, f"Commande #{cid} introuvable")
+
+            eligibles = []
+            anciens_statuts = {}
+            for c in commandes:
+                if getattr(c, propriete):
+                    eligibles.append(c)
+                    anciens_statuts[c.id] = c.status
+                else:
+                    resultats[c.id] = (False, f"La commande {c.numero or c.id} ne peut pas être "
+                                              f"{libelle} (statut: {c.get_status_display()})")
+
+            if action == 'valider':
+                champs = ['status', 'date_validation', 'utilisateur_validation']
+                for c in eligibles:
+                    c.status = 'VALIDEE'
+                    c.date_validation = maintenant
+                    if utilisateur:
+                        c.utilisateur_validation = utilisateur
+            elif action == 'mettre_en_cours':
+                champs = ['status', 'date_en_cours']
+                for c in eligibles:
+                    c.status = 'EN_COURS'
+                    c.date_en_cours = maintenant
+            elif action == 'annuler':
+                champs = ['status']
+                for c in eligibles:
+                    c.status = 'ANNULEE'
+            else:
+                champs = ['status', 'date_reception']
+                eligibles = cls._recevoir_lot(eligibles, utilisateur, maintenant, resultats)
+
+            cls.objects.bulk_update(eligibles, champs, batch_size=500)
+            for c in eligibles:
+                resultats[c.id] = (True, f"Commande {c.numero} {libelle}")
+                publier_statut_commande(c, anciens_statuts[c.id])
+
+        return {cid: resultats[cid] for cid in commande_ids}
+
+    @classmethod
+    def _recevoir_lot(cls, commandes, utilisateur, maintenant, resultats):
+        """Réception groupée sur le lieu par défaut: lignes de lieu puis produits verrouillées en une requête chacune"""
+        from .models import Mouvement
+
+        lieu_id = LieuStockage.defaut().pk
+        produit_ids = {c.produit_id for c in commandes}
+        # Même ordre de verrouillage que les mouvements unitaires: lieu, puis produit
+        StockParLieu.objects.bulk_create(
+            [StockParLieu(produit_id=pid, lieu_id=lieu_id) for pid in produit_ids], ignore_conflicts=True
+        )
+        lignes_lieu = {
+            l.produit_id: l for l in StockParLieu.objects.select_for_update().filter(
+                lieu_id=lieu_id, produit_id__in=produit_ids
+            ).order_by('produit_id')
+        }
+        produits = {
+            p.id: p for p in Fourniture.objects.select_for_update().filter(id__in=produit_ids).order_by('id')
+        }
+        stocks_avant = {p.id: p.stock for p in produits.values()}
+
+        recues = []
+        mouvements = []
+        for c in commandes:
+            produit = produits[c.produit_id]
+            nouveau_stock = produit.stock + c.quantite
+            if produit.stock_max and nouveau_stock > produit.stock_max:
+                resultats[c.id] = (False, f"Commande {c.numero}: stock maximum dépassé! "
+                                          f"Maximum: {produit.stock_max}, serait: {nouveau_stock}")
+                continue
+
+            cout = produit._valoriser(c.quantite, c.prix_unitaire)
+            produit.stock = nouveau_stock
+            lignes_lieu[c.produit_id].quantite += c.quantite
+            mouvements.append(Mouvement(
+                produit=produit,
+                lieu_id=lieu_id,
+                type_mouvement='ENTREE',
+                quantite=c.quantite,
+                cout_unitaire=cout,
+                utilisateur=utilisateur,
+                notes=f"Réception commande {c.numero}" + (f" - {c.notes}" if c.notes else ""),
+                commande=c,
+            ))
+            c.status = 'RECUE'
+            c.date_reception = maintenant
+            recues.append(c)
+
+        modifies = list({c.produit_id: produits[c.produit_id] for c in recues}.values())
+        for produit in modifies:
+            produit.calculer_date_rupture(maintenant)
+            produit.date_modification = maintenant
+        Fourniture.objects.bulk_update(modifies, [
+            'stock', 'valeur_stock', 'cout_moyen', 'date_rupture_estimee', 'date_modification',
+        ])
+        StockParLieu.objects.bulk_update([lignes_lieu[p.id] for p in modifies], ['quantite'])
+        enregistrer_franchissements(
+            (p.id, stocks_avant[p.id], p.stock, p.seuil_alerte, p.seuil_alerte) for p in modifies
+        )
+        Mouvement.objects.bulk_create(mouvements, batch_size=500)
+        publier_mouvements(m.id for m in mouvements)
+        return recues
 
     @property
     def en_retard(self):
@@ -523,8 +846,11 @@ class Commande(models.Model):
         if not self.numero or self.numero == 'CMD-TEMP':
             self.generer_numero()
 
+        creation = self._state.adding
         with transaction.atomic():
             super().save(*args, **kwargs)
+            if creation:
+                publier_statut_commande(self, None)
 
     def __str__(self):
         if self.numero:
@@ -536,6 +862,10 @@ class Commande(models.Model):
         verbose_name = "Commande"
         verbose_name_plural = "Commandes"
         ordering = ['-date_creation']
+        indexes = [
+            models.Index(fields=['date_creation']),
+            models.Index(fields=['status', 'date_creation']),
+        ]
 
 
 class Mouvement(models.Model):
@@ -593,6 +923,38 @@ class Mouvement(models.Model):
         verbose_name="Commande associée"
     )
 
+    # Lieu de stockage concerné (vide: mouvement antérieur au multi-sites, lieu par défaut)
+    lieu = models.ForeignKey(
+        'LieuStockage',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='mouvements',
+        verbose_name="Lieu"
+    )
+
+    # Horodatage du terminal de saisie (scanners), la date restant celle de l'enregistrement
+    date_saisie = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Date de saisie"
+    )
+
+    # Coût unitaire valorisant le mouvement: coût d'achat d'une entrée, coût moyen sinon
+    # (vide: mouvement antérieur à la valorisation, compté pour zéro)
+    cout_unitaire = models.DecimalField(
+        max_digits=12,
+        decimal_places=4,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(0)],
+        verbose_name="Coût unitaire"
+    )
+
+    # Nombre maximum de lignes d'une saisie en lot, quantité maximum d'une ligne
+    TAILLE_LOT_MAX = 5000
+    QUANTITE_LOT_MAX = 10 ** 9
+
     def clean(self):
         """Validation du mouvement"""
         # Validation de base
@@ -625,7 +987,172 @@ class Mouvement(models.Model):
     def save(self, *args, **kwargs):
         """Sauvegarde du mouvement"""
         self.full_clean()
+        creation = self._state.adding
         super().save(*args, **kwargs)
+        if creation:
+            publier_mouvements([self.pk])
+
+    @staticmethod
+    def _lire_ligne_lot(ligne):
+        """Contrôle et conversion d'une ligne de saisie en lot, retourne (erreur, données)"""
+        if not isinstance(ligne, dict):
+            return "Ligne invalide", None
+        cle = ligne.get('cle')
+        if not isinstance(cle, str) or not cle.strip() or len(cle) > 64:
+            return "Clé d'idempotence requise (64 caractères maximum)", None
+        reference = ligne.get('reference')
+        if not isinstance(reference, str) or not reference.strip():
+            return "Référence requise", None
+        type_mouvement = str(ligne.get('type', '')).upper()
+        if type_mouvement not in ('ENTREE', 'SORTIE'):
+            return "Type de mouvement invalide (ENTREE ou SORTIE)", None
+        try:
+            quantite = Decimal(str(ligne.get('quantite')))
+        except InvalidOperation:
+            return "Quantité invalide", None
+        if not quantite.is_finite() or quantite <= 0 or quantite != quantite.to_integral_value():
+            return "La quantité doit être un entier positif", None
+        if quantite > Mouvement.QUANTITE_LOT_MAX:
+            return f"Quantité trop grande (maximum {Mouvement.QUANTITE_LOT_MAX})", None
+        date_saisie = None
+        if ligne.get('date'):
+            try:
+                date_saisie = parse_datetime(str(ligne['date']))
+            except ValueError:
+                # Bien formée mais impossible (30 février, 25 h...)
+                date_saisie = None
+            if date_saisie is None:
+                return "Date invalide (ISO 8601 attendu)", None
+            if timezone.is_naive(date_saisie):
+                date_saisie = timezone.make_aware(date_saisie)
+        return None, (cle.strip(), reference.strip(), type_mouvement, int(quantite), date_saisie)
+
+    @classmethod
+    def enregistrer_lot(cls, lignes, utilisateur=None, lieu=None):
+        """
+        Saisie groupée (scanners): applique des lignes {cle, reference, type,
+        quantite, date} sur un lieu dans une seule transaction.
+
+        Références et clés d'idempotence sont résolues en une requête chacune,
+        lignes de lieu puis produits verrouillés en une requête chacun (même
+        ordre que les mouvements unitaires); mouvements, stocks et clés sont
+        écrits en lot, sans full_clean. Une ligne rejetée ne bloque pas les
+        autres; une clé déjà enregistrée renvoie le mouvement d'origine sans
+        rien rejouer.
+
+        Retourne un résultat par ligne, dans l'ordre.
+        """
+        lieu_id = LieuStockage.identifiant(lieu)
+        maintenant = timezone.now()
+        resultats = [None] * len(lignes)
+        premieres = {}
+        valides = []
+        for i, ligne in enumerate(lignes):
+            erreur, donnees = cls._lire_ligne_lot(ligne)
+            if erreur:
+                resultats[i] = {'cle': ligne.get('cle') if isinstance(ligne, dict) else None,
+                                'succes': False, 'erreur': erreur}
+            elif donnees[0] in premieres:
+                # Clé répétée dans le lot: même résultat que sa première occurrence
+                resultats[i] = premieres[donnees[0]]
+            else:
+                premieres[donnees[0]] = i
+                valides.append((i, donnees))
+
+        with transaction.atomic():
+            deja_vues = dict(
+                CleIdempotence.objects.filter(cle__in=list(premieres)).values_list('cle', 'mouvement_id')
+            )
+            references = dict(
+                Fourniture.objects.filter(
+                    reference__in={d[1] for _, d in valides}
+                ).values_list('reference', 'id')
+            )
+            produit_ids = {references[d[1]] for _, d in valides if d[1] in references and d[0] not in deja_vues}
+
+            StockParLieu.objects.bulk_create(
+                [StockParLieu(produit_id=pid, lieu_id=lieu_id) for pid in produit_ids], ignore_conflicts=True
+            )
+            lignes_lieu = {
+                l.produit_id: l for l in StockParLieu.objects.select_for_update().filter(
+                    lieu_id=lieu_id, produit_id__in=produit_ids
+                ).order_by('produit_id')
+            }
+            produits = {
+                p.id: p for p in Fourniture.objects.select_for_update().filter(id__in=produit_ids).order_by('id')
+            }
+            stocks_avant = {p.id: p.stock for p in produits.values()}
+
+            mouvements = []
+            for i, (cle, reference, type_mouvement, quantite, date_saisie) in valides:
+                if cle in deja_vues:
+                    resultats[i] = {'cle': cle, 'succes': True, 'doublon': True, 'mouvement_id': deja_vues[cle]}
+                    continue
+                produit = produits.get(references.get(reference))
+                if produit is None:
+                    resultats[i] = {'cle': cle, 'succes': False, 'erreur': f"Référence inconnue: {reference}"}
+                    continue
+                if not produit.actif:
+                    resultats[i] = {'cle': cle, 'succes': False, 'erreur': f"Produit inactif: {reference}"}
+                    continue
+
+                ligne_lieu = lignes_lieu[produit.id]
+                if type_mouvement == 'SORTIE':
+                    if quantite > ligne_lieu.quantite:
+                        resultats[i] = {'cle': cle, 'succes': False,
+                                        'erreur': f"Stock insuffisant sur le lieu! Disponible: {ligne_lieu.quantite}, "
+                                                  f"demandé: {quantite}"}
+                        continue
+                    cout = produit._valoriser(-quantite)
+                    ligne_lieu.quantite -= quantite
+                    produit.stock -= quantite
+                    produit.enregistrer_consommation(quantite, maintenant)
+                else:
+                    if produit.stock_max and produit.stock + quantite > produit.stock_max:
+                        resultats[i] = {'cle': cle, 'succes': False,
+                                        'erreur': f"Stock maximum dépassé! Maximum: {produit.stock_max}, "
+                                                  f"serait: {produit.stock + quantite}"}
+                        continue
+                    cout = produit._valoriser(quantite)
+                    ligne_lieu.quantite += quantite
+                    produit.stock += quantite
+
+                mouvements.append((i, cle, cls(
+                    produit=produit,
+                    lieu_id=lieu_id,
+                    type_mouvement=type_mouvement,
+                    quantite=quantite,
+                    cout_unitaire=cout,
+                    utilisateur=utilisateur,
+                    date_saisie=date_saisie,
+                    notes="Saisie en lot",
+                )))
+                resultats[i] = {'cle': cle, 'succes': True, 'stock': produit.stock}
+
+            modifies = list({m.produit_id: produits[m.produit_id] for _, _, m in mouvements}.values())
+            for produit in modifies:
+                produit.calculer_date_rupture(maintenant)
+                produit.date_modification = maintenant
+            Fourniture.objects.bulk_update(modifies, [
+                'stock', 'valeur_stock', 'cout_moyen', 'consommation_journaliere', 'date_derniere_sortie',
+                'date_rupture_estimee', 'date_modification',
+            ], batch_size=500)
+            StockParLieu.objects.bulk_update([lignes_lieu[p.id] for p in modifies], ['quantite'], batch_size=500)
+            enregistrer_franchissements(
+                (p.id, stocks_avant[p.id], p.stock, p.seuil_alerte, p.seuil_alerte) for p in modifies
+            )
+            cls.objects.bulk_create([m for _, _, m in mouvements], batch_size=1000)
+            CleIdempotence.objects.bulk_create(
+                [CleIdempotence(cle=cle, mouvement_id=m.id) for _, cle, m in mouvements], batch_size=1000
+            )
+            for i, _, m in mouvements:
+                resultats[i]['mouvement_id'] = m.id
+            publier_mouvements(m.id for _, _, m in mouvements)
+
+        for i, resultat in enumerate(resultats):
+            if isinstance(resultat, int):
+                resultats[i] = resultats[resultat]
+        return resultats
 
     def __str__(self):
         if hasattr(self, 'produit') and self.produit:
@@ -635,4 +1162,403 @@ class Mouvement(models.Model):
     class Meta:
         verbose_name = "Mouvement"
         verbose_name_plural = "Mouvements"
-        ordering = ['-date']
\ No newline at end of file
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date']),
+            models.Index(fields=['type_mouvement', 'date']),
+            models.Index(fields=['produit', 'date']),
+        ]
+
+class AlerteStock(models.Model):
+    """
+    Boîte d'envoi des franchissements de seuil d'alerte, alimentée par les
+    chemins d'écriture du stock et vidée par la commande envoyer_alertes.
+    """
+    TYPE_CHOICES = [
+        ('ALERTE', 'Passage sous le seuil'),
+        ('RETOUR', 'Retour au-dessus du seuil'),
+    ]
+
+    produit = models.ForeignKey(
+        Fourniture,
+        on_delete=models.CASCADE,
+        related_name='alertes',
+        verbose_name="Produit"
+    )
+    type_alerte = models.CharField(max_length=10, choices=TYPE_CHOICES, verbose_name="Type")
+    stock_avant = models.IntegerField(verbose_name="Stock avant")
+    stock_apres = models.IntegerField(verbose_name="Stock après")
+    seuil_alerte = models.IntegerField(verbose_name="Seuil d'alerte")
+    date = models.DateTimeField(auto_now_add=True, verbose_name="Date")
+    date_envoi = models.DateTimeField(null=True, blank=True, verbose_name="Date d'envoi")
+
+    def __str__(self):
+        return f"{self.get_type_alerte_display()} {self.produit_id}: {self.stock_avant} → {self.stock_apres}"
+
+    class Meta:
+        verbose_name = "Alerte de stock"
+        verbose_name_plural = "Alertes de stock"
+        ordering = ['-date']
+        indexes = [
+            # Seules les alertes en attente sont lues par le worker
+            models.Index(fields=['id'], condition=Q(date_envoi__isnull=True), name='alerte_stock_a_envoyer'),
+            models.Index(fields=['date_envoi']),
+        ]
+
+
+class CleIdempotence(models.Model):
+    """Clé d'une ligne de saisie en lot déjà appliquée: un envoi rejoué ne crée pas de second mouvement"""
+    cle = models.CharField(max_length=64, unique=True, verbose_name="Clé")
+    mouvement_id = models.BigIntegerField(verbose_name="Mouvement")
+    date = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Date")
+
+    # Bien au-delà de la fenêtre de renvoi des terminaux
+    RETENTION = timedelta(days=30)
+
+    @classmethod
+    def purger(cls):
+        """Supprime les clés plus anciennes que RETENTION, retourne le nombre supprimé"""
+        return cls.objects.filter(date__lt=timezone.now() - cls.RETENTION).delete()[0]
+
+    def __str__(self):
+        return f"{self.cle} → {self.mouvement_id}"
+
+    class Meta:
+        verbose_name = "Clé d'idempotence"
+        verbose_name_plural = "Clés d'idempotence"
+
+
+class LieuStockage(models.Model):
+    """Magasin ou réserve où le stock est tenu"""
+    nom = models.CharField(max_length=100, unique=True, verbose_name="Nom")
+    actif = models.BooleanField(default=True, verbose_name="Actif")
+    par_defaut = models.BooleanField(default=False, verbose_name="Lieu par défaut",
+                                     help_text="Lieu des mouvements, réceptions et ajustements sans lieu précisé")
+
+    NOM_DEFAUT = "Magasin principal"
+
+    @classmethod
+    def defaut(cls):
+        """Lieu par défaut (créé au besoin)"""
+        lieu = cls.objects.filter(par_defaut=True).first()
+        if lieu is None:
+            lieu, _ = cls.objects.get_or_create(nom=cls.NOM_DEFAUT, defaults={'par_defaut': True})
+        return lieu
+
+    @classmethod
+    def identifiant(cls, lieu):
+        """Identifiant d'un lieu donné par instance ou id, lieu par défaut si None"""
+        if lieu is None:
+            return cls.defaut().pk
+        return lieu.pk if isinstance(lieu, cls) else int(lieu)
+
+    def __str__(self):
+        return self.nom
+
+    class Meta:
+        verbose_name = "Lieu de stockage"
+        verbose_name_plural = "Lieux de stockage"
+        ordering = ['-par_defaut', 'nom']
+        constraints = [
+            models.UniqueConstraint(fields=['par_defaut'], condition=Q(par_defaut=True),
+                                    name='lieu_stockage_un_seul_defaut'),
+        ]
+
+
+class StockParLieu(models.Model):
+    """
+    Stock d'un produit sur un lieu. Fourniture.stock en est le total, tenu à
+    jour à chaque mouvement (voir Fourniture._mouvementer).
+    """
+    produit = models.ForeignKey(
+        Fourniture,
+        on_delete=models.CASCADE,
+        related_name='stocks_lieux',
+        verbose_name="Produit"
+    )
+    lieu = models.ForeignKey(
+        LieuStockage,
+        on_delete=models.PROTECT,
+        related_name='stocks',
+        verbose_name="Lieu"
+    )
+    quantite = models.IntegerField(default=0, verbose_name="Quantité",
+                                   validators=[MinValueValidator(0)])
+
+    @classmethod
+    def ajuster(cls, produit_id, lieu_id, delta):
+        """Verrouille la ligne (produit, lieu), la crée au besoin, et lui applique `delta`"""
+        with transaction.atomic():
+            ligne, _ = cls.objects.select_for_update().get_or_create(produit_id=produit_id, lieu_id=lieu_id)
+            if ligne.quantite + delta < 0:
+                raise ValidationError(
+                    f"Stock insuffisant sur le lieu {ligne.lieu}! Disponible: {ligne.quantite}, "
+                    f"demandé: {-delta}"
+                )
+            if delta:
+                cls.objects.filter(pk=ligne.pk).update(quantite=F('quantite') + delta)
+                ligne.quantite += delta
+            return ligne
+
+    @classmethod
+    def retirer(cls, produit_id, quantite, lieu_id=None):
+        """
+        Retire `quantite` des lieux qui détiennent le produit: d'abord `lieu_id`,
+        puis les lieux les mieux pourvus (baisse du total saisie directement).
+        """
+        with transaction.atomic():
+            lignes = list(cls.objects.select_for_update().filter(
+                produit_id=produit_id, quantite__gt=0).order_by('id'))
+            disponible = sum(ligne.quantite for ligne in lignes)
+            if disponible < quantite:
+                raise ValidationError(
+                    f"Stock insuffisant! Disponible sur l'ensemble des lieux: {disponible}, demandé: {quantite}"
+                )
+            lignes.sort(key=lambda ligne: (ligne.lieu_id != lieu_id, -ligne.quantite))
+            for ligne in lignes:
+                pris = min(ligne.quantite, quantite)
+                cls.objects.filter(pk=ligne.pk).update(quantite=F('quantite') - pris)
+                quantite -= pris
+                if not quantite:
+                    break
+
+    def __str__(self):
+        return f"{self.produit_id} @ {self.lieu_id}: {self.quantite}"
+
+    class Meta:
+        verbose_name = "Stock par lieu"
+        verbose_name_plural = "Stocks par lieu"
+        unique_together = ('produit', 'lieu')
+
+
+class Transfert(models.Model):
+    """Transfert de stock entre deux lieux (sans effet sur le total du produit)"""
+    produit = models.ForeignKey(
+        Fourniture,
+        on_delete=models.CASCADE,
+        related_name='transferts',
+        verbose_name="Produit"
+    )
+    source = models.ForeignKey(LieuStockage, on_delete=models.PROTECT, related_name='transferts_sortants',
+                               verbose_name="Lieu de départ")
+    destination = models.ForeignKey(LieuStockage, on_delete=models.PROTECT, related_name='transferts_entrants',
+                                    verbose_name="Lieu d'arrivée")
+    quantite = models.IntegerField(verbose_name="Quantité", validators=[MinValueValidator(1)])
+    date = models.DateTimeField(auto_now_add=True, verbose_name="Date")
+    utilisateur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                    verbose_name="Utilisateur")
+    notes = models.TextField(blank=True, default="", verbose_name="Notes")
+
+    def __str__(self):
+        return f"{self.quantite} {self.produit_id}: {self.source} → {self.destination}"
+
+    class Meta:
+        verbose_name = "Transfert"
+        verbose_name_plural = "Transferts"
+        ordering = ['-date']
+        indexes = [models.Index(fields=['produit', 'date'])]
+
+
+class StockSnapshot(models.Model):
+    """Stock d'un produit à la fin d'une journée, pour les requêtes de stock à date"""
+    produit = models.ForeignKey(
+        Fourniture,
+        on_delete=models.CASCADE,
+        related_name='snapshots',
+        verbose_name="Produit"
+    )
+
+    date = models.DateField(verbose_name="Date")
+
+    stock = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        verbose_name="Stock en fin de journée"
+    )
+
+    valeur = models.DecimalField(
+        max_digits=16,
+        decimal_places=4,
+        default=0,
+        verbose_name="Valeur en fin de journée"
+    )
+
+    date_creation = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.produit_id} @ {self.date}: {self.stock}"
+
+    class Meta:
+        verbose_name = "Photo de stock"
+        verbose_name_plural = "Photos de stock"
+        ordering = ['-date']
+        unique_together = ('produit', 'date')
+        indexes = [models.Index(fields=['date'])]
+
+
+class EvenementTableauBord(models.Model):
+    """Événement diffusé au tableau de bord (broker 'base', voir evenements.py)"""
+    type_evenement = models.CharField(max_length=20, verbose_name="Type d'événement")
+    donnees = models.JSONField(default=dict, verbose_name="Données")
+    date = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Date")
+
+    def __str__(self):
+        return f"{self.type_evenement} #{self.id}"
+
+    class Meta:
+        verbose_name = "Événement du tableau de bord"
+        verbose_name_plural = "Événements du tableau de bord"
+        ordering = ['id']
+
+
+class ProfilRequete(models.Model):
+    """Profil d'une requête demandé par un membre du personnel (voir profilage.py)"""
+    vue = models.CharField(max_length=100, verbose_name="Vue")
+    chemin = models.CharField(max_length=500, verbose_name="Chemin")
+    methode = models.CharField(max_length=10, verbose_name="Méthode")
+    statut = models.PositiveSmallIntegerField(verbose_name="Statut HTTP")
+    utilisateur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                    verbose_name="Utilisateur")
+    date = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Date")
+    duree = models.FloatField(verbose_name="Durée (s)")
+    requetes_sql = models.PositiveIntegerField(verbose_name="Requêtes SQL")
+    memoire_pic = models.BigIntegerField(verbose_name="Pic mémoire (octets)")
+    memoire_nette = models.BigIntegerField(verbose_name="Mémoire conservée (octets)")
+    # [{fonction, emplacement, appels, temps_propre, temps_cumule}], triées par temps cumulé
+    fonctions = models.JSONField(default=list, verbose_name="Fonctions principales")
+    # [{emplacement, taille, blocs}], plus grosses allocations encore vivantes en fin de requête
+    allocations = models.JSONField(default=list, verbose_name="Allocations principales")
+    # Statistiques pstats complètes (marshal), lisibles par pstats ou snakeviz
+    profil = models.BinaryField(verbose_name="Profil cProfile")
+
+    def __str__(self):
+        return f"{self.vue} {self.duree * 1000:.0f} ms ({self.date:%d/%m/%Y %H:%M})"
+
+    class Meta:
+        verbose_name = "Profil de requête"
+        verbose_name_plural = "Profils de requêtes"
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['-duree']),
+        ]
+
+
+class ResumeMouvementJour(models.Model):
+    """Totaux journaliers par produit des mouvements archivés (voir archivage.py)"""
+    produit = models.ForeignKey(
+        Fourniture,
+        on_delete=models.CASCADE,
+        related_name='resumes_mouvements',
+        verbose_name="Produit"
+    )
+    jour = models.DateField(verbose_name="Jour")
+    entrees = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Entrées")
+    sorties = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Sorties")
+    nombre = models.PositiveIntegerField(default=0, verbose_name="Nombre de mouvements")
+    # Solde en valeur (entrées - sorties, quantité × coût unitaire)
+    valeur = models.DecimalField(max_digits=16, decimal_places=4, default=0, verbose_name="Solde en valeur")
+
+    def __str__(self):
+        return f"{self.produit_id} @ {self.jour}: +{self.entrees} -{self.sorties}"
+
+    class Meta:
+        verbose_name = "Résumé journalier de mouvements archivés"
+        verbose_name_plural = "Résumés journaliers de mouvements archivés"
+        ordering = ['-jour']
+        unique_together = ('produit', 'jour')
+        indexes = [models.Index(fields=['jour'])]
+
+
+class ResumeCommandeMois(models.Model):
+    """Nombre et quantités mensuels des commandes archivées, par statut"""
+    mois = models.DateField(verbose_name="Mois")
+    status = models.CharField(max_length=20, choices=Commande.STATUS_CHOICES, verbose_name="Statut")
+    nombre = models.PositiveIntegerField(default=0, verbose_name="Nombre de commandes")
+    quantite = models.BigIntegerField(default=0, verbose_name="Quantité totale")
+
+    def __str__(self):
+        return f"{self.mois:%m/%Y} {self.status}: {self.nombre}"
+
+    class Meta:
+        verbose_name = "Résumé mensuel de commandes archivées"
+        verbose_name_plural = "Résumés mensuels de commandes archivées"
+        ordering = ['-mois']
+        unique_together = ('mois', 'status')
+
+
+class MouvementArchive(models.Model):
+    """Mouvement déplacé hors de la table principale (archivage au format 'table')"""
+    id = models.BigIntegerField(primary_key=True)
+    # Sans contrainte: l'archive ne doit pas bloquer ni suivre les suppressions
+    produit = models.ForeignKey(Fourniture, on_delete=models.DO_NOTHING, db_constraint=False,
+                                related_name='+', verbose_name="Produit")
+    type_mouvement = models.CharField(max_length=10, choices=Mouvement.TYPE_CHOICES,
+                                      verbose_name="Type de mouvement")
+    quantite = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Quantité")
+    date = models.DateTimeField(verbose_name="Date")
+    utilisateur_id = models.IntegerField(null=True, blank=True)
+    commande_id = models.BigIntegerField(null=True, blank=True)
+    lieu_id = models.IntegerField(null=True, blank=True)
+    date_saisie = models.DateTimeField(null=True, blank=True, verbose_name="Date de saisie")
+    notes = models.TextField(blank=True, null=True, verbose_name="Notes")
+    cout_unitaire = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True,
+                                        verbose_name="Coût unitaire")
+
+    def __str__(self):
+        return f"{self.type_mouvement} {self.quantite} ({self.date:%d/%m/%Y})"
+
+    class Meta:
+        verbose_name = "Mouvement archivé"
+        verbose_name_plural = "Mouvements archivés"
+        ordering = ['-date']
+        indexes = [models.Index(fields=['produit', 'date'])]
+
+
+class CommandeArchive(models.Model):
+    """Commande clôturée déplacée hors de la table principale (format 'table')"""
+    id = models.BigIntegerField(primary_key=True)
+    numero = models.CharField(max_length=20, blank=True, null=True, verbose_name="Numéro")
+    produit = models.ForeignKey(Fourniture, on_delete=models.DO_NOTHING, db_constraint=False,
+                                related_name='+', verbose_name="Produit")
+    status = models.CharField(max_length=20, choices=Commande.STATUS_CHOICES, verbose_name="Statut")
+    date_creation = models.DateTimeField(verbose_name="Date de création")
+    donnees = models.JSONField(default=dict, verbose_name="Ligne d'origine")
+
+    def __str__(self):
+        return f"{self.numero or self.id} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "Commande archivée"
+        verbose_name_plural = "Commandes archivées"
+        ordering = ['-date_creation']
+        indexes = [models.Index(fields=['produit', 'date_creation'])]
+
+
+class SegmentArchive(models.Model):
+    """
+    Index d'un segment d'archive NDJSON compressé: un membre gzip contenant
+    les lignes d'un produit, à `offset` octets du début de `fichier`.
+    """
+    MODELE_CHOICES = [
+        ('mouvement', 'Mouvement'),
+        ('commande', 'Commande'),
+    ]
+
+    modele = models.CharField(max_length=20, choices=MODELE_CHOICES, verbose_name="Modèle")
+    fichier = models.CharField(max_length=255, verbose_name="Fichier")
+    offset = models.BigIntegerField(verbose_name="Position")
+    longueur = models.PositiveIntegerField(verbose_name="Longueur compressée")
+    produit = models.ForeignKey(Fourniture, on_delete=models.DO_NOTHING, db_constraint=False,
+                                related_name='+', verbose_name="Produit")
+    date_min = models.DateTimeField(verbose_name="Date minimale")
+    date_max = models.DateTimeField(verbose_name="Date maximale")
+    nombre = models.PositiveIntegerField(verbose_name="Nombre de lignes")
+
+    def __str__(self):
+        return f"{self.fichier}@{self.offset} ({self.nombre})"
+
+    class Meta:
+        verbose_name = "Segment d'archive"
+        verbose_name_plural = "Segments d'archive"
+        ordering = ['-date_max']
+        indexes = [models.Index(fields=['modele', 'produit', 'date_max'])]
@@ -0,0 +1,203 @@
+"""
+Partitionnement mensuel de la table des mouvements (PostgreSQL uniquement).
+
+Sur PostgreSQL, fournitures_mouvement est une table partitionnée par plage
+sur `date` (une partition par mois UTC, plus une partition par défaut qui
+recueille les lignes hors plage). La clé primaire devient (id, date), les
+identifiants restant uniques grâce à la séquence. Les requêtes filtrées
+sur `date` ne lisent que les partitions concernées.
+
+Sur les autres bases (SQLite en développement), la table reste ordinaire
+et ces fonctions ne font rien.
+"""
+import re
+from datetime import date
+
+TABLE = 'fournitures_mouvement'
+DEFAUT = f'{TABLE}_defaut'
+SEQUENCE = f'{TABLE}_id_seq_part'
+_NOM_PARTITION = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+
+def est_postgresql(connexion):
+    return connexion.vendor == 'postgresql'
+
+
+def est_partitionnee(connexion):
+    """Vrai si la table des mouvements est partitionnée sur cette connexion"""
+    if not est_postgresql(connexion):
+        return False
+    with connexion.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [TABLE])
+        return cursor.fetchone() is not None
+
+
+def mois_suivant(mois):
+    return date(mois.year + mois.month // 12, mois.month % 12 + 1, 1)
+
+
+def nom_partition(mois):
+    return f'{TABLE}_p{mois:%Y_%m}'
+
+
+def partitions(connexion):
+    """Mois (premier jour) des partitions mensuelles existantes, triés"""
+    with connexion.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass", [TABLE]
+        )
+        noms = [ligne[0] for ligne in cursor.fetchall()]
+    mois = []
+    for nom in noms:
+        m = _NOM_PARTITION.match(nom)
+        if m:
+            mois.append(date(int(m.group(1)), int(m.group(2)), 1))
+    return sorted(mois)
+
+
+def creer_partition(connexion, mois):
+    """
+    Crée la partition du mois si elle n'existe pas.
+
+    Les lignes de ce mois déjà tombées dans la partition par défaut y sont
+    déplacées (PostgreSQL refuse sinon de créer la partition).
+    """
+    nom, debut, fin = nom_partition(mois), mois, mois_suivant(mois)
+    bornes = f"FROM ('{debut:%Y-%m-%d} 00:00:00+00') TO ('{fin:%Y-%m-%d} 00:00:00+00')"
+    with connexion.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [nom])
+        if cursor.fetchone()[0] is not None:
+            return False
+
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAUT} WHERE date >= %s AND date < %s)",
+            [f'{debut:%Y-%m-%d} 00:00:00+00', f'{fin:%Y-%m-%d} 00:00:00+00'],
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(f"CREATE TABLE {nom} PARTITION OF {TABLE} FOR VALUES {bornes}")
+            return True
+
+        # Sortir la partition par défaut le temps de redistribuer ses lignes
+        cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {DEFAUT}")
+        cursor.execute(f"CREATE TABLE {nom} PARTITION OF {TABLE} FOR VALUES {bornes}")
+        cursor.execute(
+            f"WITH deplaces AS (DELETE FROM {DEFAUT} WHERE date >= %s AND date < %s RETURNING *) "
+            f"INSERT INTO {TABLE} SELECT * FROM deplaces",
+            [f'{debut:%Y-%m-%d} 00:00:00+00', f'{fin:%Y-%m-%d} 00:00:00+00'],
+        )
+        cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {DEFAUT} DEFAULT")
+    return True
+
+
+def creer_partitions(connexion, premier_mois, dernier_mois):
+    """Crée les partitions mensuelles de premier_mois à dernier_mois inclus, retourne les créées"""
+    creees = []
+    mois = date(premier_mois.year, premier_mois.month, 1)
+    while mois <= dernier_mois:
+        if creer_partition(connexion, mois):
+            creees.append(mois)
+        mois = mois_suivant(mois)
+    return creees
+
+
+def _copier_definitions(cursor):
+    """Index (hors clé primaire) et clés étrangères de la table, à recréer après reconstruction"""
+    cursor.execute(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s",
+        [TABLE],
+    )
+    index = [definition for nom, definition in cursor.fetchall() if nom != f'{TABLE}_pkey']
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'", [TABLE]
+    )
+    return index, cursor.fetchall()
+
+
+def _prochain_identifiant(cursor, sequence):
+    """Valeur que `sequence` renverrait au prochain nextval()"""
+    cursor.execute(f"SELECT last_value, is_called FROM {sequence}")
+    valeur, appelee = cursor.fetchone()
+    return valeur + 1 if appelee else valeur
+
+
+def _reconstruire(schema_editor, partitionnee):
+    """
+    Recrée la table des mouvements, partitionnée ou non, en conservant données, index et FK.
+
+    Une table partitionnée ne peut avoir de colonne identity (PostgreSQL < 17):
+    son id est alimenté par la séquence SEQUENCE, détenue par la colonne. Le
+    retour à une table ordinaire rétablit la colonne identity d'origine. Dans
+    les deux sens, la numérotation reprend après le plus grand id déjà
+    attribué (ids supprimés compris), jamais en arrière.
+    """
+    connexion = schema_editor.connection
+    ancienne = f'{TABLE}_ancienne'
+    with connexion.cursor() as cursor:
+        index, cles = _copier_definitions(cursor)
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {ancienne}")
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [ancienne])
+        ancienne_sequence = cursor.fetchone()[0]
+        prochain = _prochain_identifiant(cursor, ancienne_sequence) if ancienne_sequence else 1
+        cursor.execute(f"SELECT COALESCE(max(id), 0) + 1 FROM {ancienne}")
+        prochain = max(prochain, cursor.fetchone()[0])
+
+        option = ' PARTITION BY RANGE (date)' if partitionnee else ''
+        cursor.execute(
+            f"CREATE TABLE {TABLE} (LIKE {ancienne} INCLUDING DEFAULTS INCLUDING CONSTRAINTS){option}"
+        )
+        # Défaut nextval() copié de l'ancienne table: la séquence est recréée plus bas
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id DROP DEFAULT")
+
+        if partitionnee:
+            cursor.execute(f"CREATE TABLE {DEFAUT} PARTITION OF {TABLE} DEFAULT")
+            cursor.execute(f"SELECT min(date), max(date) FROM {ancienne}")
+            debut, fin = cursor.fetchone()
+            aujourd_hui = date.today()
+            debut = debut.date() if debut else aujourd_hui
+            fin = max(fin.date() if fin else aujourd_hui, aujourd_hui)
+            creer_partitions(connexion, debut, fin)
+
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {ancienne}")
+        # Supprime aussi ses index, sa clé primaire et sa séquence (identity ou SEQUENCE,
+        # détenue par sa colonne id), dont les noms sont réutilisés ci-dessous
+        cursor.execute(f"DROP TABLE {ancienne}")
+
+        if partitionnee:
+            cursor.execute(f"CREATE SEQUENCE {SEQUENCE} START WITH {prochain}")
+            cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+            cursor.execute(f"ALTER SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id")
+        else:
+            cursor.execute(
+                f"ALTER TABLE {TABLE} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY (START WITH {prochain})"
+            )
+
+        # La clé de partitionnement doit faire partie de la clé primaire
+        cle_primaire = '(id, date)' if partitionnee else '(id)'
+        cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY {cle_primaire}")
+        for definition in index:
+            # Index d'une table partitionnée: « ON ONLY » ne créerait pas ceux des partitions
+            cursor.execute(definition.replace(' ON ONLY ', ' ON '))
+        for nom, definition in cles:
+            cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {nom} {definition}")
+        # Statistiques à jour: plans et estimations de l'admin (reltuples) dès la migration
+        cursor.execute(f"ANALYZE {TABLE}")
+
+
+def partitionner(apps, schema_editor):
+    """Migration: convertit la table des mouvements en table partitionnée par mois"""
+    if est_postgresql(schema_editor.connection) and not est_partitionnee(schema_editor.connection):
+        _reconstruire(schema_editor, partitionnee=True)
+
+
+def departitionner(apps, schema_editor):
+    """Migration inverse: retour à une table ordinaire"""
+    if est_partitionnee(schema_editor.connection):
+        _reconstruire(schema_editor, partitionnee=False)
+
+
+def partitions_lues(queryset):
+    """Partitions mensuelles parcourues par le plan d'exécution de `queryset`"""
+    plan = queryset.explain()
+    return sorted(set(re.findall(rf'\b({TABLE}_(?:p\d{{4}}_\d{{2}}|defaut))\b', plan)))
@@ -0,0 +1,163 @@
+"""
+Préchauffage d'un worker avant qu'il ne reçoive du trafic.
+
+Après un déploiement ou un recyclage de worker, les premières requêtes sur
+le tableau de bord et les statistiques payent les imports paresseux, la
+compilation des gabarits, l'ouverture des connexions et le chargement du
+catalogue. prechauffer() fait ce travail d'avance, par étapes chronométrées:
+
+- imports: modules de l'application et vues de toutes les URL;
+- gabarits: compilation des gabarits de l'application (gardés par le
+  chargeur en cache de Django);
+- connexions: ouverture d'une connexion persistante par base (CONN_MAX_AGE);
+- catalogue: chargement du catalogue en mémoire (voir catalogue.py);
+- vues: rendu des VUES_CHAUDES pour le premier superutilisateur actif, ce
+  qui exécute aussi les imports faits dans le corps des vues.
+
+Appelé par la commande prechauffer et par gestion_fournitures/wsgi.py
+(variable d'environnement PRECHAUFFAGE). Avant un fork (gunicorn --preload),
+les connexions ne doivent pas être partagées entre workers: avec
+avant_fork=True, l'étape connexions est sautée et les connexions ouvertes
+par les autres étapes sont refermées à la fin.
+"""
+import importlib
+import os
+import pkgutil
+import time
+
+from django.apps import apps
+from django.db import connections
+
+VUES_CHAUDES = ('dashboard', 'statistiques', 'liste_stock')
+ETAPES = ('imports', 'gabarits', 'connexions', 'catalogue', 'vues')
+
+# Modules jamais importés au préchauffage (chargés par les commandes elles-mêmes)
+_EXCLUS = ('.migrations', '.management', '.tests')
+
+
+def _racine_projet():
+    from django.conf import settings
+
+    return settings.BASE_DIR
+
+
+def _imports():
+    from django.urls import get_resolver
+
+    modules, ignores = 0, []
+    for config in apps.get_app_configs():
+        if not config.path.startswith(str(_racine_projet())):
+            continue
+        for module in pkgutil.walk_packages([config.path], prefix=f'{config.name}.'):
+            if any(exclu in module.name for exclu in _EXCLUS):
+                continue
+            try:
+                importlib.import_module(module.name)
+            except ImportError:  # dépendance optionnelle absente
+                ignores.append(module.name)
+                continue
+            modules += 1
+
+    # Résout toutes les URL, ce qui importe les vues des autres applications
+    resolveur = get_resolver()
+    resolveur.reverse_dict
+    resultat = f"{modules} module(s), {len(resolveur.url_patterns)} motif(s) d'URL"
+    if ignores:
+        resultat += f", ignoré(s) faute de dépendance: {', '.join(ignores)}"
+    return resultat
+
+
+def _gabarits():
+    from django.template.loader import get_template
+
+    noms = []
+    for config in apps.get_app_configs():
+        dossier = os.path.join(config.path, 'templates')
+        if not config.path.startswith(str(_racine_projet())) or not os.path.isdir(dossier):
+            continue
+        for racine, _, fichiers in os.walk(dossier):
+            noms += [
+                os.path.relpath(os.path.join(racine, fichier), dossier).replace(os.sep, '/')
+                for fichier in fichiers if fichier.endswith('.html')
+            ]
+    for nom in noms:
+        get_template(nom)
+    return f"{len(noms)} gabarit(s)"
+
+
+def _connexions():
+    for alias in connections:
+        connections[alias].ensure_connection()
+    return ', '.join(connections)
+
+
+def _catalogue():
+    from .catalogue import catalogue
+
+    catalogue.invalider(complet=True)
+    return f"{len(catalogue.produits_actifs())} fourniture(s) active(s), {len(catalogue.types())} type(s)"
+
+
+def _vues():
+    from django.contrib.auth.models import User
+    from django.contrib.messages.storage.fallback import FallbackStorage
+    from django.contrib.sessions.backends.base import SessionBase
+    from django.test import RequestFactory
+    from django.urls import resolve, reverse
+
+    utilisateur = User.objects.filter(is_active=True, is_superuser=True).order_by('id').first()
+    if utilisateur is None:
+        return "aucun superutilisateur actif, étape sautée"
+
+    statuts = []
+    for nom in VUES_CHAUDES:
+        url = reverse(nom)
+        # Requête sans cookie ni session enregistrée: rien n'est écrit en base
+        requete = RequestFactory().get(url)
+        requete.user = utilisateur
+        requete.session = SessionBase()
+        requete._messages = FallbackStorage(requete)
+        reponse = resolve(url).func(requete)
+        if hasattr(reponse, 'render'):
+            reponse.render()
+        statuts.append(f"{nom} {reponse.status_code}")
+    return ', '.join(statuts)
+
+
+_FONCTIONS = {
+    'imports': _imports,
+    'gabarits': _gabarits,
+    'connexions': _connexions,
+    'catalogue': _catalogue,
+    'vues': _vues,
+}
+
+
+def prechauffer(etapes=ETAPES, avant_fork=False):
+    """
+    Exécute les étapes demandées dans l'ordre de ETAPES.
+
+    Retourne une liste de (étape, durée en secondes, détail). Une étape en
+    erreur est signalée dans le détail sans interrompre les suivantes: un
+    préchauffage incomplet ne doit pas empêcher le worker de démarrer.
+    """
+    resultats = []
+    for etape in ETAPES:
+        if etape not in etapes or (avant_fork and etape == 'connexions'):
+            continue
+        debut = time.perf_counter()
+        try:
+            detail = _FONCTIONS[etape]()
+        except Exception as e:
+            detail = f"erreur: {e}"
+        resultats.append((etape, time.perf_counter() - debut, detail))
+    if avant_fork:
+        connections.close_all()
+    return resultats
+
+
+def rapport(resultats):
+    """Lignes de texte du rapport de prechauffer()"""
+    lignes = [f"{etape:<11} {duree * 1000:8.1f} ms  {detail}" for etape, duree, detail in resultats]
+    lignes.append(f"{'total':<11} {sum(r[1] for r in resultats) * 1000:8.1f} ms")
+    return lignes
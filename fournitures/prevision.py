@@ -0,0 +1,114 @@
+"""
+Prévision de la consommation et calcul des seuils recommandés.
+
+Les sorties de stock sont chargées dans une matrice NumPy (produit × jour)
+puis un modèle de consommation (moyenne mobile ou lissage exponentiel)
+est ajusté ligne par ligne. recommander_bloc charge et calcule un bloc de
+produits dans le processus qui l'exécute: seuls les identifiants et les
+résultats transitent par le pool, jamais les matrices.
+"""
+from datetime import timedelta
+from statistics import NormalDist
+
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+METHODES = ('moyenne_mobile', 'lissage_exponentiel')
+
+
+def charger_matrice_sorties(produit_ids, jours, fin=None):
+    """
+    Charge les sorties des `jours` derniers jours dans une matrice
+    (len(produit_ids) × jours). Les quantités sont agrégées par jour en base.
+    """
+    from .historique_stock import debut_de_journee, fin_de_journee
+    from .models import Mouvement
+
+    fin = fin or timezone.localdate()
+    debut = fin - timedelta(days=jours - 1)
+    index = {pid: i for i, pid in enumerate(produit_ids)}
+    matrice = np.zeros((len(produit_ids), jours), dtype=np.float64)
+
+    lignes = Mouvement.objects.filter(
+        type_mouvement='SORTIE',
+        produit_id__in=produit_ids,
+        # Bornes sur la colonne elle-même: index et élagage des partitions
+        date__gte=debut_de_journee(debut),
+        date__lt=fin_de_journee(fin),
+    ).annotate(
+        jour=TruncDate('date')
+    ).values_list('produit_id', 'jour').annotate(
+        total=Sum('quantite')
+    ).order_by()
+
+    rangs, colonnes, quantites = [], [], []
+    for produit_id, jour, total in lignes.iterator(chunk_size=5000):
+        rangs.append(index[produit_id])
+        colonnes.append((jour - debut).days)
+        quantites.append(float(total or 0))
+
+    if rangs:
+        np.add.at(matrice, (np.array(rangs), np.array(colonnes)), np.array(quantites))
+    return matrice
+
+
+def moyenne_mobile(matrice, fenetre):
+    """Consommation journalière moyenne et écart-type sur les `fenetre` derniers jours"""
+    fenetre = max(1, min(fenetre, matrice.shape[1]))
+    recent = matrice[:, -fenetre:]
+    return recent.mean(axis=1), recent.std(axis=1)
+
+
+def lissage_exponentiel(matrice, alpha):
+    """
+    Lissage exponentiel simple vectorisé sur toutes les lignes.
+    L'écart-type est estimé à partir des erreurs de prévision à un pas.
+    """
+    niveau = matrice[:, 0].copy()
+    variance = np.zeros(matrice.shape[0], dtype=np.float64)
+    for t in range(1, matrice.shape[1]):
+        erreur = matrice[:, t] - niveau
+        variance = (1 - alpha) * variance + alpha * erreur ** 2
+        niveau = niveau + alpha * erreur
+    return niveau, np.sqrt(variance)
+
+
+def calculer_recommandations(matrice, methode='lissage_exponentiel', fenetre=30, alpha=0.2,
+                             niveau_service=0.95, delai=7, periode=30):
+    """
+    Calcule (seuil_alerte, stock_max) recommandés pour chaque ligne de la matrice.
+
+    - seuil_alerte = demande sur le délai + stock de sécurité z·σ·√délai
+    - stock_max = seuil_alerte + demande sur la période de révision
+    """
+    if methode == 'moyenne_mobile':
+        demande, ecart = moyenne_mobile(matrice, fenetre)
+    elif methode == 'lissage_exponentiel':
+        demande, ecart = lissage_exponentiel(matrice, alpha)
+    else:
+        raise ValueError(f"Méthode inconnue: {methode}")
+
+    z = NormalDist().inv_cdf(niveau_service)
+    stock_securite = z * ecart * np.sqrt(delai)
+    seuils = np.ceil(demande * delai + stock_securite).astype(np.int64)
+    maximums = np.ceil(seuils + demande * periode).astype(np.int64)
+
+    # Respecter les contraintes du modèle: seuil >= 0 et seuil < stock_max
+    seuils = np.maximum(seuils, 0)
+    maximums = np.maximum(maximums, seuils + 1)
+    return seuils, maximums
+
+
+def recommander_bloc(produit_ids, jours, fin=None, **parametres):
+    """
+    Charge la matrice d'un bloc et calcule ses recommandations.
+
+    Retourne (jours_avec_sorties, seuils, maximums), un élément par produit.
+    Exécutée dans un processus du pool, elle utilise la connexion à la base
+    propre à ce processus.
+    """
+    matrice = charger_matrice_sorties(produit_ids, jours, fin)
+    seuils, maximums = calculer_recommandations(matrice, **parametres)
+    return (matrice > 0).sum(axis=1), seuils, maximums
@@ -0,0 +1,192 @@
+"""
+Profilage à la demande d'une requête, réservé au personnel.
+
+Une requête d'un membre du personnel portant l'en-tête X-Profiler (ou le
+paramètre ?_profiler=1) est exécutée sous cProfile et tracemalloc par
+ProfilageMiddleware. Le profil est enregistré dans ProfilRequete avec le
+nom de la vue, la durée, le nombre de requêtes SQL, le pic mémoire, les
+fonctions les plus coûteuses et les allocations encore vivantes en fin de
+requête; son identifiant est renvoyé dans l'en-tête X-Profil-Id. La vue
+profils_requetes liste les requêtes profilées les plus lentes.
+
+Une seule requête est profilée à la fois par processus: tracemalloc est
+global au processus, et un second profil l'arrêterait sous le premier.
+Une demande de profil reçue pendant un autre est servie sans profil
+(en-tête X-Profil-Occupe). Les chiffres mémoire restent ceux du processus:
+les autres threads qui allouent pendant la requête y sont comptés.
+
+Limites: seul le thread de la requête est profilé par cProfile (les vues
+asynchrones s'exécutent ailleurs), et une réponse en flux ne l'est que
+jusqu'à l'envoi des en-têtes. Les PROFILAGE_MAX_PROFILS profils les plus
+récents sont conservés.
+"""
+import cProfile
+import marshal
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+EN_TETE = 'HTTP_X_PROFILER'
+PARAMETRE = '_profiler'
+NOMBRE_FONCTIONS = 40
+NOMBRE_ALLOCATIONS = 15
+
+# Profil en cours dans le processus (tracemalloc et cProfile sont globaux)
+_VERROU = threading.Lock()
+
+
+def sollicite(request):
+    """Vrai si la requête demande un profil (sans consulter l'utilisateur)"""
+    if not getattr(settings, 'PROFILAGE_ACTIF', True):
+        return False
+    return bool(request.META.get(EN_TETE) or request.GET.get(PARAMETRE))
+
+
+def autorise(utilisateur):
+    return bool(utilisateur and utilisateur.is_authenticated and utilisateur.is_staff)
+
+
+def demande(request):
+    """Vrai si la requête demande un profil et que l'utilisateur y a droit"""
+    return sollicite(request) and autorise(getattr(request, 'user', None))
+
+
+def _emplacement(fichier, ligne):
+    """Chemin court: relatif au projet, ou à partir du paquet pour les bibliothèques"""
+    if fichier == '~':
+        return '(fonction native)'
+    base = str(settings.BASE_DIR) + os.sep
+    if fichier.startswith(base):
+        fichier = fichier[len(base):]
+    elif 'site-packages' + os.sep in fichier:
+        fichier = fichier.split('site-packages' + os.sep, 1)[1]
+    return f"{fichier}:{ligne}" if ligne else fichier
+
+
+def resumer_fonctions(stats, nombre=NOMBRE_FONCTIONS):
+    """
+    Les `nombre` fonctions au plus fort temps cumulé d'un dictionnaire pstats,
+    plus autant au plus fort temps propre (le haut de la pile cumulée n'est
+    fait que d'enveloppes du framework), triées par temps cumulé.
+    """
+    cumule = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:nombre]
+    propre = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:nombre]
+    lignes = sorted(dict(cumule + propre).items(), key=lambda item: item[1][3], reverse=True)
+    return [
+        {
+            'fonction': fonction,
+            'emplacement': _emplacement(fichier, ligne),
+            'appels': appels,
+            'temps_propre': round(temps_propre, 6),
+            'temps_cumule': round(temps_cumule, 6),
+        }
+        for (fichier, ligne, fonction), (_, appels, temps_propre, temps_cumule, _) in lignes
+    ]
+
+
+def _resumer_allocations(avant, apres, nombre=NOMBRE_ALLOCATIONS):
+    differences = [d for d in apres.compare_to(avant, 'lineno') if d.size_diff > 0][:nombre]
+    return [
+        {
+            'emplacement': _emplacement(d.traceback[0].filename, d.traceback[0].lineno),
+            'taille': d.size_diff,
+            'blocs': d.count_diff,
+        }
+        for d in differences
+    ]
+
+
+def profiler_requete(request, get_response):
+    """Exécute get_response(request) sous profilage et enregistre le profil"""
+    if not _VERROU.acquire(blocking=False):
+        response = get_response(request)
+        response['X-Profil-Occupe'] = '1'
+        return response
+    try:
+        return _profiler(request, get_response)
+    finally:
+        _VERROU.release()
+
+
+def _instantane(filtres):
+    """(mémoire tracée, pic, instantané filtré), None si tracemalloc a été arrêté entre-temps"""
+    try:
+        memoire, pic = tracemalloc.get_traced_memory()
+        return memoire, pic, tracemalloc.take_snapshot().filter_traces(filtres)
+    except RuntimeError:
+        return None
+
+
+def _profiler(request, get_response):
+    from .models import ProfilRequete
+
+    deja_actif = tracemalloc.is_tracing()
+    if not deja_actif:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    # Filtre: les allocations de tracemalloc lui-même ne comptent pas
+    filtres = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    avant = _instantane(filtres)
+
+    captures = [CaptureQueriesContext(connections[alias]) for alias in connections]
+    for capture in captures:
+        capture.__enter__()
+    profil = cProfile.Profile()
+    debut = time.perf_counter()
+    profil.enable()
+    try:
+        response = get_response(request)
+    finally:
+        profil.disable()
+        duree = time.perf_counter() - debut
+        for capture in captures:
+            capture.__exit__(None, None, None)
+        apres = _instantane(filtres)
+        if not deja_actif:
+            tracemalloc.stop()
+
+    if avant is not None and apres is not None:
+        memoire_pic = apres[1] - avant[0]
+        memoire_nette = apres[0] - avant[0]
+        allocations = _resumer_allocations(avant[2], apres[2])
+    else:
+        memoire_pic = memoire_nette = 0
+        allocations = []
+
+    stats = pstats.Stats(profil).stats
+    match = getattr(request, 'resolver_match', None)
+    try:
+        enregistrement = ProfilRequete.objects.create(
+            vue=(match.view_name if match else '-')[:100],
+            chemin=request.get_full_path()[:500],
+            methode=request.method,
+            statut=response.status_code,
+            utilisateur=request.user,
+            duree=duree,
+            requetes_sql=sum(len(capture.captured_queries) for capture in captures),
+            memoire_pic=memoire_pic,
+            memoire_nette=memoire_nette,
+            fonctions=resumer_fonctions(stats),
+            allocations=allocations,
+            profil=marshal.dumps(stats),
+        )
+    except Exception:
+        # Le profil est accessoire: la réponse est rendue même s'il n'a pu être enregistré
+        return response
+
+    _purger(ProfilRequete)
+    response['X-Profil-Id'] = str(enregistrement.id)
+    return response
+
+
+def _purger(modele):
+    conserves = getattr(settings, 'PROFILAGE_MAX_PROFILS', 500)
+    limite = list(modele.objects.order_by('-id').values_list('id', flat=True)[conserves:conserves + 1])
+    if limite:
+        modele.objects.filter(id__lte=limite[0]).delete()
@@ -0,0 +1,172 @@
+"""
+Rapprochement entre Fourniture.stock, l'historique des mouvements et les
+stocks par lieu.
+
+Le stock attendu d'un produit est le solde de ses mouvements (entrées -
+sorties, y compris les totaux des mouvements archivés), éventuellement à
+partir d'une photo de stock d'ouverture. Le
+travail est découpé en tranches d'identifiants traitées chacune par deux
+requêtes groupées, ce qui permet de les répartir sur plusieurs processus.
+
+Les stocks par lieu font foi (leurs lignes sont verrouillées à chaque
+mouvement): corriger() réaligne le total sur leur somme et régularise
+l'historique par rapport à cette même somme.
+
+Total, lieux et mouvements d'une tranche sont lus dans un même instantané
+(REPEATABLE READ sous PostgreSQL), faute de quoi un mouvement validé entre
+deux lectures passerait pour un écart. corriger_tranche() verrouille en
+plus les lignes produit de la tranche jusqu'à la fin des corrections: les
+mouvements sur ces produits, qui mettent tous à jour la ligne produit,
+attendent le commit.
+"""
+from decimal import Decimal
+
+
+def initialiser_worker():
+    """Initialisation d'un processus de calcul: Django et connexions propres"""
+    import django
+    django.setup()
+
+
+def rapprocher_tranche(debut_id, fin_id, depuis=None):
+    """
+    Compare, pour les produits d'id dans [debut_id, fin_id[, le total
+    Fourniture.stock à la somme des stocks par lieu, lus dans la même requête,
+    et cette somme au solde des mouvements.
+
+    `depuis` (date ISO) utilise la photo de stock de cette journée comme solde
+    d'ouverture et ne rejoue que les mouvements postérieurs.
+
+    Retourne une liste de tuples (produit_id, reference, stock, somme des
+    lieux, attendu) pour les produits présentant au moins un écart.
+    """
+    from django.db import connection, transaction
+
+    # Dans une transaction ouverte par l'appelant, l'isolation est la sienne
+    instantane = connection.vendor == 'postgresql' and not connection.in_atomic_block
+    with transaction.atomic():
+        if instantane:
+            with connection.cursor() as curseur:
+                curseur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        return _comparer(debut_id, fin_id, depuis)
+
+
+def corriger_tranche(debut_id, fin_id, depuis=None):
+    """
+    Rapproche et corrige la tranche [debut_id, fin_id[ dans une transaction,
+    lignes produit verrouillées avant la comparaison.
+
+    Retourne (écarts, totaux réalignés, mouvements créés, erreurs), voir
+    rapprocher_tranche et corriger.
+    """
+    from django.db import transaction
+
+    from .models import Fourniture
+
+    with transaction.atomic():
+        list(Fourniture.objects.select_for_update().filter(
+            id__gte=debut_id, id__lt=fin_id).order_by('id').values_list('id', flat=True))
+        ecarts = _comparer(debut_id, fin_id, depuis)
+        return (ecarts, *corriger(ecarts))
+
+
+def _comparer(debut_id, fin_id, depuis):
+    from datetime import date, timedelta
+
+    from django.db.models import Case, DecimalField, F, Sum, Value, When
+    from django.db.models.functions import Coalesce
+
+    from .archivage import solde_resumes
+    from .historique_stock import fin_de_journee
+    from .models import Fourniture, Mouvement, StockSnapshot
+
+    produits = list(
+        Fourniture.objects.filter(id__gte=debut_id, id__lt=fin_id).annotate(
+            somme=Coalesce(Sum('stocks_lieux__quantite'), Value(0))
+        ).values_list('id', 'reference', 'stock', 'somme').order_by()
+    )
+    if not produits:
+        return []
+
+    mouvements = Mouvement.objects.filter(produit_id__gte=debut_id, produit_id__lt=fin_id)
+    ouverture = {}
+    if depuis:
+        jour = date.fromisoformat(depuis)
+        mouvements = mouvements.filter(date__gte=fin_de_journee(jour))
+        ouverture = dict(
+            StockSnapshot.objects.filter(
+                date=jour, produit_id__gte=debut_id, produit_id__lt=fin_id
+            ).values_list('produit_id', 'stock')
+        )
+
+    soldes = dict(
+        mouvements.values('produit_id').annotate(
+            solde=Sum(Case(
+                When(type_mouvement='ENTREE', then=F('quantite')),
+                default=-F('quantite'),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ))
+        ).order_by().values_list('produit_id', 'solde')
+    )
+
+    # Mouvements archivés, conservés sous forme de totaux journaliers
+    archives = solde_resumes(
+        date.fromisoformat(depuis) + timedelta(days=1) if depuis else None,
+        None,
+        [produit_id for produit_id, _, _, _ in produits],
+    )
+    for produit_id, solde in archives.items():
+        soldes[produit_id] = (soldes.get(produit_id) or Decimal('0')) + (solde or Decimal('0'))
+
+    ecarts = []
+    for produit_id, reference, stock, somme in produits:
+        attendu = ouverture.get(produit_id, Decimal('0')) + (soldes.get(produit_id) or Decimal('0'))
+        if stock != somme or Decimal(somme) != attendu:
+            ecarts.append((produit_id, reference, stock, somme, attendu))
+    return ecarts
+
+
+def corriger(ecarts):
+    """
+    Corrige les écarts renvoyés par rapprocher_tranche: le total est réaligné
+    sur la somme des lieux par Fourniture._ajuster_total (valeur du stock,
+    date de modification et alertes de seuil suivent), puis un mouvement de
+    régularisation aligne l'historique sur cette somme.
+
+    Retourne (totaux réalignés, mouvements créés, [(reference, erreur)] non corrigés).
+    """
+    from django.core.exceptions import ValidationError
+    from django.db import transaction
+
+    from .models import Fourniture, Mouvement
+
+    totaux, regularisations, erreurs = 0, [], []
+    produits = Fourniture.objects.in_bulk([e[0] for e in ecarts])
+    for produit_id, reference, stock, somme, attendu in ecarts:
+        produit = produits[produit_id]
+        try:
+            with transaction.atomic():
+                if stock != somme:
+                    produit.stock = stock
+                    produit._ajuster_total(somme - stock)
+                    totaux += 1
+        except ValidationError as e:
+            erreurs.append((reference or produit_id, ' '.join(e.messages)))
+            continue
+        if Decimal(somme) != attendu:
+            regularisations.append(Mouvement(
+                produit_id=produit_id,
+                type_mouvement='ENTREE' if somme > attendu else 'SORTIE',
+                quantite=abs(somme - attendu),
+                cout_unitaire=produit.cout_moyen,
+                notes=f"Régularisation rapprochement: historique {attendu}, stock {somme}",
+            ))
+    # bulk_create n'appelle pas Mouvement.save: le stock n'est pas modifié
+    with transaction.atomic():
+        Mouvement.objects.bulk_create(regularisations, batch_size=1000)
+    return totaux, len(regularisations), erreurs
+
+
+def tranches(debut, fin, taille):
+    """Découpe [debut, fin] en intervalles [a, b[ de `taille` identifiants"""
+    return [(a, min(a + taille, fin + 1)) for a in range(debut, fin + 1, taille)]
@@ -0,0 +1,82 @@
+"""
+Routage des lectures analytiques vers une réplique en lecture.
+
+Les vues décorées par @lecture_replica lisent les modèles de l'application
+sur l'alias REPLICA_DB_ALIAS, sauf si l'utilisateur vient d'écrire: le
+navigateur est alors épinglé quelques secondes sur la base principale pour
+qu'il relise ses propres écritures (voir EpinglagePrimaireMiddleware).
+L'épinglage est porté par un cookie signé dont la signature expire, et non
+par la session: il est vu par tous les workers dès la requête suivante,
+sans écriture de session.
+Sans alias de réplique configuré, tout reste sur 'default'.
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+# Vrai pendant l'exécution d'une vue autorisée à lire sur la réplique
+_lecture_replica = ContextVar('lecture_replica', default=False)
+
+COOKIE_EPINGLAGE = 'epingle_primaire'
+_SEL_EPINGLAGE = 'fournitures.routers.epinglage'
+
+
+def alias_replica():
+    """Alias de la réplique s'il est configuré, sinon None"""
+    alias = getattr(settings, 'REPLICA_DB_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def _duree_epinglage():
+    return getattr(settings, 'REPLICA_EPINGLAGE_SECONDES', 5)
+
+
+def lecture_epinglee(request):
+    """Vrai si le navigateur a écrit récemment et doit lire sur la base principale"""
+    return request.get_signed_cookie(
+        COOKIE_EPINGLAGE, default=None, salt=_SEL_EPINGLAGE, max_age=_duree_epinglage()
+    ) is not None
+
+
+def epingler(response):
+    """Épingle le navigateur sur la base principale pour REPLICA_EPINGLAGE_SECONDES"""
+    response.set_signed_cookie(
+        COOKIE_EPINGLAGE, '1', salt=_SEL_EPINGLAGE, max_age=_duree_epinglage(),
+        secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+    )
+
+
+def lecture_replica(vue):
+    """Décorateur de vue: lectures de l'application sur la réplique (hors navigateur épinglé)"""
+    @wraps(vue)
+    def wrapper(request, *args, **kwargs):
+        if not alias_replica() or lecture_epinglee(request):
+            return vue(request, *args, **kwargs)
+        jeton = _lecture_replica.set(True)
+        try:
+            return vue(request, *args, **kwargs)
+        finally:
+            _lecture_replica.reset(jeton)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """Envoie les lectures des modèles 'fournitures' sur la réplique dans les vues @lecture_replica"""
+    app_label = 'fournitures'
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == self.app_label and _lecture_replica.get():
+            return alias_replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplique et principale contiennent les mêmes données
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
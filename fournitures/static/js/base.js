@@ -0,0 +1,551 @@
+// Scripts communs à toutes les pages (extraits de base.html).
+// Les données de l'utilisateur connecté sont fournies par base.html
+// dans l'objet global UTILISATEUR.
+
+// ============================================
+// SYSTÈME DE TOAST (NOTIFICATIONS)
+// ============================================
+
+// Fonction pour afficher un toast
+function showToast(message, type = 'info', title = null) {
+    const container = document.getElementById('toast-container');
+    const template = document.getElementById('toast-template');
+    const toastElement = template.content.cloneNode(true);
+    const toast = toastElement.querySelector('.toast');
+
+    // Définir l'icône et le titre selon le type
+    let icon = 'ℹ️';
+    let defaultTitle = 'Information';
+
+    switch(type) {
+        case 'success':
+            icon = '✓';
+            defaultTitle = 'Succès';
+            break;
+        case 'error':
+            icon = '✗';
+            defaultTitle = 'Erreur';
+            break;
+        case 'warning':
+            icon = '⚠';
+            defaultTitle = 'Attention';
+            break;
+    }
+
+    // Configurer le toast
+    toast.classList.add(type);
+    toast.querySelector('.toast-icon').textContent = icon;
+    toast.querySelector('.toast-title').textContent = title || defaultTitle;
+    toast.querySelector('.toast-message').textContent = message;
+
+    // Bouton de fermeture
+    const closeBtn = toast.querySelector('.toast-close');
+    closeBtn.addEventListener('click', () => {
+        toast.style.animation = 'toastFadeOut 0.5s ease forwards';
+        setTimeout(() => toast.remove(), 500);
+    });
+
+    // Auto-suppression après 5 secondes
+    setTimeout(() => {
+        if (toast.parentNode) {
+            toast.style.animation = 'toastFadeOut 0.5s ease forwards';
+            setTimeout(() => toast.remove(), 500);
+        }
+    }, 5000);
+
+    // Ajouter au container
+    container.appendChild(toastElement);
+
+    // Retourner l'élément toast pour contrôle manuel
+    return toast;
+}
+
+// Fonctions d'aide rapides
+window.showSuccess = (message, title = 'Succès') => showToast(message, 'success', title);
+window.showError = (message, title = 'Erreur') => showToast(message, 'error', title);
+window.showWarning = (message, title = 'Attention') => showToast(message, 'warning', title);
+window.showInfo = (message, title = 'Information') => showToast(message, 'info', title);
+
+// ============================================
+// GESTION DES MESSAGES DJANGO
+// ============================================
+
+// Convertir les messages Django en toasts
+function convertDjangoMessagesToToasts() {
+    // Sélectionner tous les messages Django existants
+    const messages = document.querySelectorAll('.alert');
+    messages.forEach(msg => {
+        // Déterminer le type de message
+        let type = 'info';
+        if (msg.classList.contains('alert-success')) type = 'success';
+        else if (msg.classList.contains('alert-error') || msg.classList.contains('alert-danger')) type = 'error';
+        else if (msg.classList.contains('alert-warning')) type = 'warning';
+        else if (msg.classList.contains('alert-info')) type = 'info';
+
+        // Récupérer le texte du message
+        const messageText = msg.textContent.trim();
+
+        // Afficher le toast
+        showToast(messageText, type);
+
+        // Cacher le message original
+        msg.style.display = 'none';
+    });
+}
+
+// ============================================
+// GESTION GENERALE DES MODALES
+// ============================================
+
+// Fonction pour ouvrir une modale
+function openModal(modalId) {
+    document.getElementById(modalId).style.display = 'flex';
+    document.getElementById('userMenu').classList.remove('active');
+
+    if (modalId === 'photoModal') {
+        // Réinitialiser l'aperçu
+        document.getElementById('imagePreview').style.display = 'none';
+        document.getElementById('fileLabelText').textContent = 'Cliquez pour sélectionner une photo';
+        document.getElementById('photoInput').value = '';
+    }
+
+    if (modalId === 'accountModal') {
+        // Charger les paramètres sauvegardés
+        loadUserSettings();
+    }
+}
+
+// Fonction pour fermer une modale
+function closeModal(modalId) {
+    document.getElementById(modalId).style.display = 'none';
+}
+
+// Fermer les modales en cliquant en dehors
+document.querySelectorAll('.modal-overlay').forEach(modal => {
+    modal.addEventListener('click', function(e) {
+        if (e.target === this) {
+            closeModal(this.id);
+        }
+    });
+});
+
+// ============================================
+// GESTION DES PHOTOS DE PROFIL
+// ============================================
+
+// Prévisualisation de l'image sélectionnée
+document.getElementById('photoInput').addEventListener('change', function(e) {
+    const file = e.target.files[0];
+    if (file) {
+        // Vérifier la taille (max 2MB)
+        if (file.size > 2 * 1024 * 1024) {
+            showError('La photo est trop volumineuse. Maximum 2MB.');
+            this.value = '';
+            return;
+        }
+
+        // Vérifier l'extension
+        const validExtensions = ['jpg', 'jpeg', 'png', 'gif'];
+        const extension = file.name.split('.').pop().toLowerCase();
+        if (!validExtensions.includes(extension)) {
+            showError('Format non supporté. Utilisez JPG, PNG ou GIF.');
+            this.value = '';
+            return;
+        }
+
+        const reader = new FileReader();
+        reader.onload = function(e) {
+            const preview = document.getElementById('imagePreview');
+            preview.src = e.target.result;
+            preview.style.display = 'block';
+            document.getElementById('fileLabelText').textContent = file.name;
+        };
+        reader.readAsDataURL(file);
+    }
+});
+
+// Sauvegarder la photo de profil
+function saveProfilePhoto() {
+    const fileInput = document.getElementById('photoInput');
+    const file = fileInput.files[0];
+
+    if (!file) {
+        showWarning('Veuillez sélectionner une photo');
+        return;
+    }
+
+    const reader = new FileReader();
+    reader.onload = function(e) {
+        const imageUrl = e.target.result;
+
+        // Sauvegarder dans localStorage avec l'ID utilisateur
+        const userId = UTILISATEUR.id || 'default';
+        localStorage.setItem('userProfilePhoto_' + userId, imageUrl);
+
+        // Mettre à jour l'avatar
+        updateProfilePhoto(imageUrl);
+
+        // Fermer la modale
+        closeModal('photoModal');
+
+        // Afficher un message de succès
+        showSuccess('Votre photo de profil a été mise à jour avec succès.');
+    };
+    reader.readAsDataURL(file);
+}
+
+// Mettre à jour l'avatar avec la nouvelle photo
+function updateProfilePhoto(imageUrl) {
+    const avatar = document.getElementById('userAvatar');
+    const img = document.getElementById('userProfileImage');
+    const icon = document.getElementById('userProfileIcon');
+
+    img.src = imageUrl;
+    img.style.display = 'block';
+    icon.style.display = 'none';
+    avatar.classList.add('has-image');
+}
+
+// ============================================
+// GESTION "MON COMPTE"
+// ============================================
+
+// Changer d'onglet dans la modale
+function switchTab(tabId) {
+    // Désactiver tous les onglets
+    document.querySelectorAll('.modal-tab').forEach(tab => {
+        tab.classList.remove('active');
+    });
+    document.querySelectorAll('.tab-content').forEach(content => {
+        content.classList.remove('active');
+    });
+
+    // Activer l'onglet sélectionné
+    event.target.classList.add('active');
+    document.getElementById(tabId).classList.add('active');
+}
+
+// Mettre à jour les informations du profil
+function updateProfileInfo(event) {
+    event.preventDefault();
+
+    const fullName = document.getElementById('updateFullName').value;
+    const email = document.getElementById('updateEmail').value;
+
+    // Validation basique
+    if (!email) {
+        showError('L\'email est obligatoire.');
+        return;
+    }
+
+    // Ici, normalement vous enverriez les données au serveur
+    // Pour l'exemple, on simule avec localStorage
+    const userId = UTILISATEUR.id || 'default';
+    localStorage.setItem('userFullName_' + userId, fullName);
+    localStorage.setItem('userEmail_' + userId, email);
+
+    // Mettre à jour l'affichage
+    document.getElementById('profileFullName').textContent = fullName || 'Non renseigné';
+    document.querySelector('.user-menu-header .user-name').textContent = fullName || UTILISATEUR.username;
+    document.querySelector('.user-name').textContent = fullName || UTILISATEUR.username;
+
+    showSuccess('Profil mis à jour avec succès.');
+    setTimeout(() => closeModal('accountModal'), 1500);
+}
+
+// Changer le mot de passe
+function changePassword(event) {
+    event.preventDefault();
+
+    const currentPassword = document.getElementById('currentPassword').value;
+    const newPassword = document.getElementById('newPassword').value;
+    const confirmPassword = document.getElementById('confirmPassword').value;
+
+    // Validation
+    if (!currentPassword || !newPassword || !confirmPassword) {
+        showError('Tous les champs sont obligatoires.');
+        return;
+    }
+
+    if (newPassword.length < 8) {
+        showError('Le mot de passe doit contenir au moins 8 caractères.');
+        return;
+    }
+
+    if (newPassword !== confirmPassword) {
+        showError('Les mots de passe ne correspondent pas.');
+        return;
+    }
+
+    // Ici, normalement vous enverriez la requête au serveur
+    // Pour l'exemple, on simule
+    showSuccess('Mot de passe changé avec succès.');
+
+    // Réinitialiser le formulaire
+    document.getElementById('changePasswordForm').reset();
+
+    setTimeout(() => closeModal('accountModal'), 1500);
+}
+
+// Basculer affichage mot de passe
+function togglePassword(inputId, icon) {
+    const input = document.getElementById(inputId);
+    if (input.type === 'password') {
+        input.type = 'text';
+        icon.classList.remove('fa-eye');
+        icon.classList.add('fa-eye-slash');
+    } else {
+        input.type = 'password';
+        icon.classList.remove('fa-eye-slash');
+        icon.classList.add('fa-eye');
+    }
+}
+
+// Charger les paramètres utilisateur
+function loadUserSettings() {
+    const userId = UTILISATEUR.id || 'default';
+
+    // Charger les préférences
+    const emailNotifications = localStorage.getItem('emailNotifications_' + userId) !== 'false';
+    const darkMode = localStorage.getItem('darkMode_' + userId) === 'true';
+    const language = localStorage.getItem('language_' + userId) || 'fr';
+    const timezone = localStorage.getItem('timezone_' + userId) || 'Indian/Antananarivo';
+
+    // Mettre à jour les champs
+    document.getElementById('emailNotifications').checked = emailNotifications;
+    document.getElementById('darkMode').checked = darkMode;
+    document.getElementById('language').value = language;
+    document.getElementById('timezone').value = timezone;
+}
+
+// Sauvegarder les paramètres
+function saveSettings() {
+    const userId = UTILISATEUR.id || 'default';
+
+    // Sauvegarder les préférences
+    localStorage.setItem('emailNotifications_' + userId,
+        document.getElementById('emailNotifications').checked);
+    localStorage.setItem('darkMode_' + userId,
+        document.getElementById('darkMode').checked);
+    localStorage.setItem('language_' + userId,
+        document.getElementById('language').value);
+    localStorage.setItem('timezone_' + userId,
+        document.getElementById('timezone').value);
+
+    // Appliquer le mode sombre si activé
+    if (document.getElementById('darkMode').checked) {
+        document.body.classList.add('dark-mode');
+    } else {
+        document.body.classList.remove('dark-mode');
+    }
+
+    showSuccess('Paramètres enregistrés avec succès.');
+    setTimeout(() => closeModal('accountModal'), 1500);
+}
+
+// Exporter les données utilisateur
+function exportUserData() {
+    const userId = UTILISATEUR.id || 'default';
+    const userData = {
+        username: UTILISATEUR.username,
+        fullName: localStorage.getItem('userFullName_' + userId) || UTILISATEUR.fullName,
+        email: localStorage.getItem('userEmail_' + userId) || UTILISATEUR.email,
+        settings: {
+            emailNotifications: localStorage.getItem('emailNotifications_' + userId) !== 'false',
+            darkMode: localStorage.getItem('darkMode_' + userId) === 'true',
+            language: localStorage.getItem('language_' + userId) || 'fr',
+            timezone: localStorage.getItem('timezone_' + userId) || 'Indian/Antananarivo'
+        },
+        exportDate: new Date().toISOString()
+    };
+
+    // Créer et télécharger le fichier JSON
+    const dataStr = JSON.stringify(userData, null, 2);
+    const dataUri = 'data:application/json;charset=utf-8,'+ encodeURIComponent(dataStr);
+    const exportFileName = `user_data_${userId}_${new Date().toISOString().split('T')[0]}.json`;
+
+    const linkElement = document.createElement('a');
+    linkElement.setAttribute('href', dataUri);
+    linkElement.setAttribute('download', exportFileName);
+    linkElement.click();
+
+    showSuccess('Données exportées avec succès.');
+}
+
+// Charger la photo de profil au démarrage
+function loadUserProfileImage() {
+    const userId = UTILISATEUR.id || 'default';
+    const savedPhoto = localStorage.getItem('userProfilePhoto_' + userId);
+
+    if (savedPhoto) {
+        updateProfilePhoto(savedPhoto);
+    }
+}
+
+// ============================================
+// INITIALISATION
+// ============================================
+
+document.addEventListener('DOMContentLoaded', function() {
+    // Convertir les messages Django en toasts
+    convertDjangoMessagesToToasts();
+
+    // Gestion du menu utilisateur
+    const userProfile = document.getElementById('userProfile');
+    const userMenu = document.getElementById('userMenu');
+    const logoutLink = document.getElementById('logoutLink');
+
+    if (userProfile && userMenu) {
+        // Ouvrir/fermer le menu au clic
+        userProfile.addEventListener('click', function(e) {
+            if (!e.target.closest('.user-avatar')) {
+                e.stopPropagation();
+                userMenu.classList.toggle('active');
+                const chevron = userProfile.querySelector('.fa-chevron-down');
+                chevron.style.transform = userMenu.classList.contains('active') ? 'rotate(180deg)' : 'rotate(0)';
+            }
+        });
+
+        // Fermer le menu en cliquant ailleurs
+        document.addEventListener('click', function(e) {
+            if (!userMenu.contains(e.target) && !userProfile.contains(e.target)) {
+                userMenu.classList.remove('active');
+                const chevron = userProfile.querySelector('.fa-chevron-down');
+                chevron.style.transform = 'rotate(0)';
+            }
+        });
+
+        // Empêcher la fermeture quand on clique dans le menu
+        userMenu.addEventListener('click', function(e) {
+            e.stopPropagation();
+        });
+
+        // Gestion des liens du menu
+        const menuItems = userMenu.querySelectorAll('.user-menu-item');
+        menuItems.forEach(function(item) {
+            item.addEventListener('click', function() {
+                userMenu.classList.remove('active');
+                const chevron = userProfile.querySelector('.fa-chevron-down');
+                chevron.style.transform = 'rotate(0)';
+            });
+        });
+
+        // Confirmation pour la déconnexion
+        if (logoutLink) {
+            logoutLink.addEventListener('click', function(e) {
+                if (!confirm('Êtes-vous sûr de vouloir vous déconnecter ?')) {
+                    e.preventDefault();
+                }
+            });
+        }
+    }
+
+    // Charger la photo de profil
+    loadUserProfileImage();
+
+    // Charger les paramètres utilisateur
+    loadUserSettings();
+
+    // Highlight active nav item based on current page
+    var currentPath = window.location.pathname;
+    var navLinks = document.querySelectorAll('.navbar a');
+    var maxMatchLength = 0;
+    var activeLink = null;
+
+    navLinks.forEach(function(link) {
+        var href = link.getAttribute('href');
+        if (href && currentPath.startsWith(href) && href !== '/') {
+            if (href.length > maxMatchLength) {
+                maxMatchLength = href.length;
+                activeLink = link;
+            }
+        }
+    });
+
+    // Remove all active classes first
+    navLinks.forEach(function(link) {
+        link.classList.remove('active');
+    });
+
+    // Add active class to the best match
+    if (activeLink) {
+        activeLink.classList.add('active');
+    } else if (currentPath === '/') {
+        navLinks[0]?.classList.add('active');
+    }
+});
+
+// Loading overlay functions
+window.showLoading = function() {
+    document.getElementById('loadingOverlay').style.display = 'flex';
+};
+
+window.hideLoading = function() {
+    document.getElementById('loadingOverlay').style.display = 'none';
+};
+
+// Show loading on form submissions
+document.addEventListener('DOMContentLoaded', function() {
+    var forms = document.querySelectorAll('form');
+    forms.forEach(function(form) {
+        form.addEventListener('submit', function() {
+            window.showLoading();
+        });
+    });
+
+    // Prevent loading on forms with no-validate class
+    var noValidateForms = document.querySelectorAll('form.no-validate');
+    noValidateForms.forEach(function(form) {
+        form.addEventListener('submit', function(e) {
+            e.preventDefault();
+            window.hideLoading();
+        });
+    });
+});
+
+// Keyboard shortcuts
+document.addEventListener('keydown', function(e) {
+    // Ctrl + S for save (prevent default browser save)
+    if (e.ctrlKey && e.key === 's') {
+        e.preventDefault();
+        var submitBtn = document.querySelector('button[type="submit"], input[type="submit"]');
+        if (submitBtn) {
+            submitBtn.click();
+        }
+    }
+
+    // Escape to hide toasts and close modals/menus
+    if (e.key === 'Escape') {
+        // Fermer tous les toasts
+        const toasts = document.querySelectorAll('.toast');
+        toasts.forEach(toast => {
+            toast.style.animation = 'toastFadeOut 0.5s ease forwards';
+            setTimeout(() => toast.remove(), 500);
+        });
+
+        var userMenu = document.getElementById('userMenu');
+        if (userMenu) {
+            userMenu.classList.remove('active');
+            const chevron = document.querySelector('.user-profile .fa-chevron-down');
+            if (chevron) {
+                chevron.style.transform = 'rotate(0)';
+            }
+        }
+
+        closeModal('photoModal');
+        closeModal('accountModal');
+    }
+});
+
+// Auto-refresh dashboard every 5 minutes
+if (window.location.pathname === '/' || window.location.pathname.includes('dashboard')) {
+    setInterval(function() {
+        fetch(window.location.href)
+            .then(response => {
+                if (response.ok) {
+                    window.location.reload();
+                }
+            })
+            .catch(error => console.log('Auto-refresh skipped'));
+    }, 300000); // 5 minutes
+}
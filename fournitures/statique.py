@@ -0,0 +1,143 @@
+"""
+Pipeline des fichiers statiques en production.
+
+- collectstatic (StockageStatiqueCompresse): noms hachés selon le contenu
+  (ManifestStaticFilesStorage), CSS/JS minifiés si rcssmin/rjsmin sont
+  installés, et variante .gz pré-compressée à côté de chaque fichier texte.
+  Il échoue si une bibliothèque de fournitures/assets.py manque dans
+  static/vendor/, et verifier_statique signale l'absence de rcssmin/rjsmin
+  (pip install rcssmin rjsmin);
+- servir_statique: sert STATIC_ROOT quand aucun serveur frontal ne le fait
+  (settings.SERVIR_STATIQUE), avec la variante .gz si le client l'accepte et
+  un cache d'un an pour les fichiers hachés (leur contenu ne change jamais).
+"""
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from . import assets
+
+try:
+    import rcssmin
+    import rjsmin
+except ImportError:  # minification désactivée, signalée par verifier_statique
+    rcssmin = rjsmin = None
+
+EXTENSIONS_COMPRESSIBLES = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.html', '.ttf', '.eot')
+TAILLE_MIN_COMPRESSION = 1024
+CACHE_HACHE = 365 * 24 * 3600
+CACHE_NON_HACHE = 3600
+
+# nom.0123456789ab.ext: suffixe ajouté par ManifestStaticFilesStorage
+NOM_HACHE = re.compile(r'\.[0-9a-f]{12}\.[^./]+(\.gz)?$')
+
+
+def minifier(nom, contenu):
+    """Minifie le CSS/JS non encore minifié (contenu en octets)"""
+    if rcssmin is None or '.min.' in os.path.basename(nom):
+        return contenu
+    if nom.endswith('.css'):
+        return rcssmin.cssmin(contenu.decode('utf-8')).encode('utf-8')
+    if nom.endswith('.js'):
+        return rjsmin.jsmin(contenu.decode('utf-8'), keep_bang_comments=True).encode('utf-8')
+    return contenu
+
+
+def verifier_statique(app_configs, **kwargs):
+    """Contrôles système (check, collectstatic) du pipeline statique"""
+    if not settings.STORAGES.get('staticfiles', {}).get('BACKEND', '').endswith('StockageStatiqueCompresse'):
+        return []
+    avertissements = []
+    if rcssmin is None or rjsmin is None:
+        avertissements.append(checks.Warning(
+            "rcssmin/rjsmin absents: collectstatic ne minifiera ni le CSS ni le JS",
+            hint="pip install rcssmin rjsmin",
+            id='fournitures.W001',
+        ))
+    manquants = assets.non_vendorises()
+    if manquants and not settings.DEBUG:
+        avertissements.append(checks.Warning(
+            f"Bibliothèques tierces absentes de static/vendor/: {', '.join(manquants)}",
+            hint="python manage.py vendoriser_assets, puis versionner fournitures/static/vendor/",
+            id='fournitures.W002',
+        ))
+    return avertissements
+
+
+class StockageStatiqueCompresse(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage avec minification et variantes .gz"""
+
+    def _save(self, name, content):
+        if name.endswith(('.css', '.js')):
+            content.seek(0)
+            content = ContentFile(minifier(name, content.read()))
+        return super()._save(name, content)
+
+    def post_process(self, paths, dry_run=False, **options):
+        manquants = assets.non_vendorises()
+        if manquants:
+            raise ImproperlyConfigured(
+                "Bibliothèques non vendorisées: " + ', '.join(manquants)
+                + " (python manage.py vendoriser_assets, puis versionner fournitures/static/vendor/)"
+            )
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        noms = set(self.hashed_files.values()) | set(self.hashed_files)
+        for nom in sorted(noms):
+            if nom.endswith(EXTENSIONS_COMPRESSIBLES) and self.exists(nom):
+                self.compresser(nom)
+
+    def compresser(self, nom):
+        """Écrit nom.gz si la compression fait gagner de la place"""
+        chemin = self.path(nom)
+        with open(chemin, 'rb') as f:
+            contenu = f.read()
+        if len(contenu) < TAILLE_MIN_COMPRESSION:
+            return
+        # mtime=0: même contenu, même .gz d'un déploiement à l'autre
+        compresse = gzip.compress(contenu, compresslevel=9, mtime=0)
+        if len(compresse) < len(contenu):
+            with open(chemin + '.gz', 'wb') as f:
+                f.write(compresse)
+
+
+@require_safe
+def servir_statique(request, chemin):
+    """Sert un fichier de STATIC_ROOT, pré-compressé si possible, avec en-têtes de cache"""
+    try:
+        fichier = safe_join(settings.STATIC_ROOT, chemin)
+    except ValueError:
+        raise Http404
+    if not os.path.isfile(fichier):
+        raise Http404
+
+    type_contenu, _ = mimetypes.guess_type(fichier)
+    encodage = None
+    if ('gzip' in request.headers.get('Accept-Encoding', '')
+            and os.path.isfile(fichier + '.gz')):
+        fichier += '.gz'
+        encodage = 'gzip'
+
+    reponse = FileResponse(open(fichier, 'rb'), content_type=type_contenu or 'application/octet-stream')
+    if encodage:
+        reponse.headers['Content-Encoding'] = encodage
+    reponse.headers.pop('Content-Disposition', None)
+    reponse.headers['Vary'] = 'Accept-Encoding'
+    reponse.headers['Last-Modified'] = http_date(os.path.getmtime(fichier))
+    if NOM_HACHE.search(chemin):
+        reponse.headers['Cache-Control'] = f'public, max-age={CACHE_HACHE}, immutable'
+    else:
+        reponse.headers['Cache-Control'] = f'public, max-age={CACHE_NON_HACHE}'
+    return reponse
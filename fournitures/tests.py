@@ -1,3 +1,749 @@
-from django.test import TestCase
+import io
+import json
+import math
+import os
+import tempfile
+import unittest
+from datetime import timedelta
+from unittest import mock
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import archivage, authentification, colonnes, middleware, views
+from .alertes import envoyer_recapitulatif
+from .budget_requetes import budgets_declares, verifier_vue
+from .catalogue import Catalogue
+from .evenements import get_broker
+from .historique_stock import debut_de_journee, prendre_snapshots, stock_a_date, valeur_a_date
+from .models import (
+    AlerteStock, Commande, Fourniture, LieuStockage, Mouvement, MouvementArchive, SegmentArchive, StockParLieu,
+    StockSnapshot, TypeFourniture,
+)
+from .prechauffage import prechauffer
+from .rapprochement import corriger, rapprocher_tranche
+from .routers import COOKIE_EPINGLAGE, lecture_epinglee
+
+try:
+    from . import prevision
+except ImportError:  # NumPy absent
+    prevision = None
+
+# Les tests tournent avec DEBUG=False: pas de manifeste collectstatic à lire
+sans_manifeste = override_settings(STORAGES={
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+
+
+class ValorisationTests(TestCase):
+    def setUp(self):
+        self.type = TypeFourniture.objects.create(nom="Papeterie")
+        self.produit = Fourniture.objects.create(type=self.type, designation="Stylo", stock_max=100)
+
+    def test_cout_moyen_fractionnaire(self):
+        """10 à 3 puis 5 à 4: coût moyen 50/15, et non une division entière"""
+        self.produit.entree_stock(10, cout_unitaire=Decimal('3'))
+        self.produit.entree_stock(5, cout_unitaire=Decimal('4'))
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.cout_moyen, Decimal('3.3333'))
+        self.assertEqual(self.produit.valeur_stock, Decimal('50'))
+
+        self.produit.sortie_stock(7)
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.stock, 8)
+        self.assertEqual(self.produit.valeur_stock, Decimal('26.6669'))
+
+    def test_saisie_groupee_identique(self):
+        """Le chemin unitaire et _valoriser() donnent le même coût moyen"""
+        autre = Fourniture.objects.create(type=self.type, designation="Crayon", stock_max=100)
+        autre._valoriser(10, Decimal('3'))
+        autre.stock += 10
+        autre._valoriser(5, Decimal('4'))
+
+        self.produit.entree_stock(10, cout_unitaire=Decimal('3'))
+        self.produit.entree_stock(5, cout_unitaire=Decimal('4'))
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.cout_moyen, autre.cout_moyen)
+
+
+@sans_manifeste
+class SaisieVuesTests(TestCase):
+    """Entrées et ajustements passés par les vues, comme depuis les formulaires"""
+
+    def setUp(self):
+        self.utilisateur = User.objects.create_superuser('gestionnaire', password='x')
+        self.client.force_login(self.utilisateur)
+        self.produit = Fourniture.objects.create(
+            type=TypeFourniture.objects.create(nom="Papeterie"), designation="Stylo", stock_max=100)
+        self.produit.entree_stock(10, cout_unitaire=Decimal('3'))
+
+    def test_entree_depuis_le_formulaire(self):
+        reponse = self.client.post(reverse('mouvement'), {
+            'produit': self.produit.pk, 'type_mouvement': 'ENTREE', 'quantite': '5', 'cout_unitaire': '4',
+        })
+        self.assertRedirects(reponse, reverse('dashboard'), fetch_redirect_response=False)
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.stock, 15)
+        self.assertEqual(self.produit.cout_moyen, Decimal('3.3333'))
+
+    def test_quantite_fractionnaire_refusee(self):
+        reponse = self.client.post(reverse('mouvement'), {
+            'produit': self.produit.pk, 'type_mouvement': 'ENTREE', 'quantite': '2.5',
+        })
+        self.assertEqual(reponse.status_code, 200)
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.stock, 10)
+
+    def test_ajustement_a_la_hausse(self):
+        reponse = self.client.post(reverse('ajuster_stock', args=[self.produit.pk]),
+                                   {'nouveau_stock': '12', 'raison': 'Inventaire'})
+        self.assertEqual([m.level_tag for m in get_messages(reponse.wsgi_request)], ['success'])
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.stock, 12)
+        self.assertEqual(self.produit.valeur_stock, Decimal('36'))
+
+
+# 'default' tient lieu de réplique: seul l'épinglage est observé
+@override_settings(REPLICA_DB_ALIAS='default')
+class EpinglageTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('agent', password='x'))
+
+    def test_ecriture_epingle_le_navigateur(self):
+        self.client.post(reverse('ajouter_type_fourniture_ajax'), {'nom': 'Papeterie'})
+        cookie = self.client.cookies[COOKIE_EPINGLAGE]
+        requete = RequestFactory().get('/', HTTP_COOKIE=f'{COOKIE_EPINGLAGE}={cookie.value}')
+        self.assertTrue(lecture_epinglee(requete))
+        self.assertFalse(lecture_epinglee(RequestFactory().get('/')))
+        falsifie = RequestFactory().get('/', HTTP_COOKIE=f'{COOKIE_EPINGLAGE}=1')
+        self.assertFalse(lecture_epinglee(falsifie))
+
+
+class UtilisateurCacheTests(TestCase):
+    def setUp(self):
+        self.utilisateur = User.objects.create_user('agent', password='x')
+        self.backend = authentification.BackendUtilisateurCache()
+        authentification.vider()
+
+    def test_desactivation_par_un_autre_worker(self):
+        self.assertIsNotNone(self.backend.get_user(self.utilisateur.pk))
+        # Un autre worker désactive l'utilisateur: seul le cache partagé est commun
+        User.objects.filter(pk=self.utilisateur.pk).update(is_active=False)
+        self.assertIsNotNone(self.backend.get_user(self.utilisateur.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            authentification.cache.set(authentification._cle_version(self.utilisateur.pk), 'autre', None)
+        self.assertIsNone(self.backend.get_user(self.utilisateur.pk))
+
+    def test_version_changee_apres_validation(self):
+        self.backend.get_user(self.utilisateur.pk)
+        cle = authentification._cle_version(self.utilisateur.pk)
+        version = authentification.cache.get(cle)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.utilisateur.set_password('y')
+            self.utilisateur.save()
+            self.assertEqual(authentification.cache.get(cle), version)
+        self.assertNotEqual(authentification.cache.get(cle), version)
+
+
+class StockParLieuTests(TestCase):
+    def setUp(self):
+        self.produit = Fourniture.objects.create(
+            type=TypeFourniture.objects.create(nom="Papeterie"), designation="Stylo", stock_max=100)
+        self.produit.entree_stock(5)
+        self.annexe = LieuStockage.objects.create(nom="Annexe")
+
+    def test_baisse_directe_prise_sur_les_lieux_pourvus(self):
+        """Après transfert de tout le stock, une baisse saisie directement porte sur l'autre lieu"""
+        self.produit.transferer_stock(5, LieuStockage.defaut(), self.annexe)
+        self.produit.refresh_from_db()
+        self.produit.stock = 2
+        self.produit.save()
+        self.assertEqual(
+            dict(StockParLieu.objects.filter(produit=self.produit).values_list('lieu_id', 'quantite')),
+            {LieuStockage.defaut().pk: 0, self.annexe.pk: 2},
+        )
+
+    def test_rapprochement_realigne_le_total(self):
+        Fourniture.objects.filter(pk=self.produit.pk).update(stock=7)
+        ecarts = rapprocher_tranche(self.produit.pk, self.produit.pk + 1)
+        self.assertEqual([(stock, somme) for _, _, stock, somme, _ in ecarts], [(7, 5)])
+
+        self.assertEqual(corriger(ecarts), (1, 0, []))
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.stock, 5)
+        self.assertEqual(rapprocher_tranche(self.produit.pk, self.produit.pk + 1), [])
+
+
+class CatalogueTests(TestCase):
+    def setUp(self):
+        self.produit = Fourniture.objects.create(
+            type=TypeFourniture.objects.create(nom="Papeterie"), designation="Stylo", stock_max=100)
+
+    def test_tampon_inchange_par_les_mouvements(self):
+        cat = Catalogue()
+        cat.rafraichir()
+        tampon = cat._lire_tampon()
+        self.produit.entree_stock(5)
+        self.produit.sortie_stock(2)
+        self.produit.stock = 4
+        self.produit.save(update_fields=['stock'])
+        self.assertEqual(cat._lire_tampon(), tampon)
+
+        self.produit.designation = "Stylo bleu"
+        self.produit.save()
+        self.assertNotEqual(cat._lire_tampon(), tampon)
+        cat.invalider()
+        self.assertEqual(cat.produit(self.produit.pk).designation, "Stylo bleu")
+
+
+@sans_manifeste
+class BudgetsRequetesTests(TestCase):
+    """Chaque vue de BUDGETS_REQUETES respecte son budget sans requête N+1"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur = User.objects.create_superuser('gestionnaire', password='x')
+        for nom in ("Papeterie", "Informatique", "Entretien"):
+            type_fourniture = TypeFourniture.objects.create(nom=nom)
+            for i in range(4):
+                produit = Fourniture.objects.create(
+                    type=type_fourniture, designation=f"{nom} {i}", stock_max=50, seuil_alerte=5)
+                produit.entree_stock(20, utilisateur=cls.utilisateur, cout_unitaire=Decimal('2'))
+                # Une sortie sur deux passe sous le seuil: alertes et produits à commander
+                produit.sortie_stock(17 if i % 2 else 3, utilisateur=cls.utilisateur)
+                commande = Commande.objects.create(produit=produit, quantite=10, utilisateur=cls.utilisateur)
+                if i % 2:
+                    commande.valider(cls.utilisateur)
+
+    def setUp(self):
+        self.client.force_login(self.utilisateur)
+
+    def test_budgets_declares(self):
+        for vue in budgets_declares():
+            with self.subTest(vue=vue):
+                # Premier appel hors mesure: caches du processus (catalogue, utilisateur)
+                self.client.get(reverse(vue))
+                self.assertEqual(verifier_vue(self.client, vue).status_code, 200)
+
+
+@override_settings(ALERTES_DESTINATAIRES=['stock@example.com'])
+class AlertesTests(TestCase):
+    """Franchissement → boîte d'envoi → récapitulatif"""
+
+    def setUp(self):
+        self.produit = Fourniture.objects.create(
+            type=TypeFourniture.objects.create(nom="Papeterie"), designation="Stylo",
+            stock_max=100, seuil_alerte=5)
+        self.produit.entree_stock(10)
+        # Retour au-dessus du seuil de la réception initiale
+        AlerteStock.objects.all().delete()
+
+    def test_sortie_sous_le_seuil_puis_recapitulatif(self):
+        self.produit.sortie_stock(6)
+        alerte = AlerteStock.objects.get()
+        self.assertEqual((alerte.type_alerte, alerte.stock_avant, alerte.stock_apres), ('ALERTE', 10, 4))
+
+        self.assertEqual(envoyer_recapitulatif(), (1, 1))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("1 en alerte", mail.outbox[0].subject)
+        self.assertIn(self.produit.reference, mail.outbox[0].body)
+        self.assertFalse(AlerteStock.objects.filter(date_envoi__isnull=True).exists())
+        self.assertEqual(envoyer_recapitulatif(), (0, 0))
+
+    def test_alerte_puis_retour_omise_du_recapitulatif(self):
+        self.produit.sortie_stock(6)
+        self.produit.entree_stock(6)
+        self.assertEqual(AlerteStock.objects.count(), 2)
+        self.assertEqual(envoyer_recapitulatif(), (2, 0))
+        self.assertEqual(mail.outbox, [])
+
+    @unittest.skipIf(prevision is None, "NumPy absent")
+    def test_prevoir_seuils_appliquer_enregistre_le_franchissement(self):
+        """Le seuil recommandé dépasse le stock restant: le produit passe en alerte"""
+        Fourniture.objects.filter(pk=self.produit.pk).update(seuil_alerte=0)
+        self.produit.refresh_from_db()
+        self.produit.sortie_stock(9)
+        self.assertFalse(AlerteStock.objects.exists())
+
+        call_command('prevoir_seuils', '--appliquer', '--processus', '1', '--historique-min', '1',
+                     stdout=io.StringIO())
+        self.produit.refresh_from_db()
+        self.assertGreater(self.produit.seuil_alerte, 1)
+        alerte = AlerteStock.objects.get()
+        self.assertEqual((alerte.type_alerte, alerte.stock_avant, alerte.stock_apres), ('ALERTE', 1, 1))
+        self.assertEqual(alerte.seuil_alerte, self.produit.seuil_alerte)
+
+
+@sans_manifeste
+class MouvementsLotTests(TestCase):
+    """Saisie groupée: idempotence et erreurs ligne par ligne"""
+
+    def setUp(self):
+        self.utilisateur = User.objects.create_superuser('scanner', password='x')
+        self.produit = Fourniture.objects.create(
+            type=TypeFourniture.objects.create(nom="Papeterie"), designation="Stylo", stock_max=100)
+        self.produit.entree_stock(10)
+
+    def ligne(self, cle, **champs):
+        return {'cle': cle, 'reference': self.produit.reference, 'type': 'SORTIE', 'quantite': 1, **champs}
+
+    def test_erreurs_ligne_par_ligne(self):
+        resultats = Mouvement.enregistrer_lot([
+            self.ligne('a', quantite=3),
+            self.ligne('b', quantite='1e999999'),
+            self.ligne('c', quantite=2 * 10 ** 9),
+            self.ligne('d', quantite='1.5'),
+            self.ligne('e', date='2024-02-30T10:00:00'),
+            self.ligne('f', reference='INCONNUE'),
+            self.ligne('g', quantite=50),
+            'pas un dictionnaire',
+        ], utilisateur=self.utilisateur)
+        self.assertEqual([r['succes'] for r in resultats], [True] + [False] * 7)
+        self.assertIn("trop grande", resultats[1]['erreur'])
+        self.assertIn("trop grande", resultats[2]['erreur'])
+        self.assertIn("entier positif", resultats[3]['erreur'])
+        self.assertIn("Date invalide", resultats[4]['erreur'])
+        self.assertIn("Référence inconnue", resultats[5]['erreur'])
+        self.assertIn("Stock insuffisant", resultats[6]['erreur'])
+        self.assertEqual(resultats[0]['stock'], 7)
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.stock, 7)
+
+    def test_renvoi_idempotent(self):
+        lot = [self.ligne('a', quantite=2), self.ligne('b', quantite=3), self.ligne('a', quantite=2)]
+        premier = Mouvement.enregistrer_lot(lot, utilisateur=self.utilisateur)
+        self.assertEqual(premier[2], premier[0])
+        second = Mouvement.enregistrer_lot(lot, utilisateur=self.utilisateur)
+        self.assertTrue(all(r['succes'] and r['doublon'] for r in second))
+        self.assertEqual([r['mouvement_id'] for r in second], [r['mouvement_id'] for r in premier])
+
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.stock, 5)
+        self.assertEqual(Mouvement.objects.filter(type_mouvement='SORTIE').count(), 2)
+
+    def test_api_exige_le_jeton_csrf(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.utilisateur)
+        corps = json.dumps({'mouvements': [self.ligne('a')]})
+        url = reverse('api_mouvements_lot')
+        self.assertEqual(client.post(url, corps, content_type='application/json').status_code, 403)
+
+        client.get(reverse('mouvement'))
+        reponse = client.post(url, corps, content_type='application/json',
+                              HTTP_X_CSRFTOKEN=client.cookies['csrftoken'].value)
+        self.assertEqual(reponse.json()['acceptes'], 1)
+
+
+class CompressionTests(TestCase):
+    def test_types_identiques_dans_settings_et_middleware(self):
+        self.assertEqual(settings.COMPRESSION_TYPES, middleware.COMPRESSION_TYPES)
+
+    def test_feuille_de_style_compressee(self):
+        requete = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        css = HttpResponse('body { margin: 0; }\n' * 100, content_type='text/css; charset=utf-8')
+        reponse = middleware.CompressionMiddleware(lambda r: css)(requete)
+        self.assertEqual(reponse['Content-Encoding'], 'gzip')
+
+
+class ConsommationTests(TestCase):
+    """Taux de consommation lissé et date de rupture estimée"""
+
+    def setUp(self):
+        self.produit = Fourniture.objects.create(
+            type=TypeFourniture.objects.create(nom="Papeterie"), designation="Stylo", stock_max=100)
+        self.produit.entree_stock(20)
+
+    def test_decroissance_exponentielle(self):
+        tau = Fourniture.CONSOMMATION_TAU_JOURS
+        debut = timezone.now()
+        self.produit.enregistrer_consommation(tau, debut)
+        self.assertAlmostEqual(self.produit.consommation_journaliere, 1.0)
+        self.produit.enregistrer_consommation(tau, debut + timedelta(days=tau))
+        self.assertAlmostEqual(self.produit.consommation_journaliere, math.exp(-1) + 1)
+
+    def test_sortie_puis_entree_mettent_a_jour_la_rupture(self):
+        self.produit.sortie_stock(7)
+        self.produit.refresh_from_db()
+        taux = 7 / Fourniture.CONSOMMATION_TAU_JOURS
+        self.assertAlmostEqual(self.produit.consommation_journaliere, taux)
+        self.assertAlmostEqual(
+            (self.produit.date_rupture_estimee - timezone.now()) / timedelta(days=1), 13 / taux, places=2)
+
+        # Une entrée repousse la rupture sans changer le taux
+        self.produit.entree_stock(13)
+        self.produit.refresh_from_db()
+        self.assertAlmostEqual(self.produit.consommation_journaliere, taux)
+        self.assertAlmostEqual(
+            (self.produit.date_rupture_estimee - timezone.now()) / timedelta(days=1), 26 / taux, places=2)
+
+    def test_saisie_en_lot(self):
+        resultats = Mouvement.enregistrer_lot([
+            {'cle': 'a', 'reference': self.produit.reference, 'type': 'SORTIE', 'quantite': 7},
+        ])
+        self.assertTrue(resultats[0]['succes'])
+        self.produit.refresh_from_db()
+        self.assertAlmostEqual(self.produit.consommation_journaliere, 7 / Fourniture.CONSOMMATION_TAU_JOURS)
+        self.assertIsNotNone(self.produit.date_rupture_estimee)
+
+
+class CommandesLotTests(TestCase):
+    """Actions groupées sur les commandes: une transaction, un résultat par commande"""
+
+    def setUp(self):
+        self.utilisateur = User.objects.create_user('acheteur')
+        papeterie = TypeFourniture.objects.create(nom="Papeterie")
+        self.stylo = Fourniture.objects.create(type=papeterie, designation="Stylo", stock_max=100)
+        self.cahier = Fourniture.objects.create(type=papeterie, designation="Cahier", stock_max=10)
+
+    def commander(self, produit, quantite, prix=None):
+        commande = Commande.objects.create(produit=produit, quantite=quantite, utilisateur=self.utilisateur,
+                                           prix_unitaire=prix)
+        commande.valider(self.utilisateur)
+        return commande
+
+    def test_reception_groupee(self):
+        c1 = self.commander(self.stylo, 10, Decimal('2'))
+        c2 = self.commander(self.stylo, 5, Decimal('5'))
+        trop = self.commander(self.cahier, 20)
+        attente = Commande.objects.create(produit=self.cahier, quantite=1, utilisateur=self.utilisateur)
+
+        resultats = Commande.traiter_lot([c1.id, c2.id, trop.id, attente.id, 999999], 'recevoir',
+                                         self.utilisateur)
+        self.assertEqual(list(resultats), [c1.id, c2.id, trop.id, attente.id, 999999])
+        self.assertEqual([succes for succes, _ in resultats.values()], [True, True, False, False, False])
+        self.assertIn("stock maximum dépassé", resultats[trop.id][1])
+        self.assertIn("introuvable", resultats[999999][1])
+
+        self.stylo.refresh_from_db()
+        self.assertEqual(self.stylo.stock, 15)
+        self.assertEqual(self.stylo.valeur_stock, Decimal('45'))
+        self.assertEqual(self.stylo.cout_moyen, Decimal('3'))
+        self.assertEqual(StockParLieu.objects.get(produit=self.stylo, lieu=LieuStockage.defaut()).quantite, 15)
+        self.assertEqual(Mouvement.objects.filter(commande__in=[c1, c2], type_mouvement='ENTREE').count(), 2)
+        self.assertEqual(
+            dict(Commande.objects.filter(id__in=[c1.id, c2.id, trop.id, attente.id]).values_list('id', 'status')),
+            {c1.id: 'RECUE', c2.id: 'RECUE', trop.id: 'VALIDEE', attente.id: 'EN_ATTENTE'},
+        )
+        self.cahier.refresh_from_db()
+        self.assertEqual(self.cahier.stock, 0)
+
+    def test_validation_groupee(self):
+        attente = Commande.objects.create(produit=self.stylo, quantite=3, utilisateur=self.utilisateur)
+        deja = self.commander(self.stylo, 3)
+        resultats = Commande.traiter_lot([attente.id, deja.id], 'valider', self.utilisateur)
+        self.assertEqual([succes for succes, _ in resultats.values()], [True, False])
+        attente.refresh_from_db()
+        self.assertEqual((attente.status, attente.utilisateur_validation), ('VALIDEE', self.utilisateur))
+
+    def test_vue_json(self):
+        ok = self.commander(self.stylo, 4)
+        trop = self.commander(self.cahier, 20)
+        self.client.force_login(self.utilisateur)
+        reponse = self.client.post(reverse('commandes_lot'), {'action': 'recevoir', 'commande_ids': [ok.id, trop.id]},
+                                   HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        donnees = reponse.json()
+        self.assertFalse(donnees['success'])
+        self.assertEqual([(r['id'], r['succes']) for r in donnees['resultats']], [(ok.id, True), (trop.id, False)])
+
+
+class StockADateTests(TestCase):
+    """Stock et valeur en fin de journée, avec ou sans photo de stock"""
+
+    def setUp(self):
+        self.aujourd_hui = timezone.localdate()
+        self.produit = Fourniture.objects.create(
+            type=TypeFourniture.objects.create(nom="Papeterie"), designation="Stylo", stock_max=100)
+        Fourniture.objects.filter(pk=self.produit.pk).update(date_creation=timezone.now() - timedelta(days=30))
+        self.mouvement('entree_stock', 10, 5, cout_unitaire=Decimal('2'))
+        self.mouvement('sortie_stock', 3, 3)
+        self.mouvement('entree_stock', 4, 1, cout_unitaire=Decimal('4'))
+
+    def jour(self, il_y_a):
+        return self.aujourd_hui - timedelta(days=il_y_a)
+
+    def mouvement(self, methode, quantite, il_y_a, **options):
+        getattr(self.produit, methode)(quantite, **options)
+        Mouvement.objects.filter(pk=Mouvement.objects.latest('id').pk).update(
+            date=debut_de_journee(self.jour(il_y_a)) + timedelta(hours=12))
+
+    def stocks(self):
+        return [stock_a_date(self.jour(n))[self.produit.pk] for n in (6, 5, 4, 3, 2, 1, 0)]
+
+    def test_stock_de_part_et_d_autre_de_la_photo(self):
+        attendus = [0, 10, 10, 7, 7, 11, 11]
+        self.assertEqual(self.stocks(), attendus)
+
+        self.assertEqual(prendre_snapshots(self.jour(3)), 1)
+        self.assertEqual(StockSnapshot.objects.get(produit=self.produit).stock, 7)
+        self.assertEqual(self.stocks(), attendus)
+
+        # Photo faussée: les dates proches en dépendent, preuve qu'elle est lue
+        StockSnapshot.objects.update(stock=100)
+        self.assertEqual(stock_a_date(self.jour(4))[self.produit.pk], 103)
+        self.assertEqual(stock_a_date(self.jour(2))[self.produit.pk], 100)
+
+    def test_valeur_a_date(self):
+        prendre_snapshots(self.jour(3))
+        self.assertEqual(valeur_a_date(self.jour(4))[self.produit.pk], Decimal('20'))
+        self.assertEqual(valeur_a_date(self.jour(2))[self.produit.pk], Decimal('14'))
+        self.assertEqual(valeur_a_date(self.jour(0))[self.produit.pk], Decimal('30'))
+
+    def test_produit_cree_apres_la_date_exclu(self):
+        Fourniture.objects.filter(pk=self.produit.pk).update(date_creation=timezone.now())
+        self.assertNotIn(self.produit.pk, stock_a_date(self.jour(1)))
+
+
+@sans_manifeste
+class ArchivageTests(TestCase):
+    """Après archivage, stock à date, rapprochement et compteurs sont inchangés"""
+
+    def setUp(self):
+        self.utilisateur = User.objects.create_superuser('archiviste', password='x')
+        self.avant = archivage.date_limite(3)
+        self.ancien = self.avant - timedelta(days=10)
+        self.produit = Fourniture.objects.create(
+            type=TypeFourniture.objects.create(nom="Papeterie"), designation="Stylo", stock_max=100)
+        Fourniture.objects.filter(pk=self.produit.pk).update(date_creation=self.ancien - timedelta(days=1))
+
+        recue = Commande.objects.create(produit=self.produit, quantite=10, utilisateur=self.utilisateur,
+                                        prix_unitaire=Decimal('2'))
+        recue.valider(self.utilisateur)
+        recue.recevoir(self.utilisateur)
+        annulee = Commande.objects.create(produit=self.produit, quantite=5, utilisateur=self.utilisateur,
+                                          status='ANNULEE')
+        self.produit.sortie_stock(3)
+        Mouvement.objects.update(date=self.ancien)
+        Commande.objects.filter(id__in=[recue.id, annulee.id]).update(
+            date_creation=self.ancien, date_reception=self.ancien)
+        self.produit.entree_stock(2, cout_unitaire=Decimal('2'))
+
+    def etat(self):
+        jours = [timezone.localdate(self.ancien) - timedelta(days=1), timezone.localdate(self.ancien),
+                 timezone.localdate()]
+        self.client.force_login(self.utilisateur)
+        contexte = self.client.get(reverse('dashboard')).context
+        return {
+            'stocks': [stock_a_date(jour).get(self.produit.pk) for jour in jours],
+            'valeurs': [valeur_a_date(jour).get(self.produit.pk) for jour in jours],
+            'ecarts': rapprocher_tranche(self.produit.pk, self.produit.pk + 1),
+            'compteurs': (contexte['commandes_recues'], contexte['commandes_annulees']),
+        }
+
+    def archiver(self, format):
+        etat = self.etat()
+        self.assertEqual(etat['stocks'], [0, 7, 9])
+        self.assertEqual(archivage.archiver_mouvements(self.avant, format, taille_lot=1), 2)
+        self.assertEqual(archivage.archiver_commandes(self.avant, format), 2)
+        self.assertEqual(Mouvement.objects.count(), 1)
+        self.assertFalse(Commande.objects.exists())
+        self.assertEqual(self.etat(), etat)
+        self.assertEqual(archivage.commandes_archivees_par_statut(), {'RECUE': 1, 'ANNULEE': 1})
+
+        # Historique archivé du plus récent au plus ancien, page par page
+        page, curseur = archivage.historique_archive(self.produit.pk, limite=1)
+        suite, fin = archivage.historique_archive(self.produit.pk, avant=curseur, limite=1)
+        self.assertEqual([l['type_mouvement'] for l in page + suite], ['SORTIE', 'ENTREE'])
+        self.assertIsNone(fin)
+
+    def test_tables_d_archive(self):
+        self.archiver('table')
+        self.assertEqual(MouvementArchive.objects.count(), 2)
+
+    def test_fichiers_ndjson(self):
+        with tempfile.TemporaryDirectory() as repertoire, self.settings(ARCHIVES_DIR=repertoire):
+            self.archiver('ndjson')
+            # Un membre gzip par produit, mois et lot
+            self.assertEqual(SegmentArchive.objects.filter(modele='mouvement').count(), 2)
+
+
+@sans_manifeste
+class ChronologieTests(TestCase):
+    """Chronologie d'une fourniture: curseur (date, id) et solde après chaque mouvement"""
+
+    def setUp(self):
+        self.produit = Fourniture.objects.create(
+            type=TypeFourniture.objects.create(nom="Papeterie"), designation="Stylo", stock_max=100)
+        maintenant = timezone.now()
+        # Les deux sorties du milieu ont la même date: l'id les départage
+        for methode, quantite, il_y_a in (('entree_stock', 10, 4), ('sortie_stock', 2, 2), ('sortie_stock', 3, 2),
+                                          ('entree_stock', 5, 1), ('sortie_stock', 1, 0)):
+            getattr(self.produit, methode)(quantite)
+            Mouvement.objects.filter(pk=Mouvement.objects.latest('id').pk).update(
+                date=maintenant - timedelta(days=il_y_a))
+        self.produit.refresh_from_db()
+
+    def parcourir(self, debut=None, fin=None):
+        lignes, curseur = [], None
+        while True:
+            page, totaux, curseur = views._chronologie_mouvements(self.produit, debut, fin, curseur, limite=2)
+            lignes += [(m.type_mouvement, m.quantite, m.solde_apres) for m in page]
+            if curseur is None:
+                return lignes, totaux
+
+    def test_pages_et_solde_courant(self):
+        lignes, totaux = self.parcourir()
+        self.assertEqual(lignes, [
+            ('SORTIE', 1, 9), ('ENTREE', 5, 10), ('SORTIE', 3, 5), ('SORTIE', 2, 8), ('ENTREE', 10, 10),
+        ])
+        self.assertEqual((totaux['entrees'], totaux['sorties']), (15, 6))
+
+    def test_periode(self):
+        maintenant = timezone.now()
+        lignes, totaux = self.parcourir(maintenant - timedelta(days=3), maintenant - timedelta(hours=12))
+        self.assertEqual(lignes, [('ENTREE', 5, 10), ('SORTIE', 3, 5), ('SORTIE', 2, 8)])
+        self.assertEqual((totaux['entrees'], totaux['sorties']), (5, 5))
+
+    def test_vue_page_suivante(self):
+        self.client.force_login(User.objects.create_superuser('gestionnaire', password='x'))
+        url = reverse('detail_fourniture', args=[self.produit.pk])
+        premiere = self.client.get(url).context
+        self.assertEqual(len(premiere['mouvements']), 5)
+        self.assertIsNone(premiere['mouvements_suivant'])
+
+        _, _, curseur = views._chronologie_mouvements(self.produit, limite=3)
+        suite = self.client.get(url, {'curseur': curseur}).context['mouvements']
+        self.assertEqual([(m.quantite, m.solde_apres) for m in suite], [(2, 8), (10, 10)])
+
+
+@unittest.skipIf(colonnes.np is None, "NumPy absent")
+class ExportColonnesTests(TestCase):
+    """Export colonnaire: ajout incrémental et reprise après interruption"""
+
+    def setUp(self):
+        temporaire = tempfile.TemporaryDirectory()
+        self.addCleanup(temporaire.cleanup)
+        self.repertoire = temporaire.name
+        self.produit = Fourniture.objects.create(
+            type=TypeFourniture.objects.create(nom="Papeterie"), designation="Stylo", stock_max=100)
+        self.produit.entree_stock(10)
+        self.produit.sortie_stock(3)
+
+    def test_ajout_incremental(self):
+        self.assertEqual(colonnes.exporter(self.repertoire, marge=0), 2)
+        self.assertEqual(colonnes.exporter(self.repertoire, marge=0), 0)
+
+        self.produit.sortie_stock(4)
+        # Octets d'un export interrompu après la dernière ligne validée
+        with open(os.path.join(self.repertoire, 'id.npy'), 'ab') as f:
+            f.write(b'\0' * 5)
+        self.assertEqual(colonnes.exporter(self.repertoire, marge=0), 1)
+
+        donnees = colonnes.charger(self.repertoire)
+        self.assertEqual(donnees['id'].tolist(), list(Mouvement.objects.order_by('id').values_list('id', flat=True)))
+        self.assertEqual((donnees['type'] * donnees['quantite']).tolist(), [10, -3, -4])
+        self.assertEqual(colonnes.lire_meta(self.repertoire)['lignes'], 3)
+        self.assertEqual(os.path.getsize(os.path.join(self.repertoire, 'id.npy')), colonnes.TAILLE_ENTETE + 3 * 8)
+
+        produits, totaux = colonnes.sorties_par_produit(donnees)
+        self.assertEqual((produits.tolist(), totaux.tolist()), ([self.produit.pk], [7.0]))
+
+    def test_marge_ignore_les_mouvements_recents(self):
+        self.assertEqual(colonnes.exporter(self.repertoire, marge=60), 0)
+        self.assertIsNone(colonnes.lire_meta(self.repertoire))
+
+
+class EvenementsTests(TestCase):
+    """Deltas du tableau de bord publiés après validation et relus par le flux SSE"""
+
+    def setUp(self):
+        self.produit = Fourniture.objects.create(
+            type=TypeFourniture.objects.create(nom="Papeterie"), designation="Stylo", stock_max=100,
+            seuil_alerte=5)
+        self.produit.entree_stock(10)
+        self.broker = get_broker()
+        self.sequence = self.broker.dernier()
+
+    def test_lot_publie_le_stock_apres_chaque_mouvement(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Mouvement.enregistrer_lot([
+                {'cle': 'a', 'reference': self.produit.reference, 'type': 'SORTIE', 'quantite': 2},
+                {'cle': 'b', 'reference': self.produit.reference, 'type': 'SORTIE', 'quantite': 4},
+            ])
+        evenements = self.broker.depuis(self.sequence)
+        self.assertEqual([(t, d['stock'], d.get('alerte_delta')) for _, t, d in evenements],
+                         [('mouvement', 8, 0), ('mouvement', 4, 1), ('alerte', 4, None)])
+
+    def test_rien_avant_validation(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.produit.sortie_stock(1)
+        self.assertEqual(self.broker.depuis(self.sequence), [])
+
+    def test_flux_reprend_apres_last_event_id(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.produit.sortie_stock(1)
+        self.client.force_login(User.objects.create_user('tableau'))
+        # Flux écourté: lu jusqu'au bout, il se ferme comme sous un vrai serveur
+        with mock.patch.object(views, 'FLUX_DUREE_MAX', 0.5), mock.patch.object(views, 'FLUX_INTERVALLE', 0.1):
+            reponse = self.client.get(reverse('flux_tableau_bord'), HTTP_LAST_EVENT_ID=str(self.sequence))
+            self.assertEqual(reponse['Content-Type'], 'text/event-stream')
+            flux = [morceau.decode() for morceau in reponse.streaming_content]
+        self.assertEqual(flux[0], 'retry: 3000\n\n')
+        evenement = flux[1]
+        self.assertIn('event: mouvement', evenement)
+        self.assertIn('"stock": 9.0', evenement)
+
+
+@sans_manifeste
+class AdminTests(TestCase):
+    """Listes de l'admin: nombre de requêtes indépendant du nombre de lignes"""
+
+    def setUp(self):
+        self.utilisateur = User.objects.create_superuser('admin', password='x')
+        self.client.force_login(self.utilisateur)
+        self.type = TypeFourniture.objects.create(nom="Papeterie")
+
+    def ajouter_lignes(self):
+        produit = Fourniture.objects.create(type=self.type, designation="Stylo", stock_max=100, seuil_alerte=5)
+        produit.entree_stock(10, utilisateur=self.utilisateur)
+        produit.sortie_stock(8, utilisateur=self.utilisateur)
+        Commande.objects.create(produit=produit, quantite=5, utilisateur=self.utilisateur)
+
+    def requetes(self, nom):
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertEqual(self.client.get(reverse(f'admin:fournitures_{nom}_changelist')).status_code, 200)
+        return len(requetes)
+
+    def test_listes_sans_n_plus_1(self):
+        self.ajouter_lignes()
+        noms = ('mouvement', 'commande', 'fourniture')
+        for nom in noms:
+            self.requetes(nom)  # caches du premier affichage
+        avant = {nom: self.requetes(nom) for nom in noms}
+        for _ in range(4):
+            self.ajouter_lignes()
+        self.assertEqual({nom: self.requetes(nom) for nom in avant}, avant)
+
+    def test_recherche_commande_par_numero(self):
+        self.ajouter_lignes()
+        commande = Commande.objects.get()
+        reponse = self.client.get(reverse('admin:fournitures_commande_changelist'), {'q': commande.numero})
+        self.assertContains(reponse, commande.numero)
+
+
+@sans_manifeste
+class PrechauffageTests(TestCase):
+    def test_vues_chaudes_rendues_sans_ecriture(self):
+        User.objects.create_superuser('admin', password='x')
+        Fourniture.objects.create(type=TypeFourniture.objects.create(nom="Papeterie"), designation="Stylo")
+        with CaptureQueriesContext(connection) as requetes:
+            resultats = prechauffer(('gabarits', 'catalogue', 'vues'))
+        self.assertEqual([etape for etape, _, _ in resultats], ['gabarits', 'catalogue', 'vues'])
+        self.assertEqual(resultats[2][2], "dashboard 200, statistiques 200, liste_stock 200")
+        self.assertFalse([q for q in requetes if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))])
+
+    def test_commande_sans_superutilisateur(self):
+        sortie = io.StringIO()
+        call_command('prechauffer', '--etapes', 'vues', stdout=sortie)
+        self.assertIn("aucun superutilisateur actif, étape sautée", sortie.getvalue())
+        self.assertIn("total", sortie.getvalue())
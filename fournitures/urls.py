@@ -14,6 +14,7 @@ urlpatterns = [
     path('stock/supprimer/<int:id>/', views.supprimer_fourniture, name='supprimer_fourniture'),
     path('stock/<int:id>/', views.detail_fourniture, name='detail_fourniture'),
     path('stock/ajuster/<int:id>/', views.ajuster_stock, name='ajuster_stock'),
+    path('stock/transferer/<int:id>/', views.transferer_stock, name='transferer_stock'),
 
     # Mouvements de stock
     path('mouvement/', views.mouvement, name='mouvement'),
@@ -27,16 +28,50 @@ urlpatterns = [
     path('commandes/annuler/<int:id>/', views.annuler_commande, name='annuler_commande'),
     path('commandes/supprimer/<int:id>/', views.supprimer_commande, name='supprimer_commande'),
     path('commandes/mettre-en-cours/<int:id>/', views.mettre_en_cours_commande, name='mettre_en_cours_commande'),
+    path('commandes/lot/', views.commandes_lot, name='commandes_lot'),
 
     # Types de fournitures
     path('types/', views.gestion_types, name='gestion_types'),
     path('types/supprimer/<int:id>/', views.supprimer_type, name='supprimer_type'),
 
+    # Profils de requêtes (personnel)
+    path('outils/profils/', views.profils_requetes, name='profils_requetes'),
+    path('outils/profils/<int:id>/', views.detail_profil, name='detail_profil'),
+    path('outils/profils/<int:id>/telecharger/', views.telecharger_profil, name='telecharger_profil'),
+
     # Import/Export
     path('importer/', views.importer_csv, name='importer_csv'),
     path('exporter/', views.exporter_csv, name='exporter_csv'),
+    path('exporter/inventaire/', views.exporter_inventaire_csv, name='exporter_inventaire_csv'),
 
     # API/JSON
     path('api/produit/<int:produit_id>/info/', views.get_produit_info, name='api_produit_info'),
+    path('api/recherche/', views.api_recherche_fournitures, name='api_recherche_fournitures'),
+    path('api/graphiques/', views.api_donnees_graphiques, name='api_donnees_graphiques'),
+    path('api/flux/tableau-de-bord/', views.flux_tableau_bord, name='flux_tableau_bord'),
+    path('api/stock-a-date/', views.api_stock_a_date, name='api_stock_a_date'),
+    path('api/valorisation/', views.api_valorisation, name='api_valorisation'),
+    path('api/mouvements/lot/', views.api_mouvements_lot, name='api_mouvements_lot'),
+    path('api/compression/', views.api_statistiques_compression, name='api_statistiques_compression'),
     path('api/types/ajouter/', views.ajouter_type_fourniture_ajax, name='ajouter_type_fourniture_ajax'),
-]
\ No newline at end of file
+]
+
+# Budgets de requêtes SQL par vue (GET, utilisateur connecté, caches du worker
+# chauds, cache partagé: voir CACHE_PARTAGE dans les settings), vérifiés par
+# fournitures/budget_requetes.py et la commande verifier_budgets_requetes.
+# Mesure + 2: vérification du catalogue, session.
+BUDGETS_REQUETES = {
+    'dashboard': 18,
+    'statistiques': 13,
+    'liste_stock': 5,
+    'mouvement': 4,
+    'commande': 9,
+    'liste_commande': 3,
+    'gestion_types': 2,
+    'ajouter_fourniture': 3,
+    'exporter_csv': 3,
+    'exporter_inventaire_csv': 11,
+    'api_recherche_fournitures': 3,
+    'api_donnees_graphiques': 5,
+    'api_valorisation': 1,
+}
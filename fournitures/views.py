@@ -1,11 +1,14 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Sum, Count, Q, F, OuterRef, Subquery
+from django.db.models import Sum, Count, Q, F, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
 from django.core.exceptions import ValidationError
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.db import IntegrityError, router
 from django.contrib.auth import logout
 import json
 import traceback
@@ -14,8 +17,11 @@ from io import TextIOWrapper
 import re
 import time
 
-from .models import Fourniture, Mouvement, Commande, TypeFourniture
+from .models import Fourniture, Mouvement, Commande, TypeFourniture, LieuStockage
 from .forms import MouvementForm, FournitureForm, CommandeForm, TypeFournitureForm
+from .catalogue import catalogue
+from .routers import lecture_replica
+from .archivage import a_des_archives, commandes_archivees_par_statut, historique_archive
 
 
 # ==================== FONCTIONS UTILITAIRES ====================
@@ -46,7 +52,33 @@ def generer_reference_auto():
 
 # ==================== TABLEAU DE BORD ====================
 
+def _avec_commandes_en_cours(produits):
+    """
+    Ajoute aux produits la quantité commandée active (VALIDEE, EN_COURS) et
+    leurs commandes en cours, les plus récentes d'abord: deux requêtes au
+    lieu de trois par produit.
+    """
+    return produits.annotate(quantite_commandee_active=Coalesce(
+        Sum('commandes__quantite', filter=Q(commandes__status__in=['VALIDEE', 'EN_COURS'])), 0
+    )).prefetch_related(Prefetch(
+        'commandes',
+        queryset=Commande.objects.filter(status__in=['EN_ATTENTE', 'VALIDEE', 'EN_COURS']).order_by('-date_creation'),
+        to_attr='commandes_en_cours',
+    ))
+
+
+def _stats_par_type():
+    """Nombre, stock et valeur totaux et produits en alerte des fournitures actives, par type (une requête)"""
+    return Fourniture.objects.filter(actif=True).values('type_id', 'type__nom').annotate(
+        total=Count('id'),
+        stock_total=Sum('stock'),
+        valeur_totale=Sum('valeur_stock'),
+        en_alerte=Count('id', filter=Q(stock__lte=F('seuil_alerte'))),
+    ).order_by('type__nom')
+
+
 @login_required
+@lecture_replica
 def dashboard(request):
     """Tableau de bord principal avec graphiques - VERSION CORRIGÉE"""
     from decimal import Decimal
@@ -92,12 +124,15 @@ def dashboard(request):
 
     # ==================== STATISTIQUES COMMANDES ====================
 
-    # Commandes par statut - TOUS les statuts
-    commandes_attente = Commande.objects.filter(status='EN_ATTENTE').count()
-    commandes_validees = Commande.objects.filter(status='VALIDEE').count()
-    commandes_en_cours_livraison = Commande.objects.filter(status='EN_COURS').count()
-    commandes_recues = Commande.objects.filter(status='RECUE').count()
-    commandes_annulees = Commande.objects.filter(status='ANNULEE').count()
+    # Commandes par statut - TOUS les statuts, en une seule requête groupée
+    par_statut = dict(Commande.objects.order_by().values_list('status').annotate(n=Count('id')))
+    commandes_attente = par_statut.get('EN_ATTENTE', 0)
+    commandes_validees = par_statut.get('VALIDEE', 0)
+    commandes_en_cours_livraison = par_statut.get('EN_COURS', 0)
+    # Les commandes clôturées archivées restent comptées (résumés mensuels)
+    archivees = commandes_archivees_par_statut()
+    commandes_recues = par_statut.get('RECUE', 0) + archivees.get('RECUE', 0)
+    commandes_annulees = par_statut.get('ANNULEE', 0) + archivees.get('ANNULEE', 0)
 
     # Commandes en retard (VALIDEE depuis plus de 7 jours)
     commandes_retard = Commande.objects.filter(
@@ -113,10 +148,10 @@ def dashboard(request):
     # ==================== PRODUITS EN ALERTE ====================
 
     # Produits en alerte avec détails
-    produits_alerte = Fourniture.objects.filter(
+    produits_alerte = _avec_commandes_en_cours(Fourniture.objects.filter(
         stock__lte=F('seuil_alerte'),
         actif=True
-    ).select_related('type').order_by('stock')[:10]
+    ).select_related('type').order_by('stock')[:10])
 
     produits_alerte_data = []
     for produit in produits_alerte:
@@ -128,9 +163,7 @@ def dashboard(request):
                 pourcentage = 0
 
         # Commandes actives pour ce produit
-        commandes_actives_produit = produit.commandes.filter(
-            status__in=['VALIDEE', 'EN_COURS']
-        ).aggregate(total=Sum('quantite'))['total'] or 0
+        commandes_actives_produit = produit.quantite_commandee_active
 
         # Calcul de la quantité à commander
         if produit.stock_max:
@@ -143,15 +176,9 @@ def dashboard(request):
         else:
             quantite_a_commander = max(1, float(produit.seuil_alerte) - float(produit.stock) + 1)
 
-        # Vérifier s'il y a une commande en cours
-        commande_en_cours = produit.commandes.filter(
-            status__in=['EN_ATTENTE', 'VALIDEE', 'EN_COURS']
-        ).exists()
-
-        # Récupérer la commande en cours si elle existe
-        commande_active = produit.commandes.filter(
-            status__in=['EN_ATTENTE', 'VALIDEE', 'EN_COURS']
-        ).order_by('-date_creation').first()
+        # Commande en cours la plus récente (préchargée)
+        commande_en_cours = bool(produit.commandes_en_cours)
+        commande_active = produit.commandes_en_cours[0] if commande_en_cours else None
 
         produit_data = {
             'id': produit.id,
@@ -168,9 +195,16 @@ def dashboard(request):
             'commande_en_cours': commande_en_cours,
             'commande_active': commande_active,
             'statut_commande': commande_active.status if commande_active else None,
+            'jours_couverture': produit.jours_couverture,
         }
         produits_alerte_data.append(produit_data)
 
+    # Ruptures les plus proches, lues directement sur l'index date_rupture_estimee
+    ruptures_proches = Fourniture.objects.filter(
+        actif=True,
+        date_rupture_estimee__isnull=False
+    ).select_related('type').order_by('date_rupture_estimee')[:5]
+
     # ==================== MOUVEMENTS RÉCENTS ====================
 
     # Mouvements récents (7 derniers jours)
@@ -195,24 +229,19 @@ def dashboard(request):
     stats_type = []
     type_stats_data = []
 
-    for type_obj in TypeFourniture.objects.all():
-        fournitures_type = Fourniture.objects.filter(type=type_obj, actif=True)
-        count = fournitures_type.count()
+    for ligne in _stats_par_type():
+        count = ligne['total']
 
         if count > 0:
-            # Stock total
-            stock_total_result = fournitures_type.aggregate(total=Sum('stock'))
-            stock_total = float(stock_total_result['total'] or 0)
-
-            # Produits en alerte dans ce type
-            en_alerte = fournitures_type.filter(stock__lte=F('seuil_alerte')).count()
+            stock_total = float(ligne['stock_total'] or 0)
+            en_alerte = ligne['en_alerte']
 
             # Valeur en pourcentage
             pourcentage_alerte = (en_alerte / count * 100) if count > 0 else 0
 
             type_stat = {
-                'type__nom': type_obj.nom,
-                'type_id': type_obj.id,
+                'type__nom': ligne['type__nom'],
+                'type_id': ligne['type_id'],
                 'total': count,
                 'en_alerte': en_alerte,
                 'stock_total': stock_total,
@@ -302,6 +331,7 @@ def dashboard(request):
 
         # Produits en alerte
         'produits_alerte': produits_alerte_data,
+        'ruptures_proches': ruptures_proches,
 
         # Activité récente
         'mouvements_recents': mouvements_recents,
@@ -330,11 +360,10 @@ def dashboard(request):
 @login_required
 def liste_stock(request):
     """Liste de toutes les fournitures - VERSION CORRIGÉE"""
-    types = TypeFourniture.objects.all().order_by('nom')
+    types = catalogue.types()
 
-    # Récupérer TOUTES les fournitures actives par défaut
-    fournitures_queryset = Fourniture.objects.filter(actif=True).select_related('type').order_by('type__nom',
-                                                                                                 'reference')
+    # Récupérer TOUTES les fournitures actives par défaut (types lus dans le catalogue, sans jointure)
+    fournitures_queryset = Fourniture.objects.filter(actif=True).order_by('type__nom', 'reference')
 
     # Appliquer les filtres
     type_filter = request.GET.get('type')
@@ -348,6 +377,13 @@ def liste_stock(request):
     elif alerte_filter == 'non':
         fournitures_queryset = fournitures_queryset.filter(stock__gt=F('seuil_alerte'))
 
+    # Tri par couverture: les ruptures les plus proches d'abord
+    tri = request.GET.get('tri')
+    if tri == 'couverture':
+        fournitures_queryset = fournitures_queryset.order_by(
+            F('date_rupture_estimee').asc(nulls_last=True), 'reference'
+        )
+
     # Convertir en liste avec les données calculées
     fournitures_list = []
     for f in fournitures_queryset:
@@ -364,7 +400,7 @@ def liste_stock(request):
             'id': f.id,
             'reference': f.reference,
             'designation': f.designation,
-            'type': f.type,
+            'type': catalogue.type(f.type_id),
             'unite': f.unite,
             'stock': float(f.stock),
             'stock_max': float(f.stock_max),
@@ -372,6 +408,9 @@ def liste_stock(request):
             'pourcentage_stock': round(pourcentage, 1),
             'en_alerte': en_alerte,
             'actif': f.actif,
+            'consommation_journaliere': round(f.consommation_journaliere, 2),
+            'jours_couverture': f.jours_couverture,
+            'date_rupture_estimee': f.date_rupture_estimee,
         })
 
     # Statistiques
@@ -385,6 +424,7 @@ def liste_stock(request):
         'types': types,
         'type_filter': type_filter,
         'alerte_filter': alerte_filter,
+        'tri': tri,
         'stats': {
             'total': total_fournitures,
             'en_alerte': en_alerte_count,
@@ -539,16 +579,97 @@ def supprimer_fourniture(request, id):
     return redirect('liste_stock')
 
 
+def _chronologie_mouvements(fourniture, debut=None, fin=None, curseur=None, limite=50):
+    """
+    Mouvements d'une fourniture datés dans [debut, fin[, du plus récent au plus
+    ancien, par pages de `limite` après `curseur` ("date ISO_id" du dernier
+    mouvement de la page précédente).
+
+    Chaque mouvement porte `solde_apres`, le stock après ce mouvement: le stock
+    actuel moins les mouvements postérieurs, cumulés en SQL par une fonction de
+    fenêtre. Une seule agrégation conditionnelle donne les entrées et sorties de
+    la période et le solde des mouvements postérieurs à la page.
+
+    Retourne (mouvements, totaux, curseur de la page suivante ou None).
+    """
+    from django.db.models import Case, DecimalField, ExpressionWrapper, Value, When, Window
+    from django.db.models.expressions import RowRange
+
+    decimal = DecimalField(max_digits=12, decimal_places=2)
+    signe = Case(
+        When(type_mouvement='ENTREE', then=F('quantite')),
+        default=-F('quantite'),
+        output_field=decimal,
+    )
+
+    periode = Q()
+    if debut is not None:
+        periode &= Q(date__gte=debut)
+    if fin is not None:
+        periode &= Q(date__lt=fin)
+
+    # Mouvements plus récents que la page: après le curseur, ou après la période
+    posterieurs = Q(date__gte=fin) if fin is not None else None
+    page = fourniture.mouvements.filter(periode)
+    if curseur:
+        try:
+            date_curseur, id_curseur = curseur.rsplit('_', 1)
+            avant_curseur = (Q(date__lt=datetime.fromisoformat(date_curseur))
+                             | Q(date=datetime.fromisoformat(date_curseur), id__lt=int(id_curseur)))
+        except ValueError:
+            avant_curseur = None
+        if avant_curseur is not None:
+            page = page.filter(avant_curseur)
+            posterieurs = ~avant_curseur
+
+    agregats = {
+        'entrees': Coalesce(Sum('quantite', filter=periode & Q(type_mouvement='ENTREE')), Decimal(0)),
+        'sorties': Coalesce(Sum('quantite', filter=periode & Q(type_mouvement='SORTIE')), Decimal(0)),
+    }
+    if posterieurs is not None:
+        agregats['posterieurs'] = Coalesce(Sum(signe, filter=posterieurs), Decimal(0))
+    totaux = fourniture.mouvements.aggregate(**agregats)
+
+    # Solde après le mouvement = base - cumul des mouvements jusqu'à lui inclus + lui-même
+    base = Decimal(fourniture.stock) - totaux.pop('posterieurs', Decimal(0))
+    cumul = Window(
+        Sum(signe),
+        order_by=[F('date').desc(), F('id').desc()],
+        frame=RowRange(start=None, end=0),
+    )
+    mouvements = list(
+        page.select_related('utilisateur')
+        .annotate(solde_apres=ExpressionWrapper(Value(base) - cumul + signe, output_field=decimal))
+        .order_by('-date', '-id')[:limite + 1]
+    )
+
+    suivant = None
+    if len(mouvements) > limite:
+        mouvements = mouvements[:limite]
+        suivant = f"{mouvements[-1].date.isoformat()}_{mouvements[-1].id}"
+    return mouvements, totaux, suivant
+
+
 @login_required
+@lecture_replica
 def detail_fourniture(request, id):
     """Détail d'une fourniture avec historique"""
     fourniture = get_object_or_404(Fourniture.objects.select_related('type'), id=id)
 
-    # Mouvements récents (30 derniers jours)
-    date_limite = timezone.now() - timedelta(days=30)
-    mouvements = fourniture.mouvements.filter(
-        date__gte=date_limite
-    ).order_by('-date')
+    # Chronologie des mouvements (?du=&au= dates ISO, ?curseur= page suivante), 30 jours par défaut
+    du = request.GET.get('du')
+    if du is None:
+        du = (timezone.localdate() - timedelta(days=30)).isoformat()
+    au = request.GET.get('au', '')
+    try:
+        debut = timezone.make_aware(datetime.fromisoformat(du)) if du else None
+        fin = timezone.make_aware(datetime.fromisoformat(au) + timedelta(days=1)) if au else None
+    except ValueError:
+        messages.error(request, "Période invalide: dates attendues au format AAAA-MM-JJ")
+        du, au, debut, fin = '', '', None, None
+    mouvements, totaux, curseur_suivant = _chronologie_mouvements(
+        fourniture, debut, fin, request.GET.get('curseur')
+    )
 
     # Commandes en cours
     commandes_cours = fourniture.commandes.filter(
@@ -557,16 +678,40 @@ def detail_fourniture(request, id):
 
     # Statistiques du produit
     stats_mouvements = {
-        'entrees_30j': mouvements.filter(type_mouvement='ENTREE').aggregate(total=Sum('quantite'))['total'] or 0,
-        'sorties_30j': mouvements.filter(type_mouvement='SORTIE').aggregate(total=Sum('quantite'))['total'] or 0,
+        'entrees': totaux['entrees'],
+        'sorties': totaux['sorties'],
     }
 
     context = {
         'fourniture': fourniture,
         'mouvements': mouvements,
+        'mouvements_suivant': curseur_suivant,
+        'periode_du': du,
+        'periode_au': au,
         'commandes_cours': commandes_cours,
         'stats_mouvements': stats_mouvements,
+        'a_des_archives': a_des_archives(fourniture.id),
+        'stocks_lieux': fourniture.stocks_lieux.select_related('lieu').order_by('-lieu__par_defaut', 'lieu__nom'),
+        'lieux': LieuStockage.objects.filter(actif=True),
     }
+
+    # Historique archivé, par pages (?archives=1[&avant=dateISO_id])
+    if request.GET.get('archives'):
+        date_avant, _, id_avant = request.GET.get('avant', '').partition('_')
+        try:
+            avant = datetime.fromisoformat(date_avant) if date_avant else None
+            if avant is not None:
+                if timezone.is_naive(avant):
+                    avant = timezone.make_aware(avant)
+                # Sans id: tout ce qui précède la date
+                avant = (avant, int(id_avant) if id_avant else 0)
+        except ValueError:
+            avant = None
+        lignes, curseur = historique_archive(fourniture.id, avant=avant)
+        context['afficher_archives'] = True
+        context['mouvements_archives'] = lignes
+        context['archives_suivant'] = f"{curseur[0].isoformat()}_{curseur[1]}" if curseur else None
+
     return render(request, 'fournitures/detail_fourniture.html', context)
 
 
@@ -588,15 +733,18 @@ def mouvement(request):
                 try:
                     if mouvement_obj.type_mouvement == 'ENTREE':
                         nouveau_stock = produit.entree_stock(
-                            quantite=float(mouvement_obj.quantite),
+                            quantite=int(mouvement_obj.quantite),
                             utilisateur=request.user,
-                            notes=mouvement_obj.notes or ""
+                            notes=mouvement_obj.notes or "",
+                            lieu=mouvement_obj.lieu,
+                            cout_unitaire=mouvement_obj.cout_unitaire
                         )
                     else:
                         nouveau_stock = produit.sortie_stock(
-                            quantite=float(mouvement_obj.quantite),
+                            quantite=int(mouvement_obj.quantite),
                             utilisateur=request.user,
-                            notes=mouvement_obj.notes or ""
+                            notes=mouvement_obj.notes or "",
+                            lieu=mouvement_obj.lieu
                         )
 
                     messages.success(request,
@@ -719,7 +867,8 @@ def commande(request):
                                        f'Statut actuel: {commande_obj.get_status_display()}',
                                        extra_tags='safe')
                     else:
-                        commande_obj.recevoir(request.user)
+                        commande_obj.recevoir(request.user,
+                                              prix_unitaire=_lire_prix_unitaire(request.POST.get('prix_unitaire')))
                         messages.success(request,
                                          f'✅ Commande {commande_obj.numero} reçue!<br>'
                                          f'Stock de {commande_obj.produit.designation} mis à jour '
@@ -846,22 +995,15 @@ def commande(request):
         status='RECUE'
     ).select_related('produit', 'produit__type', 'utilisateur').order_by('-date_reception')[:10]
 
-    produits_en_alerte = Fourniture.objects.filter(
+    produits_en_alerte = _avec_commandes_en_cours(Fourniture.objects.filter(
         stock__lte=F('seuil_alerte'),
         actif=True
-    ).select_related('type').order_by('stock')
+    ).select_related('type').order_by('stock'))
 
     produits_alerte_data = []
     for produit in produits_en_alerte:
-        commandes_actives_produit = produit.commandes.filter(
-            status__in=['EN_ATTENTE', 'VALIDEE', 'EN_COURS']
-        )
-
-        commande_active = commandes_actives_produit.first() if commandes_actives_produit.exists() else None
-
-        commandes_actives = produit.commandes.filter(
-            status__in=['VALIDEE', 'EN_COURS']
-        ).aggregate(total=Sum('quantite'))['total'] or 0
+        commande_active = produit.commandes_en_cours[0] if produit.commandes_en_cours else None
+        commandes_actives = produit.quantite_commandee_active
 
         besoin_base = max(0, produit.stock_max - (produit.stock + commandes_actives))
 
@@ -894,6 +1036,7 @@ def commande(request):
 
 
 @login_required
+@lecture_replica
 def liste_commande(request):
     """Liste de toutes les commandes"""
     commandes = Commande.objects.all().select_related(
@@ -931,6 +1074,19 @@ def valider_commande(request, id):
     return redirect('commande')
 
 
+def _lire_prix_unitaire(valeur):
+    """Prix unitaire saisi à la réception (vide: celui de la commande)"""
+    if not valeur:
+        return None
+    try:
+        prix = Decimal(valeur.replace(',', '.'))
+    except InvalidOperation:
+        raise ValidationError("Prix unitaire invalide")
+    if not prix.is_finite() or prix < 0:
+        raise ValidationError("Le prix unitaire doit être positif")
+    return prix
+
+
 @login_required
 def recevoir_commande(request, id):
     """Recevoir une commande"""
@@ -945,7 +1101,8 @@ def recevoir_commande(request, id):
                                f"Seules les commandes 'En cours de livraison' peuvent être reçues.",
                                extra_tags='safe')
             else:
-                commande_obj.recevoir(request.user)
+                commande_obj.recevoir(request.user,
+                                      prix_unitaire=_lire_prix_unitaire(request.POST.get('prix_unitaire')))
                 messages.success(request,
                                  f'✅ Commande #{commande_obj.id} reçue! '
                                  f'Stock de {commande_obj.produit.designation} mis à jour '
@@ -996,6 +1153,7 @@ def supprimer_commande(request, id):
 
 
 @login_required
+@lecture_replica
 def historique_commandes(request):
     """Historique des commandes"""
     commandes = Commande.objects.all().select_related(
@@ -1048,12 +1206,60 @@ def mettre_en_cours_commande(request, id):
     return redirect('commande')
 
 
+@login_required
+def commandes_lot(request):
+    """Appliquer une action (valider, mettre en cours, recevoir, annuler) à plusieurs commandes"""
+    ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+    if request.method != 'POST':
+        if ajax:
+            return JsonResponse({'success': False, 'error': 'Requête invalide'})
+        return redirect('commande')
+
+    action = request.POST.get('action')
+    try:
+        commande_ids = [int(cid) for cid in request.POST.getlist('commande_ids')]
+    except ValueError:
+        commande_ids = []
+
+    if action not in Commande.ACTIONS_LOT or not commande_ids:
+        if ajax:
+            return JsonResponse({'success': False, 'error': 'Action ou sélection invalide'})
+        messages.error(request, "❌ Sélectionnez au moins une commande et une action valide", extra_tags='safe')
+        return redirect('commande')
+
+    try:
+        resultats = Commande.traiter_lot(commande_ids, action, request.user)
+    except Exception as e:
+        if ajax:
+            return JsonResponse({'success': False, 'error': str(e)})
+        messages.error(request, f"❌ Erreur: {str(e)}", extra_tags='safe')
+        return redirect('commande')
+
+    succes = [message for ok, message in resultats.values() if ok]
+    echecs = [message for ok, message in resultats.values() if not ok]
+
+    if ajax:
+        return JsonResponse({
+            'success': not echecs,
+            'resultats': [
+                {'id': cid, 'succes': ok, 'message': message}
+                for cid, (ok, message) in resultats.items()
+            ],
+        })
+
+    if succes:
+        messages.success(request, f"✅ {len(succes)} commande(s) traitée(s)", extra_tags='safe')
+    if echecs:
+        messages.error(request, "❌ Commandes non traitées:<br>" + "<br>".join(echecs), extra_tags='safe')
+    return redirect('commande')
+
+
 # ==================== TYPES ====================
 
 @login_required
 def gestion_types(request):
     """Gérer les types de fournitures"""
-    types = TypeFourniture.objects.all().order_by('nom')
 
     if request.method == 'POST':
         form = TypeFournitureForm(request.POST)
@@ -1069,7 +1275,7 @@ def gestion_types(request):
 
     context = {
         'form': form,
-        'types': types,
+        'types': catalogue.types(),
     }
     return render(request, 'fournitures/gestion_types.html', context)
 
@@ -1098,10 +1304,13 @@ def supprimer_type(request, id):
 # ==================== STATISTIQUES ====================
 
 @login_required
+@lecture_replica
 def statistiques(request):
     """Page de statistiques"""
     from decimal import Decimal
     from django.core.serializers.json import DjangoJSONEncoder
+    from django.db.models.functions import TruncDate
+    from .historique_stock import debut_de_journee
 
     def decimal_to_float(obj):
         if isinstance(obj, Decimal):
@@ -1158,19 +1367,15 @@ def statistiques(request):
         top_sorties.append(item_dict)
 
     types_list = []
-    for type_obj in TypeFourniture.objects.all():
-        fournitures_type = Fourniture.objects.filter(type=type_obj, actif=True)
-        count = fournitures_type.count()
-        if count > 0:
-            stock_total = float(fournitures_type.aggregate(total=Sum('stock'))['total'] or 0)
-            alerte_count = fournitures_type.filter(stock__lte=F('seuil_alerte')).count()
-            types_list.append({
-                'id': type_obj.id,
-                'nom': type_obj.nom,
-                'count': count,
-                'stock_total': stock_total,
-                'alerte_count': alerte_count
-            })
+    for ligne in _stats_par_type():
+        types_list.append({
+            'id': ligne['type_id'],
+            'nom': ligne['type__nom'],
+            'count': ligne['total'],
+            'stock_total': float(ligne['stock_total'] or 0),
+            'valeur_totale': float(ligne['valeur_totale'] or 0),
+            'alerte_count': ligne['en_alerte']
+        })
 
     types_list.sort(key=lambda x: x['count'], reverse=True)
 
@@ -1180,12 +1385,20 @@ def statistiques(request):
     activite_dates = []
     activite_data = []
 
+    # Une requête groupée sur une plage de dates (élague les partitions mensuelles)
+    aujourd_hui = timezone.localdate()
+    premier_jour = aujourd_hui - timedelta(days=29)
+    activite_par_jour = dict(
+        Mouvement.objects.filter(
+            date__gte=debut_de_journee(premier_jour)
+        ).annotate(jour=TruncDate('date')).values('jour').annotate(
+            nombre=Count('id')
+        ).order_by().values_list('jour', 'nombre')
+    )
     for i in range(29, -1, -1):
-        date_calc = timezone.now().date() - timedelta(days=i)
-        date_str = date_calc.strftime('%d/%m')
-        activite_dates.append(date_str)
-        count = Mouvement.objects.filter(date__date=date_calc).count()
-        activite_data.append(count)
+        date_calc = aujourd_hui - timedelta(days=i)
+        activite_dates.append(date_calc.strftime('%d/%m'))
+        activite_data.append(activite_par_jour.get(date_calc, 0))
 
     top_labels = []
     top_series = []
@@ -1271,10 +1484,10 @@ def ajouter_type_fourniture_ajax(request):
 
 
 @login_required
-def get_produit_info(request, produit_id):
-    """API pour info produit"""
+async def get_produit_info(request, produit_id):
+    """API pour info produit (vue asynchrone)"""
     try:
-        produit = Fourniture.objects.get(id=produit_id, actif=True)
+        produit = await Fourniture.objects.aget(id=produit_id, actif=True)
         return JsonResponse({
             'success': True,
             'id': produit.id,
@@ -1298,6 +1511,344 @@ def get_produit_info(request, produit_id):
         })
 
 
+@login_required
+async def api_recherche_fournitures(request):
+    """API de recherche rapide (typeahead) par référence ou désignation (vue asynchrone)"""
+    terme = request.GET.get('q', '').strip()
+    try:
+        limite = min(max(int(request.GET.get('limite', 10)), 1), 50)
+    except ValueError:
+        limite = 10
+
+    if len(terme) < 2:
+        return JsonResponse({'success': True, 'resultats': []})
+
+    fournitures = Fourniture.objects.filter(
+        Q(reference__istartswith=terme) | Q(designation__icontains=terme),
+        actif=True
+    ).order_by('designation').values('id', 'reference', 'designation', 'stock', 'unite')[:limite]
+
+    resultats = [
+        {**f, 'stock': float(f['stock'])}
+        async for f in fournitures
+    ]
+    return JsonResponse({'success': True, 'resultats': resultats})
+
+
+@login_required
+async def api_donnees_graphiques(request):
+    """API des données de graphiques: mouvements par jour et top sorties (vue asynchrone)"""
+    from django.db.models.functions import TruncDate
+    from .historique_stock import debut_de_journee
+
+    try:
+        jours = min(max(int(request.GET.get('jours', 7)), 1), 90)
+    except ValueError:
+        jours = 7
+
+    aujourd_hui = timezone.localdate()
+    dates = [aujourd_hui - timedelta(days=i) for i in range(jours - 1, -1, -1)]
+    entrees = {d: 0.0 for d in dates}
+    sorties = {d: 0.0 for d in dates}
+
+    par_jour = Mouvement.objects.filter(
+        date__gte=debut_de_journee(dates[0])
+    ).annotate(
+        jour=TruncDate('date')
+    ).values('jour', 'type_mouvement').annotate(
+        total=Sum('quantite')
+    ).order_by()
+
+    async for ligne in par_jour:
+        serie = entrees if ligne['type_mouvement'] == 'ENTREE' else sorties
+        if ligne['jour'] in serie:
+            serie[ligne['jour']] = float(ligne['total'] or 0)
+
+    top_sorties = Mouvement.objects.filter(
+        type_mouvement='SORTIE',
+        date__gte=debut_de_journee(dates[0]),
+        produit__actif=True
+    ).values('produit__designation').annotate(
+        total=Sum('quantite')
+    ).order_by('-total')[:5]
+
+    top = [
+        {'designation': ligne['produit__designation'], 'total': float(ligne['total'] or 0)}
+        async for ligne in top_sorties
+    ]
+
+    return JsonResponse({
+        'success': True,
+        'dates': [d.strftime('%d/%m') for d in dates],
+        'entrees': [entrees[d] for d in dates],
+        'sorties': [sorties[d] for d in dates],
+        'top_sorties': top,
+    })
+
+
+# Durée de vie d'une connexion SSE, intervalle de scrutation du broker et
+# délai entre deux commentaires de maintien de connexion (secondes)
+FLUX_DUREE_MAX = 55
+FLUX_INTERVALLE = 1
+FLUX_PING = 15
+
+
+def _evenement_sse(sequence, type_evenement, donnees):
+    return f"id: {sequence}\nevent: {type_evenement}\ndata: {json.dumps(donnees)}\n\n"
+
+
+async def _flux_asynchrone(broker, sequence):
+    """Flux servi sous ASGI: aucun worker bloqué pendant les attentes"""
+    import asyncio
+    from asgiref.sync import sync_to_async
+
+    yield 'retry: 3000\n\n'
+    fin = time.monotonic() + FLUX_DUREE_MAX
+    dernier_envoi = time.monotonic()
+    while time.monotonic() < fin:
+        for sequence, type_evenement, donnees in await sync_to_async(broker.depuis)(sequence):
+            yield _evenement_sse(sequence, type_evenement, donnees)
+            dernier_envoi = time.monotonic()
+        if time.monotonic() - dernier_envoi > FLUX_PING:
+            # Commentaire SSE: maintient la connexion ouverte à travers les proxys
+            yield ': ping\n\n'
+            dernier_envoi = time.monotonic()
+        await asyncio.sleep(FLUX_INTERVALLE)
+
+
+def _flux_synchrone(broker, sequence):
+    """
+    Flux servi sous WSGI. Un itérateur asynchrone y serait consommé en entier
+    avant l'envoi (réponse reçue d'un bloc au bout de FLUX_DUREE_MAX): ce
+    générateur est itéré par le serveur et chaque événement part aussitôt,
+    mais occupe un thread de worker pendant toute la connexion.
+    """
+    yield 'retry: 3000\n\n'
+    fin = time.monotonic() + FLUX_DUREE_MAX
+    dernier_envoi = time.monotonic()
+    while time.monotonic() < fin:
+        for sequence, type_evenement, donnees in broker.depuis(sequence):
+            yield _evenement_sse(sequence, type_evenement, donnees)
+            dernier_envoi = time.monotonic()
+        if time.monotonic() - dernier_envoi > FLUX_PING:
+            yield ': ping\n\n'
+            dernier_envoi = time.monotonic()
+        time.sleep(FLUX_INTERVALLE)
+
+
+@login_required
+async def flux_tableau_bord(request):
+    """
+    Flux Server-Sent Events des deltas du tableau de bord.
+
+    Le flux se termine après FLUX_DUREE_MAX secondes; EventSource se reconnecte
+    alors automatiquement en renvoyant Last-Event-ID, sans perte d'événement.
+    Sous WSGI, chaque tableau de bord ouvert occupe un thread de worker
+    (workers à threads requis); settings.FLUX_WSGI = False y désactive le
+    flux (204: EventSource ne se reconnecte pas, la page reste statique).
+    """
+    from asgiref.sync import sync_to_async
+    from django.conf import settings
+    from django.core.handlers.asgi import ASGIRequest
+    from .evenements import get_broker
+
+    asgi = isinstance(request, ASGIRequest)
+    if not asgi and not getattr(settings, 'FLUX_WSGI', True):
+        return HttpResponse(status=204)
+
+    broker = get_broker()
+    try:
+        sequence = int(request.headers.get('Last-Event-ID') or request.GET.get('depuis') or -1)
+    except ValueError:
+        sequence = -1
+    if sequence < 0:
+        # Nouvelle connexion: ne diffuser que les événements à venir
+        sequence = await sync_to_async(broker.dernier)()
+
+    flux = _flux_asynchrone(broker, sequence) if asgi else _flux_synchrone(broker, sequence)
+    response = StreamingHttpResponse(flux, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _lire_date(valeur):
+    """Parse une date AAAA-MM-JJ de la query string (None si invalide)"""
+    from datetime import date
+    try:
+        return date.fromisoformat(valeur or '')
+    except ValueError:
+        return None
+
+
+@login_required
+@lecture_replica
+def api_stock_a_date(request):
+    """API: stock en fin de journée (?date=AAAA-MM-JJ[&produit=id])"""
+    from .historique_stock import stock_a_date
+
+    jour = _lire_date(request.GET.get('date'))
+    if jour is None:
+        return JsonResponse({'success': False, 'error': 'Paramètre date invalide (AAAA-MM-JJ)'})
+
+    produit_id = request.GET.get('produit')
+    try:
+        produit_ids = [int(produit_id)] if produit_id else None
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Paramètre produit invalide'})
+
+    stocks = stock_a_date(jour, produit_ids)
+    return JsonResponse({
+        'success': True,
+        'date': jour.isoformat(),
+        'stocks': {str(pid): float(stock) for pid, stock in stocks.items()},
+    })
+
+
+@login_required
+@lecture_replica
+def api_valorisation(request):
+    """API: valeur du stock au coût moyen pondéré, totale et par type (?date=AAAA-MM-JJ, défaut: actuelle)"""
+    from .historique_stock import valeur_par_type
+
+    jour = None
+    if request.GET.get('date'):
+        jour = _lire_date(request.GET.get('date'))
+        if jour is None:
+            return JsonResponse({'success': False, 'error': 'Paramètre date invalide (AAAA-MM-JJ)'})
+
+    types = valeur_par_type(jour)
+    return JsonResponse({
+        'success': True,
+        'date': (jour or timezone.localdate()).isoformat(),
+        'total': float(sum((valeur or 0 for _, _, valeur in types), Decimal('0'))),
+        'par_type': [
+            {'type_id': type_id, 'type': nom, 'valeur': float(valeur or 0)} for type_id, nom, valeur in types
+        ],
+    })
+
+
+@login_required
+def api_mouvements_lot(request):
+    """
+    API: saisie groupée de mouvements (scanners).
+
+    POST JSON {"lieu": id (optionnel), "mouvements": [{"cle", "reference",
+    "type", "quantite", "date"}, ...]}; un résultat par ligne, dans l'ordre.
+
+    Authentification par session, protection CSRF comprise: le client
+    récupère la page de connexion (cookie csrftoken et champ
+    csrfmiddlewaretoken), se connecte avec ce jeton, puis envoie chaque lot
+    avec le cookie de session, l'en-tête X-CSRFToken égal au cookie
+    csrftoken (renouvelé à la connexion) et, en HTTPS, un en-tête Referer ou Origin du site. Sans
+    jeton valide la réponse est un 403 (non JSON).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Requête invalide'}, status=405)
+    try:
+        donnees = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'success': False, 'error': 'JSON invalide'}, status=400)
+
+    lignes = donnees.get('mouvements') if isinstance(donnees, dict) else None
+    if not isinstance(lignes, list) or not lignes:
+        return JsonResponse({'success': False, 'error': 'Liste de mouvements requise'}, status=400)
+    if len(lignes) > Mouvement.TAILLE_LOT_MAX:
+        return JsonResponse({
+            'success': False,
+            'error': f'Lot trop volumineux (maximum {Mouvement.TAILLE_LOT_MAX} lignes)'
+        }, status=413)
+
+    lieu = None
+    if donnees.get('lieu') is not None:
+        lieu = LieuStockage.objects.filter(id=donnees['lieu'], actif=True).first() \
+            if str(donnees['lieu']).isdigit() else None
+        if lieu is None:
+            return JsonResponse({'success': False, 'error': 'Lieu inconnu ou inactif'}, status=400)
+
+    try:
+        resultats = Mouvement.enregistrer_lot(lignes, utilisateur=request.user, lieu=lieu)
+    except IntegrityError:
+        # Même clé enregistrée au même moment par un autre envoi: le renvoi obtiendra le doublon
+        return JsonResponse({'success': False, 'error': 'Envoi concurrent avec les mêmes clés, réessayer'},
+                            status=409)
+
+    acceptes = sum(1 for r in resultats if r['succes'])
+    return JsonResponse({
+        'success': acceptes == len(resultats),
+        'acceptes': acceptes,
+        'rejetes': len(resultats) - acceptes,
+        'resultats': resultats,
+    })
+
+
+@login_required
+def api_statistiques_compression(request):
+    """API (staff): octets économisés et temps CPU de compression par vue, pour ce processus"""
+    from .compression import brotli, statistiques_compression
+
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Accès réservé au personnel'}, status=403)
+    return JsonResponse({
+        'success': True,
+        'brotli': brotli is not None,
+        'vues': statistiques_compression(),
+    })
+
+
+# ==================== PROFILS DE REQUÊTES ====================
+
+@login_required
+def profils_requetes(request):
+    """Requêtes profilées les plus lentes (personnel), filtrables par vue"""
+    from .models import ProfilRequete
+
+    if not request.user.is_staff:
+        messages.error(request, "❌ Accès réservé au personnel", extra_tags='safe')
+        return redirect('dashboard')
+
+    profils = ProfilRequete.objects.defer('profil', 'fonctions', 'allocations').select_related('utilisateur')
+    vue = request.GET.get('vue', '')
+    if vue:
+        profils = profils.filter(vue=vue)
+
+    context = {
+        'profils': profils.order_by('-duree')[:50],
+        'vues': ProfilRequete.objects.order_by('vue').values_list('vue', flat=True).distinct(),
+        'vue': vue,
+    }
+    return render(request, 'fournitures/profils_requetes.html', context)
+
+
+@login_required
+def detail_profil(request, id):
+    """Fonctions et allocations principales d'une requête profilée (personnel)"""
+    from .models import ProfilRequete
+
+    if not request.user.is_staff:
+        messages.error(request, "❌ Accès réservé au personnel", extra_tags='safe')
+        return redirect('dashboard')
+
+    profil = get_object_or_404(ProfilRequete.objects.defer('profil').select_related('utilisateur'), id=id)
+    tri = 'temps_propre' if request.GET.get('tri') == 'propre' else 'temps_cumule'
+    fonctions = sorted(profil.fonctions, key=lambda f: f[tri], reverse=True)
+    return render(request, 'fournitures/detail_profil.html', {'profil': profil, 'fonctions': fonctions, 'tri': tri})
+
+
+@login_required
+def telecharger_profil(request, id):
+    """Profil cProfile complet, à ouvrir avec pstats ou snakeviz (personnel)"""
+    from .models import ProfilRequete
+
+    if not request.user.is_staff:
+        return HttpResponse(status=403)
+
+    profil = get_object_or_404(ProfilRequete.objects.only('profil'), id=id)
+    response = HttpResponse(bytes(profil.profil), content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="profil-{profil.id}.prof"'
+    return response
+
+
 # ==================== IMPORT/EXPORT ====================
 
 @login_required
@@ -1380,30 +1931,73 @@ def importer_csv(request):
 
 
 @login_required
+@lecture_replica
 def exporter_csv(request):
-    """Exporter CSV"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="fournitures.csv"'
-
-    writer = csv.writer(response, delimiter=';')
-    writer.writerow([
-        'Référence', 'Désignation', 'Description', 'Type',
-        'Stock', 'Seuil alerte', 'Stock max', 'Unité', 'Actif'
-    ])
-
-    for f in Fourniture.objects.all().select_related('type'):
-        writer.writerow([
-            f.reference,
-            f.designation,
-            f.description or '',
-            f.type.nom if f.type else '',
-            f.stock,
-            f.seuil_alerte,
-            f.stock_max,
-            f.unite,
-            'Oui' if f.actif else 'Non'
-        ])
+    """Exporter CSV (réponse en flux, ligne par ligne)"""
+    # Les lignes sont produites après la sortie de la vue: figer la base de lecture maintenant
+    alias = router.db_for_read(Fourniture)
+
+    def lignes():
+        yield ['Référence', 'Désignation', 'Type', 'Stock', 'Seuil alerte', 'Stock max', 'Unité', 'Actif']
+        fournitures = Fourniture.objects.using(alias).select_related('type').order_by('reference')
+        for f in fournitures.iterator(chunk_size=2000):
+            yield [
+                f.reference,
+                f.designation,
+                f.type.nom if f.type else '',
+                f.stock,
+                f.seuil_alerte,
+                f.stock_max,
+                f.unite,
+                'Oui' if f.actif else 'Non'
+            ]
+
+    return _reponse_csv('fournitures.csv', lignes())
+
 
+@login_required
+@lecture_replica
+def exporter_inventaire_csv(request):
+    """Exporter l'inventaire valorisé à une date (?date=AAAA-MM-JJ, défaut: aujourd'hui)"""
+    from .historique_stock import stock_a_date, valeur_a_date
+
+    jour = _lire_date(request.GET.get('date')) or timezone.localdate()
+    stocks = stock_a_date(jour)
+    valeurs = valeur_a_date(jour)
+    alias = router.db_for_read(Fourniture)
+
+    def lignes():
+        yield ['Référence', 'Désignation', 'Type', 'Unité', f'Stock au {jour:%d/%m/%Y}', 'Coût moyen',
+               f'Valeur au {jour:%d/%m/%Y}']
+        fournitures = Fourniture.objects.using(alias).filter(id__in=list(stocks)).select_related(
+            'type').order_by('reference')
+        for f in fournitures.iterator(chunk_size=2000):
+            yield [
+                f.reference,
+                f.designation,
+                f.type.nom if f.type else '',
+                f.unite,
+                stocks[f.id],
+                round(valeurs[f.id] / stocks[f.id], 4) if stocks[f.id] else f.cout_moyen,
+                round(valeurs[f.id], 2),
+            ]
+        yield ['', 'Total', '', '', '', '', round(sum(valeurs.values(), Decimal('0')), 2)]
+
+    return _reponse_csv(f'inventaire_{jour:%Y%m%d}.csv', lignes())
+
+
+class _TamponCSV:
+    """Pseudo-fichier pour csv.writer: renvoie la ligne formatée au lieu de l'écrire"""
+
+    def write(self, valeur):
+        return valeur
+
+
+def _reponse_csv(nom_fichier, lignes):
+    """StreamingHttpResponse CSV (séparateur ;) à partir d'un itérable de lignes"""
+    writer = csv.writer(_TamponCSV(), delimiter=';')
+    response = StreamingHttpResponse((writer.writerow(ligne) for ligne in lignes), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{nom_fichier}"'
     return response
 
 
@@ -1417,7 +2011,10 @@ def ajuster_stock(request, id):
     if request.method == 'POST':
         try:
             ancien_stock = fourniture.stock
-            nouveau_stock = float(request.POST.get('nouveau_stock', 0))
+            saisie = Decimal(request.POST.get('nouveau_stock', '0').strip() or '0')
+            if not saisie.is_finite() or saisie != saisie.to_integral_value():
+                raise ValueError
+            nouveau_stock = int(saisie)
             raison = request.POST.get('raison', 'Ajustement manuel')
 
             if nouveau_stock < 0:
@@ -1427,17 +2024,14 @@ def ajuster_stock(request, id):
             difference = nouveau_stock - ancien_stock
 
             if difference != 0:
-                Mouvement.objects.create(
-                    produit=fourniture,
-                    type_mouvement='ENTREE' if difference > 0 else 'SORTIE',
-                    quantite=abs(difference),
+                # L'écart est porté par le lieu choisi (lieu par défaut sinon)
+                fourniture.ajuster_stock(
+                    nouveau_stock,
                     utilisateur=request.user,
-                    notes=f"Ajustement manuel: {raison}"
+                    notes=f"Ajustement manuel: {raison}",
+                    lieu=request.POST.get('lieu') or None
                 )
 
-                fourniture.stock = nouveau_stock
-                fourniture.save()
-
                 messages.success(request,
                                  f'✅ Stock ajusté de {ancien_stock} à {nouveau_stock} {fourniture.unite}<br>'
                                  f'Différence: {"+" if difference > 0 else ""}{difference} {fourniture.unite}',
@@ -1445,14 +2039,44 @@ def ajuster_stock(request, id):
 
             return redirect('detail_fourniture', id=id)
 
-        except ValueError:
+        except (ValueError, InvalidOperation):
             messages.error(request, "❌ Valeur de stock invalide", extra_tags='safe')
+        except ValidationError as e:
+            messages.error(request, f"❌ {' '.join(e.messages)}", extra_tags='safe')
         except Exception as e:
             messages.error(request, f"❌ Erreur: {str(e)}", extra_tags='safe')
 
     return redirect('detail_fourniture', id=id)
 
 
+@login_required
+def transferer_stock(request, id):
+    """Transférer du stock d'un lieu à un autre"""
+    fourniture = get_object_or_404(Fourniture, id=id)
+
+    if request.method == 'POST':
+        try:
+            quantite = int(request.POST.get('quantite', 0))
+            source = get_object_or_404(LieuStockage, id=request.POST.get('source'))
+            destination = get_object_or_404(LieuStockage, id=request.POST.get('destination'), actif=True)
+
+            fourniture.transferer_stock(
+                quantite, source, destination,
+                utilisateur=request.user,
+                notes=request.POST.get('notes', '')
+            )
+            messages.success(request,
+                             f'✅ {quantite} {fourniture.unite} transféré(s) de {source} vers {destination}',
+                             extra_tags='safe')
+
+        except ValueError:
+            messages.error(request, "❌ Quantité invalide", extra_tags='safe')
+        except ValidationError as e:
+            messages.error(request, f"❌ {' '.join(e.messages)}", extra_tags='safe')
+
+    return redirect('detail_fourniture', id=id)
+
+
 # ==================== DEBUG ====================
 
 @login_required
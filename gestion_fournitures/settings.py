@@ -29,11 +29,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'fournitures.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'fournitures.middleware.EpinglagePrimaireMiddleware',
+    'fournitures.middleware.ProfilageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -66,9 +69,79 @@ DATABASES = {
         'PASSWORD': 'tsiory',            # Ton mot de passe
         'HOST': 'localhost',                  # Ou '127.0.0.1'
         'PORT': '5432',                       # Port par défaut PostgreSQL
+        # Connexions persistantes: celle ouverte au préchauffage sert aux premières requêtes
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Réplique en lecture pour les statistiques, le tableau de bord et les exports.
+# Définir REPLICA_DB_NAME (et REPLICA_DB_HOST/PORT, ou REPLICA_DB_ENGINE pour
+# une base SQLite locale servant de réplique de test) pour l'activer.
+if os.environ.get('REPLICA_DB_NAME') or os.environ.get('REPLICA_DB_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'ENGINE': os.environ.get('REPLICA_DB_ENGINE', DATABASES['default']['ENGINE']),
+        'NAME': os.environ.get('REPLICA_DB_NAME', DATABASES['default']['NAME']),
+        'HOST': os.environ.get('REPLICA_DB_HOST', DATABASES['default']['HOST']),
+        'PORT': os.environ.get('REPLICA_DB_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['fournitures.routers.ReplicaRouter']
+REPLICA_DB_ALIAS = 'replica'
+# Durée pendant laquelle un utilisateur qui vient d'écrire relit la base principale
+REPLICA_EPINGLAGE_SECONDES = 5
+
+# Diffusion des événements du tableau de bord (voir fournitures/evenements.py):
+# 'base' (partagé entre workers), ou 'memoire' pour un seul processus (développement)
+EVENEMENTS_BROKER = os.environ.get('EVENEMENTS_BROKER', 'base')
+# Flux SSE servi sous WSGI: un thread de worker par tableau de bord ouvert
+# (0 pour le désactiver si les workers ne sont pas à threads; inutile sous ASGI)
+FLUX_WSGI = os.environ.get('FLUX_WSGI', '1') == '1'
+
+# Caches. Sans CACHE_LOCATION (ex. redis://localhost:6379/1 avec
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache), cache mémoire
+# local à chaque worker.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'fournitures'),
+    },
+}
+CACHES['sessions'] = {
+    **CACHES['default'],
+    'KEY_PREFIX': 'sessions',
+    'TIMEOUT': int(os.environ.get('SESSIONS_CACHE_TIMEOUT', 300)),
+}
+
+# Un cache mémoire local n'est cohérent qu'avec un seul worker (WEB_CONCURRENCY,
+# lu par gunicorn et uvicorn: à renseigner aussi si --workers est passé en option)
+CACHE_PARTAGE = (
+    not CACHES['default']['BACKEND'].endswith(('LocMemCache', 'DummyCache'))
+    or int(os.environ.get('WEB_CONCURRENCY') or 1) <= 1
+)
+
+# Sessions lues dans le cache, écrites dans le cache et en base; en base
+# seulement si le cache n'est pas partagé (une déconnexion faite par un worker
+# serait ignorée des autres)
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + ('cached_db' if CACHE_PARTAGE else 'db')
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Utilisateur authentifié gardé en cache dans chaque worker, invalidé entre
+# workers par le cache partagé (voir fournitures/authentification.py); 0 le
+# désactive, ce qui est le cas sans cache partagé
+AUTHENTICATION_BACKENDS = ['fournitures.authentification.BackendUtilisateurCache']
+CACHE_UTILISATEUR_SECONDES = 60 if CACHE_PARTAGE else 0
+
+# Catalogue des types et fournitures gardé dans chaque worker (voir fournitures/catalogue.py)
+CATALOGUE_VERIFICATION_SECONDES = 1
+CATALOGUE_RECHARGEMENT_SECONDES = 300
+
+# Profilage à la demande par le personnel (en-tête X-Profiler ou ?_profiler=1, voir fournitures/profilage.py)
+PROFILAGE_ACTIF = os.environ.get('PROFILAGE', '1') == '1'
+PROFILAGE_MAX_PROFILS = 500
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -96,6 +169,40 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'fournitures/static'),
 ]
+STATIC_ROOT = os.environ.get('STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+
+# Noms hachés selon le contenu, CSS/JS minifiés et variantes .gz (collectstatic)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'fournitures.statique.StockageStatiqueCompresse',
+    },
+}
+
+# Compression des réponses dynamiques (brotli si le module est installé, sinon gzip)
+COMPRESSION_TYPES = ('text/html', 'application/json', 'text/csv', 'text/plain', 'text/css',
+                     'text/javascript', 'application/javascript', 'image/svg+xml')
+COMPRESSION_TAILLE_MIN = 1024
+
+# Servir STATIC_ROOT depuis Django (sans serveur frontal), avec cache longue durée
+SERVIR_STATIQUE = os.environ.get('SERVIR_STATIQUE', '') == '1'
+
+# Fichiers NDJSON compressés de l'archivage (archiver_historique --format ndjson)
+ARCHIVES_DIR = os.environ.get('ARCHIVES_DIR', os.path.join(BASE_DIR, 'archives'))
+
+# Export colonnaire NumPy des mouvements pour l'analyse (exporter_colonnes_mouvements)
+COLONNES_DIR = os.environ.get('COLONNES_DIR', os.path.join(BASE_DIR, 'colonnes'))
+
+# E-mails (récapitulatifs d'alertes, commande envoyer_alertes). En local:
+# console, ou EMAIL_BACKEND=django.core.mail.backends.filebased.EmailBackend
+# avec EMAIL_FILE_PATH.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_FILE_PATH = os.environ.get('EMAIL_FILE_PATH', os.path.join(BASE_DIR, 'emails'))
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'stock@localhost')
+# Destinataires des récapitulatifs (séparés par des virgules); vide: personnel actif ayant un e-mail
+ALERTES_DESTINATAIRES = [a.strip() for a in os.environ.get('ALERTES_DESTINATAIRES', '').split(',') if a.strip()]
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
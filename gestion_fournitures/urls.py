@@ -1,10 +1,13 @@
 """gestion_fournitures URL Configuration"""
 from django.contrib import admin
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, include, re_path
 from django.contrib.auth import views as auth_views
 from django.contrib.auth import logout
 from django.shortcuts import redirect
 
+from fournitures.statique import servir_statique
+
 def custom_logout(request):
     logout(request)
     return redirect('login')
@@ -14,4 +17,9 @@ urlpatterns = [
     path('', include('fournitures.urls')),
     path('login/', auth_views.LoginView.as_view(template_name='fournitures/login.html'), name='login'),
     path('logout/', custom_logout, name='logout'),  # Utilisez la vue personnalisée
-]
\ No newline at end of file
+]
+
+if settings.SERVIR_STATIQUE:
+    urlpatterns += [
+        re_path(r'^%s(?P<chemin>.*)$' % settings.STATIC_URL.lstrip('/'), servir_statique),
+    ]
@@ -1,5 +1,16 @@
 import os
+import sys
+
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gestion_fournitures.settings')
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Préchauffage avant le premier trafic (voir fournitures/prechauffage.py):
+# PRECHAUFFAGE=1 dans chaque worker, PRECHAUFFAGE=avant_fork quand le module
+# est chargé par le maître avant le fork (gunicorn --preload).
+if os.environ.get('PRECHAUFFAGE'):
+    from fournitures.prechauffage import prechauffer, rapport
+
+    for ligne in rapport(prechauffer(avant_fork=os.environ['PRECHAUFFAGE'] == 'avant_fork')):
+        print(f"[prechauffage {os.getpid()}] {ligne}", file=sys.stderr)